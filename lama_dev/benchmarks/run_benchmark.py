@@ -0,0 +1,197 @@
+"""
+benchmarks/run_benchmark.py: Offline benchmark for the text-to-SQL pipeline.
+- Builds a synthetic SQLite database of configurable size (rows, number of tables).
+- Runs a question corpus through process_text_to_sql with ReplayLLM, so no Ollama,
+  Bedrock, GPU or network is needed.
+- Reports throughput, p50/p95/p99 latency, peak memory and a per-stage breakdown.
+- Compares against a stored baseline and exits non-zero on regressions.
+
+Usage (from lama_dev/):
+    python -m benchmarks.run_benchmark --rows 100000 --tables 5 --iterations 20
+    python -m benchmarks.run_benchmark --update-baseline
+"""
+
+import argparse
+import json
+import math
+import os
+import resource
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+from src.config.config import CONFIG
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Offline text-to-SQL benchmark")
+    parser.add_argument("--rows", type=int, default=10000, help="Rows per flights table")
+    parser.add_argument("--tables", type=int, default=1, help="Number of flights tables")
+    parser.add_argument("--iterations", type=int, default=10, help="Passes over the corpus")
+    parser.add_argument("--concurrency", type=int, default=1, help="Questions in flight (uses process_batch)")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="Simulated LLM latency per call")
+    parser.add_argument("--token-latency-ms", type=float, default=0.0, help="Simulated LLM latency per output token")
+    parser.add_argument("--ramble-tokens", type=int, default=0,
+                        help="Tokens the simulated LLM keeps generating after each step")
+    parser.add_argument("--no-streaming", action="store_true",
+                        help="Wait for whole generations instead of stopping at the complete step")
+    parser.add_argument("--replicas", type=int, default=0,
+                        help="Read-only replica pools on the database file that queries are routed over")
+    parser.add_argument("--corpus", default=os.path.join(BENCHMARK_DIR, "corpus.json"))
+    parser.add_argument("--baseline", default=os.path.join(BENCHMARK_DIR, "baseline.json"))
+    parser.add_argument("--update-baseline", action="store_true", help="Store this run as the baseline")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed relative regression (0.2 = 20%%)")
+    parser.add_argument("--no-fast-path", action="store_true", help="Send every question through the agent")
+    parser.add_argument("--generation-mode", choices=("react", "candidates"), default="react",
+                        help="ReAct agent, or parallel candidates voted by execution result")
+    parser.add_argument("--trace-memory", action="store_true",
+                        help="Report the Python heap peak via tracemalloc (slows the run) instead of peak RSS")
+    parser.add_argument("--output", help="Also write the report as JSON to this path")
+    return parser.parse_args(argv)
+
+def percentile(values, fraction: float) -> float:
+    """Nearest-rank percentile of a list of numbers."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    # The smallest value with at least fraction of the values at or below it
+    # (rounded first: 0.07 * 100 is 7.000000000000001 in floating point)
+    index = max(0, math.ceil(round(fraction * len(ordered), 9)) - 1)
+    return ordered[index]
+
+def compare_to_baseline(report: dict, baseline: dict, tolerance: float) -> list:
+    """Return human-readable regressions of report versus baseline."""
+    regressions = []
+    for metric in ("p50_ms", "p95_ms", "p99_ms", "peak_memory_mb"):
+        old, new = baseline.get(metric), report.get(metric)
+        if old and new is not None and new > old * (1 + tolerance):
+            regressions.append(f"{metric}: {new:.3f} vs baseline {old:.3f}")
+    old, new = baseline.get("throughput_qps"), report.get("throughput_qps")
+    if old and new is not None and new < old * (1 - tolerance):
+        regressions.append(f"throughput_qps: {new:.3f} vs baseline {old:.3f}")
+    return regressions
+
+def run(args) -> dict:
+    # Configure before any engine or index is created; both are lazy singletons
+    workdir = tempfile.mkdtemp(prefix="text_to_sql_bench_")
+    db_path = os.path.join(workdir, "bench.db")
+
+    from benchmarks.synthetic_db import generate_database
+    started = time.perf_counter()
+    CONFIG["schema"] = generate_database(db_path, rows=args.rows, tables=args.tables)
+    generation_s = time.perf_counter() - started
+    CONFIG.update(database_uri=f"sqlite:///{db_path}", trace_log_path=None,
+                  catalog_snapshot_path=os.path.join(workdir, "catalog.json"),
+                  fast_path_enabled=not args.no_fast_path, answer_cache_enabled=False,
+                  generation_mode=args.generation_mode, llm_streaming=not args.no_streaming,
+                  database_replicas=[db_path] * args.replicas)
+
+    from benchmarks.stub_llm import ReplayLLM
+    from src.agents.agent import initialize_agent, process_text_to_sql
+    from src.agents.batch import process_batch
+    from src.agents.candidates import initialize_candidates
+    from src.agents.fast_path import initialize_fast_path
+    from src.core.database import get_engine, get_sql_database, pool_metrics
+    from src.core.db_router import get_router
+    from src.core.llm import with_early_stop
+    from src.core.result_cache import result_cache_stats
+    from src.tools.mcp_tools import initialize_mcp_tools
+    from src.utils.tracing import reset_metrics, stage_summary
+
+    with open(args.corpus) as f:
+        corpus = json.load(f)
+    llm = with_early_stop(ReplayLLM(transcripts={item["question"]: item["steps"] for item in corpus},
+                                    latency_ms=args.latency_ms, token_latency_ms=args.token_latency_ms,
+                                    ramble_tokens=args.ramble_tokens))
+    db = get_sql_database()
+    # No vector store: schema retrieval falls back to CONFIG["schema"] without embeddings
+    mcp_client = initialize_mcp_tools(db, None)
+    executor = initialize_agent(llm, db, mcp_client)
+    executor.verbose = False
+    fast_path = initialize_fast_path()
+    candidates = initialize_candidates(llm)
+
+    questions = [item["question"] for item in corpus] * args.iterations
+    reset_metrics()
+    if args.trace_memory:
+        tracemalloc.start()
+    latencies, errors = [], 0
+    started = time.perf_counter()
+    if args.concurrency > 1:
+        for response in process_batch(executor, mcp_client, questions, args.concurrency,
+                                      fast_path=fast_path, candidates=candidates):
+            latencies.append(response["elapsed_ms"])
+            errors += "error" in response
+    else:
+        for question in questions:
+            question_started = time.perf_counter()
+            response = process_text_to_sql(executor, mcp_client, question, fast_path=fast_path,
+                                           candidates=candidates)
+            latencies.append((time.perf_counter() - question_started) * 1000)
+            errors += "error" in response
+    wall_s = time.perf_counter() - started
+    if args.trace_memory:
+        _, peak_bytes = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    else:
+        # ru_maxrss is in kilobytes on Linux
+        peak_bytes = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+    stages = stage_summary()
+    report = {
+        "rows": args.rows,
+        "tables": args.tables,
+        "questions": len(questions),
+        "concurrency": args.concurrency,
+        "errors": errors,
+        "db_generation_s": round(generation_s, 3),
+        "wall_s": round(wall_s, 3),
+        "throughput_qps": round(len(questions) / wall_s, 3) if wall_s else 0.0,
+        "p50_ms": round(percentile(latencies, 0.50), 3),
+        "p95_ms": round(percentile(latencies, 0.95), 3),
+        "p99_ms": round(percentile(latencies, 0.99), 3),
+        "peak_memory_mb": round(peak_bytes / (1024 * 1024), 3),
+        "memory_source": "tracemalloc" if args.trace_memory else "peak_rss",
+        "stages": stages,
+        "pool": pool_metrics(),
+        "result_cache": result_cache_stats(),
+    }
+    if fast_path is not None:
+        report["fast_path"] = fast_path.stats()
+    if candidates is not None:
+        report["candidates"] = candidates.stats()
+    if hasattr(llm, "stats"):
+        report["llm_streaming"] = llm.stats()
+    if get_router() is not None:
+        report["db_router"] = get_router().stats()
+
+    get_engine().dispose()
+    shutil.rmtree(workdir, ignore_errors=True)
+    return report
+
+def main(argv=None):
+    args = parse_args(argv)
+    report = run(args)
+    print(json.dumps(report, indent=2, default=str))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2, default=str)
+
+    if args.update_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(report, f, indent=2, default=str)
+        print(f"Baseline written to {args.baseline}")
+        return 0
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            regressions = compare_to_baseline(report, json.load(f), args.tolerance)
+        if regressions:
+            print("Regressions against baseline:\n  " + "\n  ".join(regressions))
+            return 1
+        print("No regressions against baseline")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,71 @@
+"""
+benchmarks/stub_llm.py: Deterministic local LLM that replays recorded ReAct transcripts.
+- Looks up the question in the prompt and returns the next recorded step.
+- The step index is the number of the transcript's earlier steps already present in the
+  prompt's scratchpad, so concurrent requests for the same question stay independent.
+- Optional fixed latency simulates model round trips without Ollama or Bedrock;
+  token_latency_ms adds a per-token delay and streams the step token by token.
+- ramble_tokens appends the kind of text a sampling model produces after its step (a made-up
+  Observation and more reasoning); stop sequences end it the way a provider would.
+"""
+
+import re
+import time
+from typing import Any, Iterator, List, Optional
+from langchain_core.language_models.llms import LLM
+from langchain_core.outputs import GenerationChunk
+
+_QUESTION_PATTERN = re.compile(r"Question:\s*(.+)")
+
+FALLBACK_STEP = "Thought: I cannot answer this question.\nFinal Answer: I don't know"
+
+RAMBLE = "\nThought: Let me double-check the result against the schema before answering, just to be sure."
+_TOKEN = re.compile(r"\s*\S+")
+
+class ReplayLLM(LLM):
+    """LangChain LLM that answers from {question: [step, ...]} transcripts."""
+
+    transcripts: dict
+    latency_ms: float = 0.0
+    token_latency_ms: float = 0.0
+    ramble_tokens: int = 0
+
+    @property
+    def _llm_type(self) -> str:
+        return "replay"
+
+    def _next_step(self, prompt: str) -> str:
+        match = _QUESTION_PATTERN.search(prompt)
+        steps = self.transcripts.get(match.group(1).strip()) if match else None
+        if not steps:
+            return FALLBACK_STEP
+        done = sum(1 for step in steps if step in prompt)
+        return steps[min(done, len(steps) - 1)]
+
+    def _tokens(self, prompt: str, stop: Optional[List[str]]) -> list:
+        """The step plus any rambling, split into word tokens and ended at the first stop sequence."""
+        text = self._next_step(prompt)
+        if self.ramble_tokens:
+            ramble = _TOKEN.findall(RAMBLE * (self.ramble_tokens // len(_TOKEN.findall(RAMBLE)) + 1))
+            text += "".join(ramble[:self.ramble_tokens])
+        for sequence in stop or []:
+            if sequence in text:
+                text = text[:text.index(sequence)]
+        return _TOKEN.findall(text)
+
+    def _call(self, prompt: str, stop: Optional[List[str]] = None, run_manager: Any = None,
+              **kwargs: Any) -> str:
+        return "".join(self._stream_text(prompt, stop))
+
+    def _stream_text(self, prompt: str, stop: Optional[List[str]]) -> Iterator[str]:
+        if self.latency_ms:
+            time.sleep(self.latency_ms / 1000)
+        for token in self._tokens(prompt, stop):
+            if self.token_latency_ms:
+                time.sleep(self.token_latency_ms / 1000)
+            yield token
+
+    def _stream(self, prompt: str, stop: Optional[List[str]] = None, run_manager: Any = None,
+                **kwargs: Any) -> Iterator[GenerationChunk]:
+        for token in self._stream_text(prompt, stop):
+            yield GenerationChunk(text=token)
@@ -0,0 +1,60 @@
+"""
+benchmarks/synthetic_db.py: Generates synthetic SQLite databases for benchmarking.
+- Always creates the airplanes table used by the sample application.
+- Adds N flights_<i> tables with a foreign key to airplanes, each with a configurable
+  number of rows, so schema size and data volume can be scaled independently.
+- Output is deterministic for a given seed.
+"""
+
+import os
+import random
+import sqlite3
+
+PRODUCERS = ["Boeing", "Airbus", "Embraer", "Bombardier", "ATR", "Cessna", "Comac", "Sukhoi"]
+TYPES = ["Jet", "Prop", "Turboprop"]
+AIRPORTS = ["JFK", "LAX", "ORD", "DFW", "ATL", "SEA", "SFO", "BOS", "MIA", "DEN"]
+
+AIRPLANES_DDL = """CREATE TABLE airplanes (
+    Airplane_id INT(10) PRIMARY KEY,
+    Producer VARCHAR(20),
+    Type VARCHAR(10)
+);"""
+
+def flights_ddl(index: int) -> str:
+    return f"""CREATE TABLE flights_{index} (
+    flight_id INTEGER PRIMARY KEY,
+    Airplane_id INTEGER REFERENCES airplanes(Airplane_id),
+    origin VARCHAR(3),
+    destination VARCHAR(3),
+    distance INTEGER
+);"""
+
+def generate_database(path: str, rows: int = 10000, tables: int = 1, airplanes: int = 500,
+                      seed: int = 42) -> str:
+    """Create (or replace) a synthetic database at path and return its DDL script."""
+    if os.path.exists(path):
+        os.remove(path)
+    rng = random.Random(seed)
+    ddl = [AIRPLANES_DDL] + [flights_ddl(index) for index in range(tables)]
+
+    conn = sqlite3.connect(path)
+    try:
+        conn.executescript("\n".join(ddl))
+        conn.executemany(
+            "INSERT INTO airplanes (Airplane_id, Producer, Type) VALUES (?, ?, ?)",
+            [(airplane_id, rng.choice(PRODUCERS), rng.choice(TYPES)) for airplane_id in range(1, airplanes + 1)],
+        )
+        for index in range(tables):
+            conn.executemany(
+                f"INSERT INTO flights_{index} (flight_id, Airplane_id, origin, destination, distance) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (
+                    (flight_id, rng.randint(1, airplanes), rng.choice(AIRPORTS), rng.choice(AIRPORTS),
+                     rng.randint(100, 5000))
+                    for flight_id in range(1, rows + 1)
+                ),
+            )
+        conn.commit()
+    finally:
+        conn.close()
+    return "\n".join(ddl)
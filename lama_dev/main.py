@@ -1,32 +1,64 @@
 """
 main.py: Entry point for the text-to-SQL application.
-- Initializes LLM, database, vector store, MCP tools, and agent.
+- Builds components lazily through the application container and prewarms them in
+  the background (model, embeddings, DB pool, schema index).
 - Runs a sample query to demonstrate functionality.
+- With --batch, answers every question in a file concurrently and prints JSON lines.
+- With --serve http|stdio, stays resident and answers requests (see src/server.py).
+- With --startup-report, prints how long each component took to initialize.
 """
 
-from src.core.llm import initialize_llm
-from src.core.database import initialize_database
-from src.core.schema_retrieval import initialize_vector_store
-from src.tools.mcp_tools import initialize_mcp_tools
-from src.agents.agent import initialize_agent, process_text_to_sql
+import argparse
+import json
+from src.app import get_app
+from src.config.config import CONFIG
 from src.utils.logging import setup_logging
 
 logger = setup_logging(__name__)
 
+def parse_args():
+    parser = argparse.ArgumentParser(description="Text-to-SQL using a LangChain ReAct agent")
+    parser.add_argument("question", nargs="?", default="How many unique airplane producers are there?")
+    parser.add_argument("--batch", help="File with one question per line to process concurrently")
+    parser.add_argument("--concurrency", type=int, default=None, help="Questions in flight at once")
+    parser.add_argument("--timeout", type=float, default=None, help="Per-question timeout in seconds")
+    parser.add_argument("--serve", choices=["http", "stdio"], help="Run as a long-lived server")
+    parser.add_argument("--host", default=None, help="HTTP bind address (default from config)")
+    parser.add_argument("--port", type=int, default=None, help="HTTP port (default from config)")
+    parser.add_argument("--workers", type=int, default=None, help="Server worker threads")
+    parser.add_argument("--startup-report", action="store_true", help="Print component initialization times")
+    return parser.parse_args()
+
 def main():
-    # Initialize components
-    llm = initialize_llm()
-    db = initialize_database()
-    vector_store = initialize_vector_store()
-    mcp_client = initialize_mcp_tools(db, vector_store)
-    executor = initialize_agent(llm, db, mcp_client)
-
-    # Example query
-    question = "How many unique airplane producers are there?"
-    response = process_text_to_sql(executor, mcp_client, question)
-    
-    print("Question:", response["question"])
-    print("SQL Query/Result:", response.get("sql_query", response.get("error")))
+    args = parse_args()
+
+    # Components are created on first use; prewarm overlaps the slow ones
+    app = get_app()
+    if CONFIG["prewarm_enabled"]:
+        app.prewarm()
+
+    if args.serve == "http":
+        from src.server import serve_http
+        serve_http(app, args.host, args.port, args.workers)
+    elif args.serve == "stdio":
+        from src.server import serve_stdio
+        serve_stdio(app, workers=args.workers)
+    elif args.batch:
+        from src.agents.batch import process_batch
+        with open(args.batch) as f:
+            questions = [line.strip() for line in f if line.strip()]
+        for response in process_batch(app.executor, app.mcp_client, questions, args.concurrency,
+                                      args.timeout, app.answer_cache, app.fast_path, app.candidates):
+            print(json.dumps(response, default=str), flush=True)
+    else:
+        from src.agents.agent import process_text_to_sql
+        response = process_text_to_sql(app.executor, app.mcp_client, args.question,
+                                        app.answer_cache, app.fast_path, candidates=app.candidates)
+        print("Question:", response["question"])
+        print("SQL Query/Result:", response.get("sql_query", response.get("error")))
+
+    if args.startup_report:
+        print(json.dumps(app.startup_report(), indent=2, default=str))
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
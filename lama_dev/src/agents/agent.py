@@ -1,77 +1,112 @@
 """
 src/agents/agent.py: Initializes and runs the LangChain ReAct agent for text-to-SQL.
-- Uses tools for SQL execution, table listing, and schema retrieval.
+- Uses tools for SQL execution, table listing, and schema retrieval (through a local or
+  remote MCP client; schema and table list are fetched in one batched call).
 - Executes generated queries and returns accurate results.
 - Supports self-correction via error analysis and retries.
+- Prompts are token-budgeted (src/core/prompt_builder.py): compact schema, relevant
+  examples, and a scratchpad whose older observations are trimmed.
+- The LLM is bound to llm_stop_sequences; with llm_streaming it also stops as soon as the
+  tool call or final answer is complete (src/core/llm_streaming.py).
+- Answers from the answer cache or the deterministic fast path before running the agent.
+- Optional candidate mode (src/agents/candidates.py) generates and executes several
+  queries in parallel and votes on their results; the agent runs only if none executes.
+- Reads the executed query's rows and timing from the capture side channel
+  instead of running it a second time; re-verification is sampled (opt-in).
 """
 
-from langchain.agents import create_react_agent, AgentExecutor
-from langchain_community.tools.sql_database.tool import (
-    QuerySQLDataBaseTool,
-    ListSQLDatabaseTool,
-)
+import asyncio
+import textwrap
+import time
+from langchain.agents import AgentExecutor
+from langchain.agents.output_parsers import ReActSingleInputOutputParser
+import random
+from langchain_core.runnables import RunnablePassthrough
+from langchain_core.tools import render_text_description
 from langchain_core.prompts import PromptTemplate
-from src.tools.mcp_tools import SchemaRetrievalTool
+from src.tools.mcp_tools import (
+    CapturingQuerySQLDataBaseTool, MCPListTablesTool, MCPQueryTool, SchemaRetrievalTool,
+)
 from src.utils.logging import setup_logging
 from src.config.config import CONFIG
-from langchain_community.utilities import SQLDatabase
+from src.core.prompt_builder import count_tokens, format_scratchpad, select_examples
+from src.core.query_execution import capture_queries, execute_uncached, run_query
+from src.utils.tracing import TracingCallbackHandler, span, start_trace
 
 logger = setup_logging(__name__)
 
 def initialize_agent(llm, db, mcp_client):
     """Initialize LangChain ReAct agent."""
-    # LangChain tools
-    query_tool = QuerySQLDataBaseTool(db=db)
-    list_tables_tool = ListSQLDatabaseTool(db=db)
+    # LangChain tools; with a remote tool server the database-facing ones go through it.
+    # Table listing always goes through the MCP client, which reads the metadata catalog
+    if getattr(mcp_client, "remote", False):
+        query_tool = MCPQueryTool(mcp_client)
+    else:
+        query_tool = CapturingQuerySQLDataBaseTool(db=db)
+    list_tables_tool = MCPListTablesTool(mcp_client)
     schema_tool = SchemaRetrievalTool(mcp_client)
 
-    # ReAct-compatible prompt template
-    SQL_PROMPT = PromptTemplate.from_template(
-        """
+    tools = [query_tool, list_tables_tool, schema_tool]
+
+    # ReAct-compatible prompt template. Static text comes first and the question last, so
+    # every call shares the longest possible prefix (see PROMPT_CACHE_BOUNDARY in llm.py).
+    # Dedented: indentation would cost tokens on every call
+    SQL_PROMPT = PromptTemplate.from_template(textwrap.dedent(
+        """\
         You are an expert SQL assistant tasked with answering user questions by generating and executing SQL queries based on the provided database schema.
         Your goal is to:
         1. Generate a syntactically correct SQL query to answer the question.
         2. Execute the query using the sql_db_query tool to retrieve the result.
         3. Verify the result makes sense given the schema and question.
         If the query fails or the result seems incorrect, analyze the error, correct the query, and retry.
-        
-        Question: {question}
-        Schema: {schema}
-        
+
         Available tools:
         {tools}
-        
+
         Tool names: {tool_names}
-        
+
         Follow this process:
         Thought: [Explain your reasoning for the query]
         Action: sql_db_query
-        Input: [The SQL query to execute]
-        
+        Action Input: [The SQL query to execute]
+
         After execution:
         Observation: [The result returned by the tool]
         Thought: [Verify if the result answers the question correctly]
         Final Answer: [The query result, e.g., [(3)]]
-        
+
         If the question explicitly asks for only the query, return:
         Final Answer: [SQL query]
-        
+
+        Schema (table(column:type, ...); pk = primary key, -> = foreign key):
+        {schema}
+
+        {examples}Question: {question}
+
         Scratchpad for intermediate steps:
         {agent_scratchpad}
         """
-    )
+    )).partial(tools=render_text_description(tools), tool_names=", ".join(tool.name for tool in tools),
+              examples="")
 
-    # Create agent
-    agent = create_react_agent(
-        llm=llm,
-        tools=[query_tool, list_tables_tool, schema_tool],
-        prompt=SQL_PROMPT,
+    # Same pipeline as create_react_agent, with a scratchpad that fits the remaining budget
+    static_tokens = count_tokens(SQL_PROMPT.format(schema="", examples="", question="", agent_scratchpad=""))
+
+    def _scratchpad(inputs: dict) -> str:
+        used = static_tokens + sum(count_tokens(inputs.get(key) or "") for key in ("schema", "examples", "question"))
+        return format_scratchpad(inputs["intermediate_steps"], CONFIG["prompt_token_budget"] - used)
+
+    agent = (
+        RunnablePassthrough.assign(agent_scratchpad=_scratchpad)
+        | SQL_PROMPT
+        | llm.bind(stop=CONFIG["llm_stop_sequences"])
+        | ReActSingleInputOutputParser()
     )
 
     # Create executor
     executor = AgentExecutor(
         agent=agent,
-        tools=[query_tool, list_tables_tool, schema_tool],
+        tools=tools,
         verbose=True,
         max_iterations=5,
         handle_parsing_errors=True,
@@ -80,46 +115,180 @@ def initialize_agent(llm, db, mcp_client):
     logger.info("Initialized LangChain agent")
     return executor
 
-def process_text_to_sql(executor, mcp_client, question: str) -> dict:
-    """Process a user query and return SQL query/result."""
-    try:
-        schema = mcp_client.call_tool("retrieve_schema", {"query": question, "vector_store": None})
-        logger.info(f"Retrieved schema: {schema}")
-
-        result = executor.invoke({"question": question, "schema": schema})
-        logger.info(f"Agent result: {result}")
-
-        output = result.get("output", "No result returned.")
-        # Extract query and result from output
-        query = None
-        query_result = output
-
-        # If output contains a query, extract it
-        if "SELECT" in output:
-            # Try to find the query in the agent's reasoning steps
-            for step in result.get("intermediate_steps", []):
-                if step[0].tool == "sql_db_query":
-                    query = step[0].tool_input
-                    query_result = step[1] if step[1] else output
-                    break
-
-        # Verify result by re-executing the query
-        if query and query_result and query_result != "No result returned.":
-            db = SQLDatabase.from_uri(CONFIG["database_uri"])
-            try:
-                verified_result = db.run(query)
-                if verified_result != query_result:
-                    logger.warning(f"Agent result {query_result} differs from verified result {verified_result}")
-                    query_result = verified_result
-            except Exception as e:
-                logger.error(f"Verification failed: {str(e)}")
-                query_result = f"Error verifying result: {str(e)}"
-
-        return {
-            "question": question,
-            "sql_query": query,
-            "result": query_result
-        }
-    except Exception as e:
-        logger.error(f"Error processing query: {str(e)}")
-        return {"question": question, "error": str(e)}
\ No newline at end of file
+def _record_fields(record: dict) -> dict:
+    """Response fields describing a single query execution."""
+    return {
+        "columns": record["columns"],
+        "rows": record["rows"],
+        "row_count": record["row_count"],
+        "truncated": record["truncated"],
+        "execution_ms": round(record["elapsed_ms"], 3),
+    }
+
+def _fetch_schema(mcp_client, question: str) -> str:
+    """Retrieve the relevant schema and the full table list in one batched tool call."""
+    calls = [("retrieve_schema", {"query": question})]
+    if CONFIG["schema_include_table_list"]:
+        calls.append(("list_tables", {}))
+    results = mcp_client.call_tools(calls, return_exceptions=True)
+    schema = results[0]
+    if isinstance(schema, Exception):
+        raise schema
+    if len(results) > 1 and not isinstance(results[1], Exception):
+        schema = f"{schema}\n\nAll tables: {results[1]}"
+    return schema
+
+def _shortcut_response(question: str, answer_cache=None, fast_path=None):
+    """Answer from the answer cache or the deterministic fast path; None runs the agent."""
+    if answer_cache is not None:
+        with span("answer_cache"):
+            cached_query = answer_cache.lookup(question)
+        if cached_query:
+            # Re-run the cached SQL so the answer reflects current data
+            record = run_query(cached_query)
+            if record["error"] is None:
+                return {"question": question, "sql_query": cached_query,
+                        "result": record["observation"], "cached": True, **_record_fields(record)}
+            logger.warning(f"Cached query failed, falling back to agent: {record['error']}")
+            answer_cache.discard_sql(cached_query)
+
+    if fast_path is not None:
+        with span("fast_path"):
+            matched = fast_path.match(question)
+        if matched:
+            rule, sql = matched
+            record = run_query(sql)
+            if record["error"] is None:
+                fast_path.record(rule)
+                return {"question": question, "sql_query": sql, "result": record["observation"],
+                        "fast_path": rule, **_record_fields(record)}
+            logger.warning(f"Fast path query failed, falling back to agent: {record['error']}")
+        fast_path.record(None)
+    return None
+
+def _candidate_response(question: str, selected: dict, answer_cache=None) -> dict:
+    """Build the response from the candidate chosen by execution-result voting."""
+    record = selected["record"]
+    if answer_cache is not None:
+        answer_cache.store(question, selected["query"])
+    return {"question": question, "sql_query": selected["query"], "result": record["observation"],
+            "votes": selected["votes"], "candidates": selected["candidates"], **_record_fields(record)}
+
+def _build_response(question: str, result: dict, captured: list, answer_cache=None) -> dict:
+    """Build the response from the agent output and the queries it executed."""
+    output = result.get("output", "No result returned.")
+    query = None
+    query_result = output
+    response = {"question": question}
+
+    # The last successful execution is the one the final answer is based on
+    successful = [record for record in captured if record["error"] is None]
+    if successful:
+        record = successful[-1]
+        query = record["query"]
+        query_result = record["observation"] or output
+        response.update(_record_fields(record))
+
+        # Optional sampled re-verification to catch drift between the tool (or the result
+        # cache / a summary-table rewrite) and the database; flags, never replaces, the result
+        if not record["truncated"] and random.random() < CONFIG["verify_sample_rate"]:
+            with span("verification"):
+                verified = execute_uncached(query)
+            if verified["error"] is not None:
+                logger.error(f"Verification failed: {verified['error']}")
+                response["verified"] = False
+            elif ([tuple(row) for row in verified["rows"]] != [tuple(row) for row in record["rows"]]
+                  or verified["row_count"] != record["row_count"]):
+                logger.warning(f"Agent result {record['rows']} differs from verified result {verified['rows']}")
+                response["verified"] = False
+            else:
+                response["verified"] = True
+
+    if answer_cache is not None and query and not str(query_result).startswith("Error"):
+        answer_cache.store(question, query)
+
+    response.update(sql_query=query, result=query_result)
+    return response
+
+def _bounded(executor, deadline):
+    """The executor, or a shallow copy whose ReAct loop stops by deadline (time.monotonic())."""
+    if deadline is None:
+        return executor
+    remaining = max(deadline - time.monotonic(), 0.0)
+    if executor.max_execution_time is not None and executor.max_execution_time <= remaining:
+        return executor
+    # A copy: the shared executor serves concurrent requests with their own deadlines
+    return executor.model_copy(update={"max_execution_time": remaining})
+
+def process_text_to_sql(executor, mcp_client, question: str, answer_cache=None, fast_path=None,
+                        request_id: str = None, candidates=None, timeout: float = None) -> dict:
+    """Process a user query and return SQL query/result.
+
+    timeout (seconds, from the call) bounds the agent's ReAct loop, which stops between steps.
+    """
+    deadline = time.monotonic() + timeout if timeout is not None else None
+    with start_trace(question, request_id) as trace:
+        try:
+            response = _shortcut_response(question, answer_cache, fast_path)
+            if not response:
+                with span("schema_retrieval"):
+                    schema = _fetch_schema(mcp_client, question)
+                logger.info(f"Retrieved schema: {schema}")
+
+                selected = candidates.answer(mcp_client, question, schema) if candidates is not None else None
+                if selected:
+                    response = _candidate_response(question, selected, answer_cache)
+                else:
+                    with capture_queries() as captured:
+                        result = _bounded(executor, deadline).invoke(
+                            {"question": question, "schema": schema, "examples": select_examples(question)},
+                            config={"callbacks": [TracingCallbackHandler(trace)]},
+                        )
+                    logger.info(f"Agent result: {result}")
+
+                    response = _build_response(question, result, captured, answer_cache)
+        except Exception as e:
+            logger.error(f"Error processing query: {str(e)}")
+            trace.status = "error"
+            response = {"question": question, "error": str(e)}
+        response["request_id"] = trace.request_id
+        return response
+
+async def aprocess_text_to_sql(executor, mcp_client, question: str, answer_cache=None,
+                               fast_path=None, request_id: str = None, candidates=None,
+                               timeout: float = None) -> dict:
+    """Async variant of process_text_to_sql built on AgentExecutor.ainvoke.
+
+    Blocking steps (cache embedding lookups, schema retrieval, verification) run in
+    worker threads so many questions can share one event loop.
+    """
+    deadline = time.monotonic() + timeout if timeout is not None else None
+    with start_trace(question, request_id) as trace:
+        try:
+            response = await asyncio.to_thread(_shortcut_response, question, answer_cache, fast_path)
+            if not response:
+                with span("schema_retrieval"):
+                    schema = await asyncio.to_thread(_fetch_schema, mcp_client, question)
+                logger.info(f"Retrieved schema: {schema}")
+
+                selected = None
+                if candidates is not None:
+                    selected = await asyncio.to_thread(candidates.answer, mcp_client, question, schema)
+                if selected:
+                    response = _candidate_response(question, selected, answer_cache)
+                else:
+                    with capture_queries() as captured:
+                        result = await _bounded(executor, deadline).ainvoke(
+                            {"question": question, "schema": schema, "examples": select_examples(question)},
+                            config={"callbacks": [TracingCallbackHandler(trace)]},
+                        )
+                    logger.info(f"Agent result: {result}")
+
+                    response = await asyncio.to_thread(_build_response, question, result, captured,
+                                                       answer_cache)
+        except Exception as e:
+            logger.error(f"Error processing query: {str(e)}")
+            trace.status = "error"
+            response = {"question": question, "error": str(e)}
+        response["request_id"] = trace.request_id
+        return response
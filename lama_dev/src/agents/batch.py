@@ -0,0 +1,85 @@
+"""
+src/agents/batch.py: Concurrent batch processing of text-to-SQL questions.
+- Runs many questions through AgentExecutor.ainvoke on one event loop.
+- Bounds concurrency with a semaphore and applies a per-question timeout.
+- Streams responses back in completion order; one failure never affects the others.
+"""
+
+import asyncio
+import time
+from src.agents.agent import aprocess_text_to_sql
+from src.config.config import CONFIG
+from src.utils.logging import setup_logging
+
+logger = setup_logging(__name__)
+
+async def aprocess_batch(executor, mcp_client, questions, concurrency: int = None,
+                         timeout: float = None, answer_cache=None, fast_path=None, candidates=None):
+    """Yield one response per question, in completion order.
+
+    Each response carries an "index" key with the question's position in the input and
+    "elapsed_ms" with its wall-clock latency (excluding time queued for the semaphore).
+    Questions are pulled lazily, so `questions` may be a generator over a large backfill.
+    """
+    concurrency = CONFIG["batch_concurrency"] if concurrency is None else concurrency
+    timeout = CONFIG["batch_timeout_seconds"] if timeout is None else timeout
+    if concurrency < 1:
+        raise ValueError(f"concurrency must be at least 1 (got {concurrency})")
+    semaphore = asyncio.BoundedSemaphore(concurrency)
+
+    async def run_one(index: int, question: str) -> dict:
+        async with semaphore:
+            started = time.perf_counter()
+            try:
+                response = await asyncio.wait_for(
+                    aprocess_text_to_sql(executor, mcp_client, question, answer_cache, fast_path,
+                                         candidates=candidates),
+                    timeout,
+                )
+            except asyncio.TimeoutError:
+                logger.error(f"Question {index} timed out after {timeout}s")
+                response = {"question": question, "error": f"Timed out after {timeout}s"}
+            except Exception as e:
+                logger.error(f"Question {index} failed: {str(e)}")
+                response = {"question": question, "error": str(e)}
+        response["index"] = index
+        response["elapsed_ms"] = round((time.perf_counter() - started) * 1000, 3)
+        return response
+
+    pending = set()
+    remaining = iter(enumerate(questions))
+    exhausted = False
+    try:
+        while pending or not exhausted:
+            # Keep at most `concurrency` tasks alive so huge batches don't pre-allocate
+            while not exhausted and len(pending) < concurrency:
+                try:
+                    index, question = next(remaining)
+                except StopIteration:
+                    exhausted = True
+                    break
+                pending.add(asyncio.ensure_future(run_one(index, question)))
+            if not pending:
+                break
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                yield task.result()
+    finally:
+        for task in pending:
+            task.cancel()
+
+def process_batch(executor, mcp_client, questions, concurrency: int = None,
+                  timeout: float = None, answer_cache=None, fast_path=None, candidates=None):
+    """Synchronous wrapper around aprocess_batch; yields responses in completion order."""
+    loop = asyncio.new_event_loop()
+    responses = aprocess_batch(executor, mcp_client, questions, concurrency, timeout,
+                               answer_cache, fast_path, candidates)
+    try:
+        while True:
+            try:
+                yield loop.run_until_complete(responses.__anext__())
+            except StopAsyncIteration:
+                break
+    finally:
+        loop.run_until_complete(responses.aclose())
+        loop.close()
@@ -0,0 +1,194 @@
+"""
+src/agents/candidates.py: Parallel candidate generation with execution-based selection.
+- Asks the LLM for N candidate queries concurrently, each prompt with a different approach
+  hint, so candidates differ even with deterministic decoding. (LLM.batch would run
+  completion models' prompts one after another, so the calls go through a thread pool.)
+- Runs the distinct candidates concurrently through the MCP client (validation and
+  execution on the pooled database) and groups them by their result.
+- Self-consistency voting: the result most candidates agree on wins; ties go to the
+  candidate with rows, then to the earlier approach. Results are compared by a
+  fingerprint of all their rows, not the bounded preview.
+- Wall-clock time is about one LLM call plus one query, instead of up to max_iterations
+  sequential ReAct steps; if no candidate executes, the caller falls back to the agent.
+"""
+
+import contextvars
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from langchain_core.prompts import PromptTemplate
+from src.config.config import CONFIG
+from src.core.query_execution import publish_record
+from src.utils.logging import setup_logging
+from src.utils.tracing import span
+
+logger = setup_logging(__name__)
+
+# Static text first and the question last, like the agent prompt (see PROMPT_CACHE_BOUNDARY)
+CANDIDATE_PROMPT = PromptTemplate.from_template(
+    """
+    You are an expert SQL assistant. Write one SQLite query that answers the question,
+    using only the tables and columns in the schema.
+    Return only the SQL query, with no explanation and no code fences.
+
+    Schema: {schema}
+
+    Question: {question}
+    Approach: {strategy}
+    SQL:
+    """
+)
+
+STRATEGIES = [
+    "Write the most direct query.",
+    "Use explicit JOINs with table aliases and qualify every column.",
+    "Use subqueries or a WITH clause for intermediate results.",
+    "Think about NULLs, duplicates (DISTINCT) and ties before writing the query.",
+    "Filter as early as possible and select only the columns the question asks for.",
+]
+
+_SQL_START = re.compile(
+    r"\bSELECT\b|\bWITH\s+(?:RECURSIVE\s+)?\w+(?:\s*\([^)]*\))?\s+AS\s*\(", re.IGNORECASE
+)
+_SQL_END = re.compile(r";|\n\s*\n|\n\s*(?:Observation|Thought|Final Answer|Explanation):|```")
+
+def extract_sql(text: str):
+    """Return the first SQL query in an LLM response, or None."""
+    match = _SQL_START.search(text or "")
+    if not match:
+        return None
+    query = text[match.start():]
+    end = _SQL_END.search(query)
+    return (query[:end.start()] if end else query).strip() or None
+
+def result_key(record: dict):
+    """Order-insensitive key of the full result, or None if the full result is unknown.
+
+    Column names are ignored (aliases differ). Uses the fingerprint run_query computes over
+    every row; a result cut off at sql_max_result_rows (or without a fingerprint and
+    truncated) cannot be compared and gets no key.
+    """
+    if record.get("row_limit_reached"):
+        return None
+    fingerprint = record.get("fingerprint")
+    if fingerprint is None:
+        if record["truncated"]:
+            return None
+        fingerprint = tuple(sorted(repr(tuple(round(v, 6) if isinstance(v, float) else v for v in row))
+                                   for row in record["rows"]))
+    return (len(record["columns"]), record["row_count"], fingerprint)
+
+class CandidateGenerator:
+    """Generates N candidate queries concurrently and selects one by execution-result agreement."""
+
+    def __init__(self, llm, count: int = None, strategies=None):
+        self.llm = llm
+        self.count = count or CONFIG["candidate_count"]
+        self.strategies = strategies or STRATEGIES
+        self._lock = threading.Lock()
+        self._pool = None
+        self._stats = {"questions": 0, "answered": 0, "fallbacks": 0, "candidates": 0,
+                       "distinct": 0, "unanimous": 0}
+
+    def _executor(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(max_workers=self.count, thread_name_prefix="sql-candidate")
+            return self._pool
+
+    def _invoke(self, prompt: str):
+        try:
+            return self.llm.invoke(prompt)
+        except Exception as e:
+            return e
+
+    def generate(self, question: str, schema: str) -> list:
+        """Distinct candidate queries, in approach order."""
+        prompts = [
+            CANDIDATE_PROMPT.format(schema=schema, question=question,
+                                    strategy=self.strategies[i % len(self.strategies)])
+            for i in range(self.count)
+        ]
+        # Each call keeps the caller's context, so traces and query captures follow it
+        futures = [self._executor().submit(contextvars.copy_context().run, self._invoke, prompt)
+                   for prompt in prompts]
+        outputs = [future.result() for future in futures]
+        queries, seen = [], set()
+        for output in outputs:
+            if isinstance(output, Exception):
+                logger.warning(f"Candidate generation failed: {str(output)}")
+                continue
+            # Chat models return a message, completion models a string
+            query = extract_sql(getattr(output, "content", output))
+            key = " ".join(query.split()).lower() if query else None
+            if key and key not in seen:
+                seen.add(key)
+                queries.append(query)
+        return queries
+
+    def execute(self, mcp_client, queries: list) -> list:
+        """Run the candidates concurrently; returns an execution record (or exception) per query."""
+        records = mcp_client.call_tools([("run_query", {"query": query}) for query in queries],
+                                        return_exceptions=True)
+        if getattr(mcp_client, "remote", False):
+            # A local run_query already published its record to the capture side channel
+            for record in records:
+                if isinstance(record, dict):
+                    publish_record(record)
+        return records
+
+    @staticmethod
+    def select(records: list):
+        """Index of the winning record and its vote count, or None if nothing executed."""
+        groups = {}
+        for index, record in enumerate(records):
+            if isinstance(record, dict) and record["error"] is None:
+                # A result that cannot be compared stands alone: it never agrees with another
+                groups.setdefault(result_key(record) or ("incomparable", index), []).append(index)
+        if not groups:
+            return None
+        winner = max(groups.values(), key=lambda indexes: (len(indexes), records[indexes[0]]["row_count"] > 0,
+                                                           -indexes[0]))
+        return winner[0], len(winner)
+
+    def answer(self, mcp_client, question: str, schema: str):
+        """Return {"query", "record", "votes", "candidates"}, or None to fall back to the agent."""
+        with span("candidate_generation", count=self.count) as attributes:
+            queries = self.generate(question, schema)
+            attributes.update(distinct=len(queries))
+        records = []
+        if queries:
+            with span("candidate_execution", count=len(queries)):
+                records = self.execute(mcp_client, queries)
+        selected = self.select(records)
+
+        with self._lock:
+            self._stats["questions"] += 1
+            self._stats["candidates"] += self.count
+            self._stats["distinct"] += len(queries)
+            if selected is None:
+                self._stats["fallbacks"] += 1
+            else:
+                self._stats["answered"] += 1
+                self._stats["unanimous"] += selected[1] == len(queries)
+        if selected is None:
+            logger.info(f"No candidate query executed ({len(queries)} generated); falling back to the agent")
+            return None
+        index, votes = selected
+        logger.info(f"Selected candidate {index + 1} of {len(queries)} with {votes} vote(s)")
+        return {"query": queries[index], "record": records[index], "votes": votes,
+                "candidates": len(queries)}
+
+    def stats(self) -> dict:
+        """Counters plus the share of questions answered without the agent."""
+        with self._lock:
+            stats = dict(self._stats)
+        stats["answered_rate"] = stats["answered"] / stats["questions"] if stats["questions"] else 0.0
+        return stats
+
+def initialize_candidates(llm):
+    """Create the candidate generator when generation_mode is "candidates", else None."""
+    if CONFIG["generation_mode"] != "candidates":
+        return None
+    logger.info(f"Using parallel candidate generation with {CONFIG['candidate_count']} candidates")
+    return CandidateGenerator(llm)
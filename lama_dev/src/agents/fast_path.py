@@ -0,0 +1,244 @@
+"""
+src/agents/fast_path.py: Deterministic fast path that answers template-matchable questions
+without the LLM.
+- Indexes table and column names from the metadata catalog (singular/plural, underscores)
+  and rebuilds the index when the catalog picks up DDL changes.
+- Matches simple counts, distinct lists and equality-filtered lookups with regex rules.
+- Only answers when every phrase resolves unambiguously; otherwise the agent runs.
+- Rules are pluggable and the share of traffic served is reported via stats().
+"""
+
+import re
+import threading
+from src.config.config import CONFIG
+from src.core.catalog import get_catalog
+from src.core.database import get_engine
+from src.utils.logging import setup_logging
+
+logger = setup_logging(__name__)
+
+_FILLER = r"(?:\s+(?:are there|are in the database|exist|do we have|are recorded))?"
+_VALUE = r"(?P<value>'[^']*'|\"[^\"]*\"|[\w.\-]+)"
+
+def _singular(word: str) -> str:
+    if word.endswith("ies") and len(word) > 4:
+        return word[:-3] + "y"
+    if word.endswith(("ses", "xes")):
+        return word[:-2]
+    if word.endswith("s") and not word.endswith("ss"):
+        return word[:-1]
+    return word
+
+def _key(phrase: str) -> str:
+    words = re.split(r"[\s_]+", phrase.lower().strip())
+    return " ".join(_singular(word) for word in words if word and word not in ("the", "all"))
+
+class SchemaNameIndex:
+    """Lookup from natural-language phrases to tables and columns."""
+
+    def __init__(self, tables: dict, column_types: dict = None):
+        self.tables = {}
+        self.columns = {}
+        self.column_types = column_types or {}
+        for table, columns in tables.items():
+            self.tables[_key(table)] = table
+            for column in columns:
+                self.columns.setdefault(_key(column), set()).add((table, column))
+
+    def resolve_table(self, phrase: str):
+        return self.tables.get(_key(phrase))
+
+    def resolve_column(self, phrase: str, table=None):
+        """Resolve "airplane producers" to ("airplanes", "Producer"); None if ambiguous."""
+        words = _key(phrase).split()
+        for start in range(len(words)):
+            candidates = self.columns.get(" ".join(words[start:]))
+            if not candidates:
+                continue
+            prefix = " ".join(words[:start])
+            hint = table
+            if prefix:
+                # Leading words must name the table; anything else implies an unhandled filter
+                hint = self.tables.get(prefix)
+                if hint is None or (table is not None and hint != table):
+                    return None
+            if hint is not None:
+                candidates = {candidate for candidate in candidates if candidate[0] == hint}
+            if len(candidates) == 1:
+                return next(iter(candidates))
+            return None
+        return None
+
+    def is_numeric(self, table: str, column: str) -> bool:
+        type_ = self.column_types.get((table, column), "").upper()
+        return any(name in type_ for name in ("INT", "REAL", "NUM", "DEC", "FLOAT", "DOUBLE"))
+
+def _reflect_names():
+    tables, column_types = {}, {}
+    for table, info in get_catalog().tables().items():
+        if info["kind"] != "table":
+            continue
+        tables[table] = [column["name"] for column in info["columns"]]
+        for column in info["columns"]:
+            column_types[(table, column["name"])] = column["type"]
+    return SchemaNameIndex(tables, column_types)
+
+def _literal(index: SchemaNameIndex, table: str, column: str, value: str, quote) -> tuple:
+    """Return (column expression, SQL literal) for an equality filter."""
+    if value[:1] in ("'", '"'):
+        value = value[1:-1]
+    if index.is_numeric(table, column) and re.fullmatch(r"-?\d+(?:\.\d+)?", value):
+        return quote(column), value
+    # Text filters ignore case so "boeing" matches "Boeing"
+    return f"LOWER({quote(column)})", "'" + value.lower().replace("'", "''") + "'"
+
+def _count_distinct(question, index, quote):
+    match = re.fullmatch(
+        r"(?:how many|count(?: the)?|what is the number of) (?:unique|distinct|different) (?P<phrase>.+?)"
+        + _FILLER + r"(?: in (?:the )?(?P<table>\w+)(?: table)?)?", question, re.IGNORECASE)
+    if not match:
+        return None
+    table = index.resolve_table(match.group("table")) if match.group("table") else None
+    if match.group("table") and table is None:
+        return None
+    resolved = index.resolve_column(match.group("phrase"), table)
+    if not resolved:
+        return None
+    table, column = resolved
+    return f"SELECT COUNT(DISTINCT {quote(column)}) FROM {quote(table)}"
+
+def _count_filtered(question, index, quote):
+    match = re.fullmatch(
+        r"(?:how many|count(?: the)?|what is the number of) (?P<phrase>.+?)(?: are there)? "
+        r"(?:with|where|whose|that have) (?:the |a )?(?P<column>[\w ]+?) (?:is |= |of )?" + _VALUE,
+        question, re.IGNORECASE)
+    if not match:
+        return None
+    table = index.resolve_table(match.group("phrase"))
+    resolved = table and index.resolve_column(match.group("column"), table)
+    if not resolved:
+        return None
+    expression, literal = _literal(index, table, resolved[1], match.group("value"), quote)
+    return f"SELECT COUNT(*) FROM {quote(table)} WHERE {expression} = {literal}"
+
+def _count_rows(question, index, quote):
+    match = re.fullmatch(
+        r"(?:how many|count(?: the| all)?|what is the number of) (?P<phrase>[\w ]+?)" + _FILLER,
+        question, re.IGNORECASE)
+    table = match and index.resolve_table(match.group("phrase"))
+    if not table:
+        return None
+    return f"SELECT COUNT(*) FROM {quote(table)}"
+
+def _list_distinct(question, index, quote):
+    match = re.fullmatch(
+        r"(?:list|show|show me|what are|get) (?:all )?(?:the )?(?:unique|distinct|different) (?P<phrase>.+?)"
+        + _FILLER + r"(?: in (?:the )?(?P<table>\w+)(?: table)?)?", question, re.IGNORECASE)
+    if not match:
+        return None
+    table = index.resolve_table(match.group("table")) if match.group("table") else None
+    if match.group("table") and table is None:
+        return None
+    resolved = index.resolve_column(match.group("phrase"), table)
+    if not resolved:
+        return None
+    table, column = resolved
+    return f"SELECT DISTINCT {quote(column)} FROM {quote(table)}"
+
+def _lookup_filtered(question, index, quote):
+    match = re.fullmatch(
+        r"(?:list|show|show me|find|get|which are) (?:all )?(?:the )?(?P<phrase>[\w ]+?) "
+        r"(?:with|where|whose|that have) (?:the |a )?(?P<column>[\w ]+?) (?:is |= |of )?" + _VALUE,
+        question, re.IGNORECASE)
+    if not match:
+        return None
+    table = index.resolve_table(match.group("phrase"))
+    resolved = table and index.resolve_column(match.group("column"), table)
+    if not resolved:
+        return None
+    expression, literal = _literal(index, table, resolved[1], match.group("value"), quote)
+    return f"SELECT * FROM {quote(table)} WHERE {expression} = {literal}"
+
+DEFAULT_RULES = [
+    ("count_distinct", _count_distinct),
+    ("count_filtered", _count_filtered),
+    ("count_rows", _count_rows),
+    ("list_distinct", _list_distinct),
+    ("lookup_filtered", _lookup_filtered),
+]
+
+class FastPath:
+    """Rule/template matcher that turns high-confidence questions straight into SQL."""
+
+    def __init__(self, index_fn=None, rules=None, quote=None):
+        self._index_fn = index_fn or _reflect_names
+        self._index = None
+        self._catalog_version = None
+        self._quote = quote
+        self.rules = list(rules or DEFAULT_RULES)
+        self._lock = threading.Lock()
+        self._stats = {"served": 0, "fallbacks": 0, "rules": {}}
+
+    def register_rule(self, name: str, rule):
+        """Add a rule: rule(question, index, quote) -> SQL or None. Earlier rules win."""
+        self.rules.append((name, rule))
+
+    def refresh(self):
+        """Rebuild the name index (e.g. after DDL changes)."""
+        self._index = None
+
+    def warm(self):
+        """Reflect table and column names now instead of on the first question."""
+        self._ensure_index()
+
+    def _ensure_index(self):
+        if self._index_fn is _reflect_names:
+            # Rebuild after DDL changes picked up by the catalog
+            catalog = get_catalog()
+            catalog.tables()
+            if catalog.version != self._catalog_version:
+                self._index, self._catalog_version = None, catalog.version
+        if self._index is None:
+            self._index = self._index_fn()
+            if self._quote is None:
+                self._quote = get_engine().dialect.identifier_preparer.quote
+        return self._index
+
+    def match(self, question: str):
+        """Return (rule name, SQL) for a confidently matched question, else None."""
+        normalized = " ".join(question.strip().rstrip("?.!").split())
+        index = self._ensure_index()
+        for name, rule in self.rules:
+            try:
+                sql = rule(normalized, index, self._quote)
+            except Exception as e:
+                logger.warning(f"Fast path rule {name} failed: {str(e)}")
+                continue
+            if sql:
+                return name, sql
+        return None
+
+    def record(self, rule_name=None):
+        """Record whether a question was served by the fast path (rule name) or fell back."""
+        with self._lock:
+            if rule_name:
+                self._stats["served"] += 1
+                self._stats["rules"][rule_name] = self._stats["rules"].get(rule_name, 0) + 1
+            else:
+                self._stats["fallbacks"] += 1
+
+    def stats(self) -> dict:
+        """Return served/fallback counts and the fraction of traffic served."""
+        with self._lock:
+            stats = {"served": self._stats["served"], "fallbacks": self._stats["fallbacks"],
+                     "rules": dict(self._stats["rules"])}
+        total = stats["served"] + stats["fallbacks"]
+        stats["served_fraction"] = stats["served"] / total if total else 0.0
+        return stats
+
+def initialize_fast_path():
+    """Initialize the fast path, or return None when disabled in config."""
+    if not CONFIG["fast_path_enabled"]:
+        return None
+    logger.info("Initialized deterministic fast path")
+    return FastPath()
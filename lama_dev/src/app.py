@@ -0,0 +1,216 @@
+"""
+src/app.py: Lazily initialized application container for the text-to-SQL pipeline.
+- Creates each component (LLM, database, embeddings, schema index, answer cache, MCP
+  client, agent executor, fast path, candidate generator) on first use, importing its module only then.
+- prewarm() loads the model and embeddings, primes the DB pool, loads the metadata
+  catalog and syncs the schema index on background threads, so a worker can accept requests while it warms up.
+- startup_report() returns how long each component took to create and warm.
+- Components can be supplied up front (e.g. a stub LLM) instead of being created.
+"""
+
+import threading
+import time
+from src.config.config import CONFIG
+from src.utils.logging import setup_logging
+
+logger = setup_logging(__name__)
+
+COMPONENTS = ("llm", "db", "embeddings", "vector_store", "answer_cache", "mcp_client", "executor", "fast_path",
+              "candidates")
+
+# Created before the component itself, so creation times do not include dependencies
+_DEPENDENCIES = {
+    "vector_store": ("embeddings",),
+    "answer_cache": ("embeddings",),
+    "mcp_client": ("db", "vector_store"),
+    "executor": ("llm", "db", "mcp_client"),
+    "candidates": ("llm",),
+}
+
+def _create_llm(app):
+    from src.core.llm import initialize_llm
+    return initialize_llm()
+
+def _create_db(app):
+    from src.core.database import initialize_database
+    return initialize_database()
+
+def _create_embeddings(app):
+    from src.core.schema_retrieval import initialize_embeddings
+    return initialize_embeddings()
+
+def _create_vector_store(app):
+    from src.core.schema_retrieval import initialize_vector_store
+    return initialize_vector_store(app.embeddings)
+
+def _create_answer_cache(app):
+    from src.core.answer_cache import initialize_answer_cache
+    return initialize_answer_cache(app.embeddings)
+
+def _create_mcp_client(app):
+    from src.tools.mcp_tools import initialize_mcp_tools
+    return initialize_mcp_tools(app.db, app.vector_store)
+
+def _create_executor(app):
+    from src.agents.agent import initialize_agent
+    return initialize_agent(app.llm, app.db, app.mcp_client)
+
+def _create_fast_path(app):
+    from src.agents.fast_path import initialize_fast_path
+    return initialize_fast_path()
+
+def _create_candidates(app):
+    from src.agents.candidates import initialize_candidates
+    return initialize_candidates(app.llm)
+
+_FACTORIES = {
+    "llm": _create_llm,
+    "db": _create_db,
+    "embeddings": _create_embeddings,
+    "vector_store": _create_vector_store,
+    "answer_cache": _create_answer_cache,
+    "mcp_client": _create_mcp_client,
+    "executor": _create_executor,
+    "fast_path": _create_fast_path,
+    "candidates": _create_candidates,
+}
+
+def _warm_llm(app):
+    llm = app.llm
+    if CONFIG["prewarm_llm"]:
+        # Forces Ollama to load the model into memory (or opens the Bedrock connection)
+        llm.invoke("Reply with OK.")
+
+def _warm_schema(app):
+    if app.embeddings is not None:
+        app.embeddings.embed_query("warm up")
+    if hasattr(app.vector_store, "warm"):
+        app.vector_store.warm()
+
+def _warm_database(app):
+    from src.core.catalog import get_catalog
+    from src.core.database import prime_pool
+    app.get("db")
+    prime_pool()
+    get_catalog().tables()
+    if app.fast_path is not None:
+        app.fast_path.warm()
+
+def _warm_agent(app):
+    app.get("executor")
+    app.get("answer_cache")
+    app.get("candidates")
+
+# Independent groups; each runs on its own thread during prewarm()
+_WARM_TASKS = {
+    "llm": _warm_llm,
+    "schema": _warm_schema,
+    "database": _warm_database,
+    "agent": _warm_agent,
+}
+
+class AppContainer:
+    """Holds the pipeline components and creates each one on first access."""
+
+    def __init__(self, **components):
+        unknown = set(components) - set(COMPONENTS)
+        if unknown:
+            raise ValueError(f"Unknown components: {sorted(unknown)}")
+        self._components = dict(components)
+        self._locks = {name: threading.Lock() for name in COMPONENTS}
+        self._started = time.perf_counter()
+        self._timings = {}
+        self._warm_timings = {}
+        self._warm_threads = []
+        self._ready = threading.Event()
+        self._ready_ms = None
+
+    def get(self, name: str):
+        """Return a component, creating it (and its dependencies) if needed."""
+        if name in self._components:
+            return self._components[name]
+        for dependency in _DEPENDENCIES.get(name, ()):
+            self.get(dependency)
+        with self._locks[name]:
+            if name not in self._components:
+                started = time.perf_counter()
+                self._components[name] = _FACTORIES[name](self)
+                self._timings[name] = round((time.perf_counter() - started) * 1000, 3)
+                logger.info(f"Initialized {name} in {self._timings[name]} ms")
+        return self._components[name]
+
+    llm = property(lambda self: self.get("llm"))
+    db = property(lambda self: self.get("db"))
+    embeddings = property(lambda self: self.get("embeddings"))
+    vector_store = property(lambda self: self.get("vector_store"))
+    answer_cache = property(lambda self: self.get("answer_cache"))
+    mcp_client = property(lambda self: self.get("mcp_client"))
+    executor = property(lambda self: self.get("executor"))
+    fast_path = property(lambda self: self.get("fast_path"))
+    candidates = property(lambda self: self.get("candidates"))
+
+    def _run_warm_task(self, name: str, task):
+        started = time.perf_counter()
+        try:
+            task(self)
+            self._warm_timings[name] = round((time.perf_counter() - started) * 1000, 3)
+        except Exception as e:
+            # Not fatal: the component is created again on the first request
+            self._warm_timings[name] = f"error: {str(e)}"
+            logger.warning(f"Prewarm of {name} failed: {str(e)}")
+
+    def prewarm(self, background: bool = True):
+        """Warm all components concurrently; returns immediately when background is True."""
+        if self._warm_threads:
+            return self
+        self._warm_threads = [
+            threading.Thread(target=self._run_warm_task, args=(name, task),
+                             name=f"prewarm-{name}", daemon=True)
+            for name, task in _WARM_TASKS.items()
+        ]
+        for thread in self._warm_threads:
+            thread.start()
+
+        def _finish():
+            for thread in self._warm_threads:
+                thread.join()
+            self._ready_ms = round((time.perf_counter() - self._started) * 1000, 3)
+            self._ready.set()
+            logger.info(f"Prewarm finished: {self.startup_report()}")
+
+        if background:
+            threading.Thread(target=_finish, name="prewarm", daemon=True).start()
+        else:
+            _finish()
+        return self
+
+    def wait_ready(self, timeout: float = None) -> bool:
+        """Block until prewarm has finished; False on timeout or if prewarm never ran."""
+        if not self._warm_threads:
+            return False
+        return self._ready.wait(timeout)
+
+    def is_ready(self) -> bool:
+        return self._ready.is_set()
+
+    def startup_report(self) -> dict:
+        """Creation and warm-up milliseconds per component since the container was built."""
+        return {
+            "uptime_ms": round((time.perf_counter() - self._started) * 1000, 3),
+            "ready": self._ready.is_set(),
+            "ready_ms": self._ready_ms,
+            "created_ms": dict(self._timings),
+            "warm_ms": dict(self._warm_timings),
+        }
+
+_app = None
+_app_lock = threading.Lock()
+
+def get_app() -> AppContainer:
+    """Return the process-wide container, creating it (empty) on first use."""
+    global _app
+    if _app is None:
+        with _app_lock:
+            if _app is None:
+                _app = AppContainer()
+    return _app
@@ -48,7 +48,7 @@ class TextToSQLAgents:
         self.corrector_chain = LLMChain(llm=llm, prompt=corrector_prompt)
 
     def parser_agent(self, question: str, schema: Dict) -> Dict:
-        schema_json = json.dumps(schema, indent=2)
+        schema_json = json.dumps(schema, separators=(",", ":"))
         response = self.parser_chain.run(question=question, schema=schema_json)
         # Mock parsing (replace with LLM output parsing)
         parsed = {
@@ -66,8 +66,8 @@ class TextToSQLAgents:
         return parsed
 
     def sql_generator_agent(self, parsed: Dict, schema: Dict) -> str:
-        schema_json = json.dumps(schema, indent=2)
-        parsed_json = json.dumps(parsed, indent=2)
+        schema_json = json.dumps(schema, separators=(",", ":"))
+        parsed_json = json.dumps(parsed, separators=(",", ":"))
         query = self.generator_chain.run(schema=schema_json, parsed=parsed_json).strip()
         # Mock query
         query = "SELECT c.name FROM Customers c JOIN Orders o ON c.id = o.customer_id WHERE c.city = 'New York' AND o.amount > 100"
@@ -124,8 +124,8 @@ class TextToSQLAgents:
         return True, "Valid"
 
     def corrector_agent(self, query: str, error: str, parsed: Dict, schema: Dict) -> str:
-        schema_json = json.dumps(schema, indent=2)
-        parsed_json = json.dumps(parsed, indent=2)
+        schema_json = json.dumps(schema, separators=(",", ":"))
+        parsed_json = json.dumps(parsed, separators=(",", ":"))
         corrected_query = self.corrector_chain.run(
             schema=schema_json, query=query, error=error, parsed=parsed_json
         ).strip()
@@ -12,6 +12,26 @@ CONFIG = {
     "ollama_model": "llama3",  # Ollama model for text-to-SQL
     "ollama_embedding_model": "nomic-embed-text",  # Ollama model for embeddings
     "bedrock_model": "anthropic.claude-3-sonnet-20240229-v1:0",  # Claude model ID
+    # Optional pool of LLM backends routed by least outstanding requests, e.g.
+    # [{"name": "gpu-1", "provider": "ollama", "base_url": "http://gpu-1:11434"},
+    #  {"name": "bedrock", "provider": "bedrock"},
+    #  {"name": "small", "provider": "ollama", "model": "llama3.2:3b", "tier": "easy"}]
+    "llm_backends": None,  # None: a single backend from llm_provider
+    "llm_router_failure_threshold": 3,  # Consecutive failures before a backend's circuit opens
+    "llm_router_cooldown_seconds": 30,  # Open circuit waits this long before a trial request
+    "llm_router_hedge_percentile": 0.95,  # Hedge to a second backend past this latency percentile (None disables)
+    "llm_router_hedge_min_samples": 20,  # Latency samples needed before hedging a backend
+    "llm_router_easy_max_words": 12,  # Longer questions are never routed to the "easy" tier
+    "llm_deterministic": True,  # Temperature 0 and greedy decoding; makes LLM responses cacheable
+    "llm_temperature": 0.7,  # Used only when llm_deterministic is False
+    "llm_streaming": True,  # Stream tokens and cancel generation once the tool call or final answer is complete
+    "llm_stop_sequences": ["\nObservation", "\nQuestion:"],  # Provider-side stops; the model must not invent tool results
+    "llm_cache_enabled": True,  # Persistent cache of LLM generations keyed on (model, prompt, params)
+    "llm_cache_path": ".llm_cache.db",
+    "llm_cache_max_entries": 10000,
+    "llm_cache_max_bytes": 256 * 1024 * 1024,
+    "ollama_keep_alive": "30m",  # Keep the model loaded so the shared prompt prefix stays cached
+    "bedrock_prompt_caching": False,  # Mark the static prompt prefix as a cache point (supported Claude models only)
     "database_uri": "sqlite:///sample.db",
     "schema": """
 CREATE TABLE airplanes (
@@ -20,7 +40,95 @@ CREATE TABLE airplanes (
     Type VARCHAR(10)
 );
 """,
+    "db_pool_size": 5,  # Pooled connections shared by agent tools, verification and MCP
+    "db_max_overflow": 10,
+    "db_pool_timeout": 30,  # Seconds to wait for a free connection
+    "db_pool_recycle": 3600,
+    "db_pool_pre_ping": True,
+    "sqlite_wal": True,  # WAL lets readers run concurrently with a writer
+    "sqlite_busy_timeout_ms": 5000,
+    # Read replicas of database_uri that queries are spread over (src/core/db_router.py): SQLite
+    # paths (opened read-only; {"path": ..., "immutable": True} for copies that never change)
+    # or SQLAlchemy URIs, e.g. ["sample.db", {"path": "/mnt/ssd2/sample.db", "immutable": True}]
+    "database_replicas": [],
+    "databases": {},  # Other SQLite databases attached to every connection, e.g. {"sales": "sales.db"}
+    "db_router_primary_reads": True,  # The primary serves reads alongside its replicas
+    "result_max_rows": 100,  # Rows kept in the preview returned to the agent/API
+    "result_max_bytes": 64000,  # Approximate size cap for that preview
+    "fetch_batch_size": 1000,  # Rows per fetchmany() when streaming results
+    "catalog_snapshot_path": ".schema_catalog.json",  # Reflected metadata reused across restarts (None disables)
+    "catalog_check_interval_seconds": 2.0,  # How often to poll PRAGMA schema_version for DDL changes
+    "sql_validation_enabled": True,  # Check SELECT-only, tables/columns and the query plan before executing
+    "sql_max_estimated_rows": 50_000_000,  # Reject plans estimated to touch more rows (e.g. cross joins)
+    "sql_full_scan_warn_rows": 100_000,  # Flag full scans of tables at least this large
+    "sql_max_result_rows": 100_000,  # Stop fetching a result after this many rows (0 disables)
+    "sql_statement_timeout_seconds": 30,  # Cancel SQLite statements running longer (0 disables)
+    "result_cache_enabled": True,  # Reuse results of repeated queries until the data changes
+    "result_cache_invalidation": "data_version",  # "data_version" (any write) or "triggers" (per table; adds triggers)
+    "result_cache_max_entries": 4096,
+    "result_cache_max_bytes": 64 * 1024 * 1024,  # Approximate memory held by cached results
+    "advisor_enabled": True,  # Record executed SQL to recommend indexes and summary tables (src/core/advisor.py)
+    "advisor_auto_apply": False,  # Create recommended indexes and summary tables automatically
+    "advisor_review_interval": 200,  # Recorded queries between automatic reviews
+    "advisor_rewrite_enabled": True,  # Answer covered aggregates from summary tables
+    "advisor_min_occurrences": 3,  # Times a query template must recur before it drives a recommendation
+    "advisor_min_table_rows": 10_000,  # Smaller tables are cheap to scan; no indexes or summaries
+    "advisor_summary_max_ratio": 0.1,  # Summary groups per base row above this are not worth keeping
+    "advisor_max_templates": 1000,
+    "bulk_load_chunk_rows": 100_000,  # Rows per pandas/pyarrow chunk read from a file (src/core/bulk_load.py)
+    "bulk_load_commit_rows": 500_000,  # Rows per transaction; progress is checkpointed at each commit
+    "bulk_load_journal_mode": "WAL",  # Keep WAL so readers see the old data during a replace; "OFF" for offline loads
+    "bulk_load_synchronous": "OFF",  # Fastest; a power loss mid-load can damage the file ("NORMAL" is safe with WAL)
+    "bulk_load_cache_size_mb": 256,  # Page cache of the loading connection (index builds sort in it)
+    "bulk_load_defer_indexes": False,  # Appends: drop indexes for the load and rebuild them after
+    "bulk_load_progress_seconds": 10,  # Interval between progress log lines
+    "database_seed_files": [],  # [{"path": "data/airplanes.csv", "table": "airplanes"}] bulk-loaded into empty tables
+    "generation_mode": "react",  # "react" (agent with retries) or "candidates" (parallel candidates, voted)
+    "candidate_count": 3,  # Candidates per question; match the LLM backend's parallelism
+    "fast_path_enabled": True,  # Answer template-matchable questions without the LLM
+    "verify_sample_rate": 0.0,  # Fraction of answers re-executed to detect drift (0 disables)
     "chroma_collection": "schema_store",
+    "chroma_persist_directory": ".schema_index",  # On-disk schema index reused across restarts
+    "schema_top_k": 5,  # Tables returned per schema retrieval
+    "schema_token_budget": 2000,  # Prompt tokens allowed for retrieved schema
+    "schema_format": "compact",  # "compact" (table(col:type, ...)) or "ddl" (CREATE TABLE statements)
+    "prompt_token_budget": 6000,  # Whole agent prompt; the scratchpad gets what schema and examples leave
+    "prompt_tokenizer": "tiktoken",  # "tiktoken" (if installed, else approximated) or "approximate"
+    "prompt_examples": [],  # Few-shot examples: [{"question": ..., "sql": ...}], most similar first
+    "prompt_examples_token_budget": 500,
+    "scratchpad_keep_steps": 2,  # Latest steps whose observations stay in full
+    "scratchpad_observation_tokens": 150,  # Older observations are cut to this many tokens
+    "schema_sample_values": 3,  # Distinct sample values per text column (0 disables)
+    "schema_column_documents": True,  # Also index one document per column
+    "answer_cache_enabled": True,  # Reuse generated SQL for repeated/reworded questions
+    "answer_cache_max_entries": 1024,
+    "answer_cache_ttl_seconds": 3600,
+    "answer_cache_similarity_threshold": 0.95,  # Cosine similarity for near-duplicate questions
+    "embedding_service_enabled": True,  # Batch and cache embedding calls (src/core/embedding_service.py)
+    "embedding_batch_window_ms": 5,  # How long the first queued text waits for others to share its batch
+    "embedding_max_batch_size": 64,  # Texts per embedding call
+    "embedding_batch_workers": 2,  # Batches in flight at once; match the embedding server's parallelism
+    "embedding_batch_queries": True,  # Embed questions like documents (same vector for Ollama); False for models that differ
+    "embedding_cache_max_entries": 50_000,  # Question and document vectors kept (LRU)
+    "embedding_cache_path": ".embedding_cache",  # Memory-mapped vectors reused across restarts (None: memory only)
+    "batch_concurrency": 4,  # Questions in flight at once for process_batch
+    "batch_timeout_seconds": 120,  # Per-question timeout for process_batch
+    "prewarm_enabled": True,  # Load model, embeddings, DB pool and schema index in the background at startup
+    "prewarm_llm": True,  # Send a one-line prompt so the model is resident before the first request
+    "mcp_transport": "local",  # "local" (in process), "socket" or "stdio" (separate tool server)
+    "mcp_socket_path": "/tmp/text_to_sql_mcp.sock",
+    "mcp_server_command": ["python", "-m", "src.tools.mcp_server", "--stdio"],
+    "mcp_timeout_seconds": 30,  # Wait for a remote tool server's answer; a server that misses it is reconnected
+    "mcp_batch_workers": 4,  # Threads running independent tool calls of one batch
+    "schema_include_table_list": True,  # Append all table names to the retrieved schema
+    "server_host": "127.0.0.1",
+    "server_port": 8080,
+    "server_workers": 4,  # Match the LLM backend's parallelism (e.g. OLLAMA_NUM_PARALLEL)
+    "server_queue_size": 32,  # Requests waiting for a worker; beyond this the server answers 429
+    "server_max_streams": 4,  # Concurrent POST /stream responses (each holds a DB connection); beyond this 429
+    "server_request_timeout_seconds": 60,  # Default per-request deadline, including queue time
+    "server_drain_timeout_seconds": 30,  # Time allowed for in-flight requests on shutdown
+    "trace_log_path": None,  # Append one JSON line per request trace here (None disables)
     "log_level": "INFO",
 }
 
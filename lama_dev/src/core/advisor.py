@@ -0,0 +1,520 @@
+"""
+src/core/advisor.py: Workload-driven index and summary-table advisor.
+- Every successful query through run_query (agent tool, execute_sql_query, fast path,
+  candidates) is recorded by its normalized template with occurrences and execution time.
+- recommend() parses the recurring templates for filter, join, GROUP BY and ORDER BY ...
+  LIMIT columns and suggests SQLite indexes the catalog's tables do not have yet, plus
+  summary tables (_agg_*) for recurring single-table COUNT/SUM/AVG aggregates.
+- apply() creates them (or advisor_auto_apply does it periodically). Summary tables hold
+  row counts, sums and non-null counts per group and are kept current by triggers on the
+  base table, inside the same transaction as each write.
+- rewrite() answers a matching aggregate from the smallest summary table that covers it;
+  run_query executes the rewritten SQL and falls back to the original if it fails.
+- Only single-table aggregates without DISTINCT, joins, subqueries or window functions
+  are rewritten, and only when every other column they use is a summary group column.
+"""
+
+import json
+import re
+import threading
+import time
+from sqlalchemy import inspect, text
+from src.config.config import CONFIG
+from src.core.catalog import SUMMARY_PREFIX, get_catalog
+from src.core.prompt_builder import compact_type
+from src.core.result_cache import canonicalize, tokenize
+from src.core.sql_validation import table_references
+from src.utils.logging import setup_logging
+
+logger = setup_logging(__name__)
+
+SUMMARY_REGISTRY = "_summary_tables"
+
+_CLAUSES = {"select", "from", "where", "on", "group", "having", "order", "limit"}
+_AGGREGATES = {"count", "sum", "avg", "min", "max", "total", "group_concat"}
+_EQUALITY = {"=", "in", "is"}
+_RANGE = {"<", ">", "between"}
+_NOT_REWRITABLE = {"join", "union", "intersect", "except", "over", "distinct", "window"}
+
+def _quote(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+def _identifier(token: tuple) -> str:
+    kind, value = token[0], token[1]
+    return value[1:-1] if kind == "quoted" else value
+
+def _object_name(*parts) -> str:
+    return re.sub(r"\W+", "_", "_".join(parts)).strip("_").lower()
+
+def parse_query(query: str, catalog) -> dict:
+    """Columns a query filters, joins, groups and orders on, and its simple aggregates."""
+    tokens = tokenize(query.strip().rstrip(";"))
+    values = [token[1] for token in tokens]
+    lowered = [value.lower() for value in values]
+    references = table_references(values)
+    index = catalog.name_index()
+    tables = {alias: table for alias, table in references.items() if table.lower() in index}
+
+    def resolve(position: int):
+        """(table, column, last token position) for a column reference at position, or None."""
+        if position + 2 < len(tokens) and values[position + 1] == ".":
+            table = tables.get(_identifier(tokens[position]).lower())
+            column = _identifier(tokens[position + 2])
+            columns = index[table.lower()]["columns"] if table else {}
+            return (table, columns[column.lower()], position + 2) if column.lower() in columns else None
+        if tokens[position][0] not in ("word", "quoted"):
+            return None
+        column = _identifier(tokens[position]).lower()
+        owners = {table for table in tables.values() if column in index[table.lower()]["columns"]}
+        if len(owners) != 1:
+            return None
+        table = owners.pop()
+        return table, index[table.lower()]["columns"][column], position
+
+    parsed = {"tables": sorted(set(tables.values())), "equality": [], "range": [], "join": [],
+              "group": [], "order": [], "limit": "limit" in lowered, "aggregates": [], "columns": [],
+              "rewritable": lowered.count("select") == 1 and not _NOT_REWRITABLE & set(lowered)}
+    clause, position = None, 0
+    while position < len(tokens):
+        word = lowered[position]
+        if tokens[position][0] == "word" and word in _CLAUSES:
+            clause = word
+            position += 1
+            continue
+        if word in _AGGREGATES and position + 1 < len(tokens) and values[position + 1] == "(":
+            close = lowered.index(")", position) if ")" in lowered[position:] else len(tokens)
+            inner = lowered[position + 2:close]
+            target = resolve(position + 2) if inner and inner != ["*"] else None
+            simple = word in ("count", "sum", "avg") and (
+                (inner == ["*"] and word == "count") or (target is not None and target[2] == close - 1))
+            if simple:
+                following = tokens[close + 1] if close + 1 < len(tokens) else ("symbol", "", 0, 0)
+                parsed["aggregates"].append({
+                    "function": word, "table": target[0] if target else None,
+                    "column": target[1] if target else None, "start": tokens[position][2],
+                    "end": tokens[close][3],
+                    # A whole select-list item (followed by "," or FROM), so it can be given a name
+                    "select_item": clause == "select" and following[1].lower() in (",", "from"),
+                })
+                position = close + 1
+                continue
+            parsed["rewritable"] = False
+        if position > 0 and lowered[position - 1] == "as":
+            position += 1
+            continue
+        target = resolve(position) if position + 1 >= len(tokens) or values[position + 1] != "(" else None
+        if target is None:
+            position += 1
+            continue
+        table, column, last = target
+        column_ref = (table, column)
+        parsed["columns"].append(column_ref)
+        following = lowered[last + 1] if last + 1 < len(tokens) else ""
+        preceding = lowered[position - 1] if position > 0 else ""
+        if clause in ("where", "on"):
+            operator = following if following in _EQUALITY | _RANGE else preceding
+            if clause == "on" and operator == "=":
+                parsed["join"].append(column_ref)
+            elif operator in _EQUALITY:
+                parsed["equality"].append(column_ref)
+            elif operator in _RANGE:
+                parsed["range"].append(column_ref)
+        elif clause == "group":
+            parsed["group"].append(column_ref)
+        elif clause == "order":
+            parsed["order"].append(column_ref)
+        position = last + 1
+    parsed["rewritable"] = parsed["rewritable"] and len(parsed["tables"]) == 1 and bool(parsed["aggregates"])
+    return parsed
+
+def _dedupe(items) -> list:
+    return list(dict.fromkeys(items))
+
+def index_candidates(parsed: dict) -> list:
+    """[(table, (columns...))] indexes that would serve the query's filters, joins or top-N order."""
+    candidates = []
+    for table in parsed["tables"]:
+        equality = _dedupe(column for t, column in parsed["equality"] if t == table)
+        ranges = _dedupe(column for t, column in parsed["range"] if t == table and column not in equality)
+        if equality or ranges:
+            candidates.append((table, tuple(equality + ranges[:1])))
+        for t, column in _dedupe(parsed["join"]):
+            if t == table:
+                candidates.append((table, (column,)))
+        order = [column for t, column in parsed["order"] if t == table]
+        if parsed["limit"] and order and len(parsed["tables"]) == 1 and not ranges:
+            candidates.append((table, tuple(_dedupe(equality + order[:1]))))
+    return _dedupe(candidates)
+
+def summary_candidate(parsed: dict):
+    """(table, group columns, aggregated columns) for a rewritable aggregate, or None."""
+    if not parsed["rewritable"]:
+        return None
+    table = parsed["tables"][0]
+    return (table, tuple(sorted(set(column for _, column in parsed["columns"]))),
+            tuple(sorted(set(a["column"] for a in parsed["aggregates"] if a["column"]))))
+
+def summary_ddl(name: str, table: str, group: tuple, aggregated: tuple) -> list:
+    """Statements that create, fill and maintain a summary table."""
+    quoted, base = _quote(name), _quote(table)
+    columns = [_quote(column) for column in group] + ["_rows"]
+    for column in aggregated:
+        columns += [_quote(f"_sum_{column}"), _quote(f"_cnt_{column}")]
+    select = [_quote(column) for column in group] + ["COUNT(*)"]
+    for column in aggregated:
+        select += [f"COALESCE(SUM({_quote(column)}), 0)", f"COUNT({_quote(column)})"]
+
+    def match(row: str) -> str:
+        return " AND ".join(f"{_quote(c)} IS {row}.{_quote(c)}" for c in group) or "1"
+
+    def change(row: str, sign: str) -> str:
+        assignments = [f"_rows = _rows {sign} 1"]
+        for column in aggregated:
+            total, count = _quote(f"_sum_{column}"), _quote(f"_cnt_{column}")
+            assignments += [f"{total} = {total} {sign} COALESCE({row}.{_quote(column)}, 0)",
+                            f"{count} = {count} {sign} ({row}.{_quote(column)} IS NOT NULL)"]
+        return f"UPDATE {quoted} SET {', '.join(assignments)} WHERE {match(row)};"
+
+    def add(row: str) -> str:
+        seed = [f"{row}.{_quote(column)}" for column in group] + ["0"] * (1 + 2 * len(aggregated))
+        return (f"INSERT INTO {quoted} ({', '.join(columns)}) SELECT {', '.join(seed)} "
+                f"WHERE NOT EXISTS (SELECT 1 FROM {quoted} WHERE {match(row)}); {change(row, '+')}")
+
+    def remove(row: str) -> str:
+        return f"{change(row, '-')} DELETE FROM {quoted} WHERE _rows <= 0 AND {match(row)};"
+
+    watched = ", ".join(_quote(column) for column in _dedupe(group + aggregated))
+    statements = [
+        f"CREATE TABLE {quoted} ({', '.join(columns)})",
+        f"INSERT INTO {quoted} ({', '.join(columns)}) SELECT {', '.join(select)} FROM {base}"
+        + (f" GROUP BY {', '.join(_quote(column) for column in group)}" if group else ""),
+        f"CREATE TRIGGER {_quote(name + '_ins')} AFTER INSERT ON {base} BEGIN {add('NEW')} END",
+        f"CREATE TRIGGER {_quote(name + '_del')} AFTER DELETE ON {base} BEGIN {remove('OLD')} END",
+    ]
+    if watched:
+        # Updates of other columns cannot change the summary
+        statements.append(f"CREATE TRIGGER {_quote(name + '_upd')} AFTER UPDATE OF {watched} ON {base} "
+                          f"BEGIN {remove('OLD')} {add('NEW')} END")
+    if group:
+        statements.append(f"CREATE INDEX {_quote(name + '_key')} ON {quoted} "
+                          f"({', '.join(_quote(column) for column in group)})")
+    return statements
+
+def refill_summaries(connection, table: str) -> list:
+    """Recompute the summaries of a table whose rows were replaced wholesale (DB-API connection,
+    inside the caller's transaction); returns their names."""
+    registered = connection.execute(
+        f"SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = '{SUMMARY_REGISTRY}'"
+    ).fetchone()
+    if not registered:
+        return []
+    names = []
+    for name, group, aggregated in connection.execute(
+            f"SELECT name, group_columns, aggregate_columns FROM {SUMMARY_REGISTRY} WHERE base_table = ?",
+            (table,)).fetchall():
+        connection.execute(f"DELETE FROM {_quote(name)}")
+        connection.execute(summary_ddl(name, table, tuple(json.loads(group)), tuple(json.loads(aggregated)))[1])
+        names.append(name)
+    return names
+
+def _aggregate_sql(aggregate: dict) -> str:
+    """Expression over a summary table equal to the original aggregate over the base rows."""
+    column = aggregate["column"]
+    if column is None:
+        return "COALESCE(SUM(_rows), 0)"
+    total, count = _quote(f"_sum_{column}"), _quote(f"_cnt_{column}")
+    if aggregate["function"] == "count":
+        return f"COALESCE(SUM({count}), 0)"
+    if aggregate["function"] == "sum":
+        return f"(CASE WHEN SUM({count}) > 0 THEN SUM({total}) END)"
+    return f"(SUM({total}) * 1.0 / NULLIF(SUM({count}), 0))"
+
+class WorkloadAdvisor:
+    """Records the executed workload of one SQLite database and manages its indexes and summaries."""
+
+    def __init__(self, engine):
+        self.engine = engine
+        self._lock = threading.Lock()
+        self._templates = {}
+        self._observations = 0
+        self._reviewing = False
+        self._summaries = None
+        self._schema_version = None
+        self._checked_at = 0.0
+        self._stats = {"observed": 0, "rewrites": 0, "rewrite_failures": 0, "indexes_created": 0,
+                       "summaries_created": 0}
+
+    def observe(self, query: str, elapsed_ms: float):
+        """Record one successful execution of query."""
+        template, _ = canonicalize(query)
+        with self._lock:
+            entry = self._templates.get(template)
+            if entry is None:
+                if len(self._templates) >= CONFIG["advisor_max_templates"]:
+                    # Forget the least frequent template
+                    del self._templates[min(self._templates, key=lambda t: self._templates[t]["count"])]
+                entry = self._templates[template] = {"query": query, "count": 0, "total_ms": 0.0}
+            entry["count"] += 1
+            entry["total_ms"] += elapsed_ms
+            self._stats["observed"] += 1
+            self._observations += 1
+            review = (CONFIG["advisor_auto_apply"] and not self._reviewing
+                      and self._observations >= CONFIG["advisor_review_interval"])
+            if review:
+                self._observations = 0
+                self._reviewing = True
+        if review:
+            threading.Thread(target=self._review, name="workload-advisor", daemon=True).start()
+
+    def _review(self):
+        try:
+            self.apply()
+        except Exception as e:
+            logger.warning(f"Automatic advisor review failed: {str(e)}")
+        finally:
+            with self._lock:
+                self._reviewing = False
+
+    def workload(self) -> list:
+        """Recorded templates, most expensive first."""
+        with self._lock:
+            entries = [dict(entry, template=template) for template, entry in self._templates.items()]
+        return sorted(entries, key=lambda entry: -entry["total_ms"])
+
+    def _existing_indexes(self, tables) -> dict:
+        """{table: [column tuples]} of current indexes, including the primary key."""
+        inspector = inspect(self.engine)
+        catalog = get_catalog(self.engine)
+        existing = {}
+        for table in tables:
+            info = catalog.get(table) or {}
+            keys = [tuple(index["column_names"]) for index in inspector.get_indexes(table)]
+            if info.get("primary_key"):
+                keys.append(tuple(info["primary_key"]))
+            existing[table] = keys
+        return existing
+
+    def recommend(self) -> list:
+        """Indexes and summary tables worth creating for the recorded workload, most valuable first."""
+        catalog = get_catalog(self.engine)
+        indexes, summaries = {}, {}
+        for entry in self.workload():
+            if entry["count"] < CONFIG["advisor_min_occurrences"]:
+                continue
+            try:
+                parsed = parse_query(entry["query"], catalog)
+            except Exception as e:
+                logger.debug(f"Could not analyze {entry['template']}: {str(e)}")
+                continue
+            for key in index_candidates(parsed):
+                benefit = indexes.setdefault(key, {"occurrences": 0, "total_ms": 0.0})
+                benefit["occurrences"] += entry["count"]
+                benefit["total_ms"] += entry["total_ms"]
+            candidate = summary_candidate(parsed)
+            if candidate:
+                table, group, aggregated = candidate
+                benefit = summaries.setdefault((table, group), {"occurrences": 0, "total_ms": 0.0,
+                                                                "aggregated": set()})
+                benefit["occurrences"] += entry["count"]
+                benefit["total_ms"] += entry["total_ms"]
+                benefit["aggregated"].update(aggregated)
+
+        def large(table: str) -> bool:
+            return (catalog.row_count(table) or 0) >= CONFIG["advisor_min_table_rows"]
+
+        existing = self._existing_indexes({table for table, _ in indexes if large(table)})
+        recommendations = []
+        for (table, columns), benefit in indexes.items():
+            if not large(table):
+                continue
+            info = catalog.get(table)
+            types = {c["name"]: c["type"] for c in info["columns"]}
+            rowid = len(columns) == 1 and columns == tuple(info["primary_key"]) and \
+                compact_type(types[columns[0]]) == "int"
+            covered = rowid or any(index[:len(columns)] == columns for index in existing[table])
+            # A longer recommendation for the same table that starts with these columns serves them too
+            covered = covered or any(t == table and len(c) > len(columns) and c[:len(columns)] == columns
+                                     for t, c in indexes if large(t))
+            if covered:
+                continue
+            name = _object_name("ix", table, *columns)
+            recommendations.append({
+                "kind": "index", "name": name, "table": table, "columns": list(columns), **benefit,
+                "ddl": [f"CREATE INDEX IF NOT EXISTS {_quote(name)} ON {_quote(table)} "
+                        f"({', '.join(_quote(column) for column in columns)})"],
+            })
+
+        current = self.summaries()
+        for (table, group), benefit in summaries.items():
+            if not large(table):
+                continue
+            aggregated = tuple(sorted(benefit.pop("aggregated")))
+            info = catalog.get(table)
+            types = {c["name"]: compact_type(c["type"]) for c in info["columns"]}
+            if any(types[column] not in ("int", "real", "num") for column in aggregated):
+                continue
+            if any(s["table"] == table and set(group) <= set(s["group"]) and set(aggregated) <= set(s["aggregated"])
+                   for s in current.values()):
+                continue
+            rows = catalog.row_count(table)
+            groups = self._group_count(table, group)
+            if groups > rows * CONFIG["advisor_summary_max_ratio"]:
+                continue
+            name = SUMMARY_PREFIX + _object_name(table, "by", *group) if group else SUMMARY_PREFIX + _object_name(table, "all")
+            recommendations.append({
+                "kind": "summary", "name": name, "table": table, "group_columns": list(group),
+                "aggregate_columns": list(aggregated), "groups": groups, **benefit,
+                "ddl": summary_ddl(name, table, group, aggregated),
+            })
+        return sorted(recommendations, key=lambda r: -r["total_ms"])
+
+    def _group_count(self, table: str, group: tuple) -> int:
+        if not group:
+            return 1
+        columns = ", ".join(_quote(column) for column in group)
+        with self.engine.connect() as connection:
+            return connection.execute(text(
+                f"SELECT COUNT(*) FROM (SELECT 1 FROM {_quote(table)} GROUP BY {columns})"
+            )).scalar()
+
+    def apply(self, recommendations=None) -> list:
+        """Create the given (default: all current) recommendations; returns the names created."""
+        recommendations = self.recommend() if recommendations is None else recommendations
+        created = []
+        for recommendation in recommendations:
+            started = time.perf_counter()
+            try:
+                # One transaction: a summary is filled and its triggers installed atomically
+                with self.engine.begin() as connection:
+                    for statement in recommendation["ddl"]:
+                        connection.exec_driver_sql(statement)
+                    if recommendation["kind"] == "summary":
+                        self._register(connection, recommendation)
+            except Exception as e:
+                logger.warning(f"Could not create {recommendation['kind']} {recommendation['name']}: {str(e)}")
+                continue
+            created.append(recommendation["name"])
+            with self._lock:
+                self._stats["indexes_created" if recommendation["kind"] == "index" else "summaries_created"] += 1
+            logger.info(f"Created {recommendation['kind']} {recommendation['name']} on {recommendation['table']} "
+                        f"in {(time.perf_counter() - started) * 1000:.1f} ms")
+        if created:
+            with self._lock:
+                self._summaries = None
+        return created
+
+    def _register(self, connection, recommendation: dict):
+        connection.exec_driver_sql(
+            f"CREATE TABLE IF NOT EXISTS {SUMMARY_REGISTRY} (name TEXT PRIMARY KEY, base_table TEXT NOT NULL, "
+            "group_columns TEXT NOT NULL, aggregate_columns TEXT NOT NULL, created_at REAL NOT NULL)"
+        )
+        connection.execute(text(
+            f"INSERT INTO {SUMMARY_REGISTRY} VALUES (:name, :table, :group, :aggregated, :created)"
+        ), {"name": recommendation["name"], "table": recommendation["table"],
+            "group": json.dumps(recommendation["group_columns"]),
+            "aggregated": json.dumps(recommendation["aggregate_columns"]), "created": time.time()})
+
+    def drop_summary(self, name: str):
+        """Remove a summary table, its triggers and its registry entry."""
+        with self.engine.begin() as connection:
+            for suffix in ("_ins", "_del", "_upd"):
+                connection.exec_driver_sql(f"DROP TRIGGER IF EXISTS {_quote(name + suffix)}")
+            connection.exec_driver_sql(f"DROP TABLE IF EXISTS {_quote(name)}")
+            connection.execute(text(f"DELETE FROM {SUMMARY_REGISTRY} WHERE name = :name"), {"name": name})
+        with self._lock:
+            self._summaries = None
+
+    def summaries(self) -> dict:
+        """{name: {"table", "group", "aggregated"}} of existing summary tables."""
+        now = time.monotonic()
+        with self._lock:
+            summaries, checked_at = self._summaries, self._checked_at
+        if summaries is not None and now - checked_at < CONFIG["catalog_check_interval_seconds"]:
+            return summaries
+        with self.engine.connect() as connection:
+            # Another process may have created or dropped summaries
+            schema_version = connection.exec_driver_sql("PRAGMA schema_version").scalar()
+            if summaries is None or schema_version != self._schema_version:
+                summaries = {}
+                exists = connection.exec_driver_sql(
+                    f"SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = '{SUMMARY_REGISTRY}'"
+                ).scalar()
+                if exists:
+                    for name, table, group, aggregated in connection.exec_driver_sql(
+                            f"SELECT name, base_table, group_columns, aggregate_columns FROM {SUMMARY_REGISTRY}"):
+                        summaries[name] = {"table": table, "group": json.loads(group),
+                                           "aggregated": json.loads(aggregated)}
+        with self._lock:
+            self._summaries, self._schema_version, self._checked_at = summaries, schema_version, now
+        return summaries
+
+    def rewrite(self, query: str):
+        """The query rewritten to read a summary table, or None if none covers it."""
+        summaries = self.summaries()
+        if not summaries:
+            return None
+        lowered = query.lower()
+        tables = {s["table"] for s in summaries.values() if s["table"].lower() in lowered}
+        if not tables:
+            return None
+        parsed = parse_query(query, get_catalog(self.engine))
+        if not parsed["rewritable"] or parsed["tables"][0] not in tables:
+            return None
+        table = parsed["tables"][0]
+        needed = {column for _, column in parsed["columns"]}
+        aggregated = {a["column"] for a in parsed["aggregates"] if a["column"]}
+        matches = [(len(s["group"]), name) for name, s in summaries.items()
+                   if s["table"] == table and needed <= set(s["group"]) and aggregated <= set(s["aggregated"])]
+        if not matches:
+            return None
+        name = min(matches)[1]
+
+        statement = query.strip().rstrip(";")
+        tokens = tokenize(statement)
+        edits = []
+        for position, token in enumerate(tokens[:-1]):
+            if token[1].lower() == "from":
+                following = tokens[position + 1]
+                if _identifier(following).lower() == table.lower():
+                    aliased = position + 2 < len(tokens) and tokens[position + 2][0] in ("word", "quoted") \
+                        and tokens[position + 2][1].lower() not in _CLAUSES
+                    replacement = _quote(name) if aliased else f"{_quote(name)} AS {_quote(table)}"
+                    edits.append((following[2], following[3], replacement))
+        for aggregate in parsed["aggregates"]:
+            replacement = _aggregate_sql(aggregate)
+            if aggregate["select_item"]:
+                # Keep the result column named as in the original query
+                replacement += f" AS {_quote(statement[aggregate['start']:aggregate['end']])}"
+            edits.append((aggregate["start"], aggregate["end"], replacement))
+        rewritten = statement
+        for start, end, replacement in sorted(edits, reverse=True):
+            rewritten = rewritten[:start] + replacement + rewritten[end:]
+        with self._lock:
+            self._stats["rewrites"] += 1
+        return rewritten
+
+    def record_rewrite_failure(self, rewritten: str, error: str):
+        logger.warning(f"Summary rewrite failed, running the original query: {error} ({rewritten})")
+        with self._lock:
+            self._stats["rewrite_failures"] += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return dict(self._stats, templates=len(self._templates),
+                        summaries=len(self._summaries or {}))
+
+_advisors = {}
+_advisors_lock = threading.Lock()
+
+def get_advisor(engine=None):
+    """Return the workload advisor for an engine, or None when disabled or not SQLite."""
+    if not CONFIG["advisor_enabled"]:
+        return None
+    from src.core.database import get_engine
+    engine = engine or get_engine()
+    key = str(engine.url)
+    with _advisors_lock:
+        if key not in _advisors:
+            # Index and trigger DDL and the registry check are written for SQLite
+            _advisors[key] = WorkloadAdvisor(engine) if engine.dialect.name == "sqlite" else None
+        return _advisors[key]
@@ -0,0 +1,182 @@
+"""
+src/core/answer_cache.py: Two-tier answer cache in front of the ReAct agent.
+- Tier one matches exact normalized questions (quoted literals keep their case).
+- Tier two matches reworded questions by cosine similarity of Ollama embeddings.
+- Stores the generated SQL (not result rows) so a hit re-runs the query against live data.
+- Evicts by LRU and TTL, and drops everything when the schema or database changes.
+"""
+
+import hashlib
+import math
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from src.config.config import CONFIG
+from src.core.database import sqlite_path
+from src.utils.logging import setup_logging
+
+logger = setup_logging(__name__)
+
+# Apostrophes inside words (what's, Boeing's) do not open a quoted literal
+_QUOTED = r"(?<!\w)'[^']*'(?!\w)|\"[^\"]*\""
+_QUOTED_PATTERN = re.compile(_QUOTED)
+_LITERAL_PATTERN = re.compile(_QUOTED + r"|\b\d+(?:\.\d+)?\b")
+
+def normalize_question(question: str) -> str:
+    """Lowercase, collapse whitespace and drop trailing punctuation.
+
+    Quoted literals are kept as written: they end up in the SQL, where 'Delta' and
+    'DELTA' are different values.
+    """
+    parts, position = [], 0
+    for match in _QUOTED_PATTERN.finditer(question):
+        parts += [question[position:match.start()].lower(), match.group(0)]
+        position = match.end()
+    parts.append(question[position:].lower())
+    # Even parts lie outside quotes; whitespace is collapsed only there
+    text = "".join(re.sub(r"\s+", " ", part) if index % 2 == 0 else part for index, part in enumerate(parts))
+    return text.strip().rstrip(" ?.!;")
+
+def _question_literals(question: str) -> frozenset:
+    """Numbers and quoted strings (case kept); reworded questions must agree on these."""
+    return frozenset(_LITERAL_PATTERN.findall(question))
+
+def schema_fingerprint() -> str:
+    """Fingerprint of the configured schema and database file used for invalidation."""
+    digest = hashlib.sha256(CONFIG["schema"].encode("utf-8"))
+    digest.update(CONFIG["database_uri"].encode("utf-8"))
+    path = sqlite_path(CONFIG["database_uri"])
+    # In WAL mode recent writes live in the -wal file until checkpoint
+    for candidate in (path, f"{path}-wal") if path else ():
+        if os.path.exists(candidate):
+            stat = os.stat(candidate)
+            digest.update(f"{stat.st_mtime_ns}:{stat.st_size}".encode("utf-8"))
+    return digest.hexdigest()
+
+def _cosine(a, b) -> float:
+    dot = sum(x * y for x, y in zip(a, b))
+    norm = math.sqrt(sum(x * x for x in a)) * math.sqrt(sum(y * y for y in b))
+    return dot / norm if norm else 0.0
+
+class AnswerCache:
+    """LRU/TTL cache mapping questions to previously generated SQL."""
+
+    def __init__(self, embeddings=None, max_entries=None, ttl_seconds=None,
+                 similarity_threshold=None, fingerprint_fn=schema_fingerprint):
+        self.embeddings = embeddings
+        # An explicit 0 is honoured (e.g. ttl_seconds=0 expires entries at once)
+        self.max_entries = CONFIG["answer_cache_max_entries"] if max_entries is None else max_entries
+        self.ttl_seconds = CONFIG["answer_cache_ttl_seconds"] if ttl_seconds is None else ttl_seconds
+        self.similarity_threshold = (CONFIG["answer_cache_similarity_threshold"] if similarity_threshold is None
+                                     else similarity_threshold)
+        self._fingerprint_fn = fingerprint_fn
+        self._fingerprint = fingerprint_fn()
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"exact_hits": 0, "semantic_hits": 0, "misses": 0,
+                       "evictions": 0, "expirations": 0, "invalidations": 0}
+
+    def _embed(self, question: str):
+        if self.embeddings is None:
+            return None
+        try:
+            return self.embeddings.embed_query(question)
+        except Exception as e:
+            logger.warning(f"Answer cache embedding failed, using exact match only: {str(e)}")
+            return None
+
+    def _check_fingerprint(self):
+        fingerprint = self._fingerprint_fn()
+        if fingerprint != self._fingerprint:
+            logger.info("Schema or database changed; dropping answer cache")
+            self._entries.clear()
+            self._fingerprint = fingerprint
+            self._stats["invalidations"] += 1
+
+    def _expire(self, now: float):
+        expired = [key for key, entry in self._entries.items()
+                   if now - entry["stored_at"] > self.ttl_seconds]
+        for key in expired:
+            del self._entries[key]
+        self._stats["expirations"] += len(expired)
+
+    def lookup(self, question: str):
+        """Return cached SQL for the question, or None on a miss."""
+        key = normalize_question(question)
+        with self._lock:
+            self._check_fingerprint()
+            self._expire(time.time())
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self._stats["exact_hits"] += 1
+                return entry["sql"]
+            if self.embeddings is None or not self._entries:
+                self._stats["misses"] += 1
+                return None
+
+        # Embed outside the lock; this is an HTTP round trip to Ollama.
+        vector = self._embed(key)
+        literals = _question_literals(question)
+        with self._lock:
+            best_key, best_score = None, self.similarity_threshold
+            if vector is not None:
+                for cached_key, cached in self._entries.items():
+                    if cached["vector"] is None or cached["literals"] != literals:
+                        continue
+                    score = _cosine(vector, cached["vector"])
+                    if score >= best_score:
+                        best_key, best_score = cached_key, score
+            if best_key is None:
+                self._stats["misses"] += 1
+                return None
+            self._entries.move_to_end(best_key)
+            self._stats["semantic_hits"] += 1
+            logger.info(f"Answer cache semantic hit ({best_score:.3f}): '{question}' ~ '{best_key}'")
+            return self._entries[best_key]["sql"]
+
+    def store(self, question: str, sql: str):
+        """Cache the SQL generated for a question."""
+        key = normalize_question(question)
+        vector = self._embed(key)
+        with self._lock:
+            self._check_fingerprint()
+            self._entries[key] = {
+                "sql": sql,
+                "vector": vector,
+                "literals": _question_literals(question),
+                "stored_at": time.time(),
+            }
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._stats["evictions"] += 1
+
+    def discard_sql(self, sql: str):
+        """Drop every entry that maps to the given SQL (e.g. after it started failing)."""
+        with self._lock:
+            for key in [k for k, entry in self._entries.items() if entry["sql"] == sql]:
+                del self._entries[key]
+
+    def clear(self):
+        """Drop all cached entries."""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        """Return hit/miss counters and the current size."""
+        with self._lock:
+            stats = dict(self._stats)
+            stats["size"] = len(self._entries)
+        lookups = stats["exact_hits"] + stats["semantic_hits"] + stats["misses"]
+        stats["hit_rate"] = (stats["exact_hits"] + stats["semantic_hits"]) / lookups if lookups else 0.0
+        return stats
+
+def initialize_answer_cache(embeddings=None):
+    """Initialize the answer cache, or return None when disabled in config."""
+    if not CONFIG["answer_cache_enabled"]:
+        return None
+    logger.info("Initialized answer cache")
+    return AnswerCache(embeddings=embeddings)
@@ -0,0 +1,348 @@
+"""
+src/core/catalog.py: Metadata catalog shared by every component that needs the schema.
+- Reflects tables and views once (columns, types, primary and foreign keys, row-count
+  estimates) and saves a compact JSON snapshot, so a restart does not reflect again.
+- Detects DDL through SQLite's PRAGMA schema_version (checked at most every
+  catalog_check_interval_seconds) and re-reflects only tables whose CREATE statement in
+  sqlite_master changed; other databases are reflected once and on refresh().
+- `version` increases whenever the catalog content changes, so consumers (validator,
+  fast path, schema index) rebuild their derived structures only then.
+- Row counts come from MAX(rowid) (sqlite_stat1 for WITHOUT ROWID tables). They are
+  read live (cached for catalog_check_interval_seconds, dropped by invalidate()) and are
+  not part of the snapshot, which holds only DDL-derived data.
+- CombinedCatalog presents attached databases' tables as schema.table next to the
+  primary's (see db_router.get_query_catalog).
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from sqlalchemy import inspect, text
+from src.config.config import CONFIG
+from src.core.database import get_engine, sqlite_path
+from src.utils.logging import setup_logging
+
+logger = setup_logging(__name__)
+
+SNAPSHOT_FORMAT = 2
+
+# Bookkeeping and summary tables created by this application (see result_cache.py and
+# advisor.py); queries reach summaries only through the advisor's rewrites
+_INTERNAL_TABLES = {"_table_versions", "_summary_tables", "_bulk_loads"}
+SUMMARY_PREFIX = "_agg_"
+STAGING_PREFIX = "_load_"
+
+def is_internal_table(name: str) -> bool:
+    return name in _INTERNAL_TABLES or name.startswith((SUMMARY_PREFIX, STAGING_PREFIX))
+
+def _ddl_hash(sql) -> str:
+    return hashlib.sha256((sql or "").encode("utf-8")).hexdigest()[:16]
+
+class MetadataCatalog:
+    """Tables, columns, keys and row estimates of one database, kept in sync with its DDL."""
+
+    def __init__(self, engine, snapshot_path: str = None):
+        self.engine = engine
+        self.snapshot_path = snapshot_path if snapshot_path is not None else CONFIG["catalog_snapshot_path"]
+        self.version = 0
+        self._lock = threading.RLock()
+        self._tables = None
+        self._schema_version = None
+        self._checked_at = 0.0
+        self._name_index = None
+        self._row_counts = {}  # table -> (estimate, monotonic time read)
+        self._stats = {"snapshot_loads": 0, "syncs": 0, "tables_reflected": 0, "checks": 0}
+
+    @property
+    def _is_sqlite(self) -> bool:
+        return self.engine.dialect.name == "sqlite"
+
+    def _master(self, connection) -> dict:
+        """{name: (kind, ddl hash)} from sqlite_master."""
+        rows = connection.execute(text(
+            "SELECT name, type, sql FROM sqlite_master WHERE type IN ('table', 'view') "
+            "AND name NOT LIKE 'sqlite_%'"
+        )).fetchall()
+        return {name: (kind, _ddl_hash(sql)) for name, kind, sql in rows if not is_internal_table(name)}
+
+    def _row_count(self, connection, name: str):
+        quoted = self.engine.dialect.identifier_preparer.quote(name)
+        try:
+            # One seek to the end of the rowid b-tree; current however the table was written
+            return int(connection.execute(text(f"SELECT MAX(rowid) FROM {quoted}")).scalar() or 0)
+        except Exception:
+            pass
+        try:
+            # WITHOUT ROWID tables: the count from the last ANALYZE
+            count = connection.execute(text(
+                "SELECT CAST(stat AS INTEGER) FROM sqlite_stat1 WHERE tbl = :t LIMIT 1"
+            ), {"t": name}).scalar()
+        except Exception:
+            count = None
+        return int(count) if count is not None else None
+
+    def _reflect_table(self, inspector, name: str, kind: str, ddl_hash) -> dict:
+        columns = inspector.get_columns(name)
+        if kind == "view":
+            primary_key, foreign_keys = [], []
+        else:
+            primary_key = inspector.get_pk_constraint(name).get("constrained_columns") or []
+            foreign_keys = [
+                {"columns": fk["constrained_columns"], "referred_table": fk["referred_table"],
+                 "referred_columns": fk["referred_columns"]}
+                for fk in inspector.get_foreign_keys(name)
+            ]
+        return {
+            "name": name,
+            "kind": kind,
+            "columns": [{"name": c["name"], "type": str(c["type"]), "nullable": bool(c.get("nullable", True)),
+                         "primary_key": c["name"] in primary_key} for c in columns],
+            "primary_key": list(primary_key),
+            "foreign_keys": foreign_keys,
+            "ddl_hash": ddl_hash,
+        }
+
+    def _sync(self, force: bool = False):
+        """Reflect new or changed tables and drop removed ones (caller holds the lock)."""
+        tables = dict(self._tables or {})
+        inspector = inspect(self.engine)
+        with self.engine.connect() as connection:
+            if self._is_sqlite:
+                self._schema_version = connection.execute(text("PRAGMA schema_version")).scalar()
+                current = self._master(connection)
+            else:
+                current = {name: ("table", None) for name in inspector.get_table_names()
+                           if not is_internal_table(name)}
+                current.update({name: ("view", None) for name in inspector.get_view_names()})
+            changed = [
+                name for name, (kind, ddl_hash) in current.items()
+                if force or name not in tables or tables[name]["ddl_hash"] != ddl_hash or ddl_hash is None
+            ]
+            removed = [name for name in tables if name not in current]
+            for name in removed:
+                del tables[name]
+            for name in changed:
+                kind, ddl_hash = current[name]
+                tables[name] = self._reflect_table(inspector, name, kind, ddl_hash)
+        self._checked_at = time.monotonic()
+        self._stats["syncs"] += 1
+        self._stats["tables_reflected"] += len(changed)
+        if changed or removed or self._tables is None:
+            self._tables = tables
+            self._name_index = None
+            self.version += 1
+            logger.info(f"Catalog synced: {len(changed)} table(s) reflected, {len(removed)} removed, "
+                        f"{len(tables) - len(changed)} unchanged")
+            self._save_snapshot()
+
+    def _load_snapshot(self) -> bool:
+        if not self.snapshot_path or not os.path.exists(self.snapshot_path):
+            return False
+        try:
+            with open(self.snapshot_path) as f:
+                snapshot = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable catalog snapshot {self.snapshot_path}: {str(e)}")
+            return False
+        if snapshot.get("format") != SNAPSHOT_FORMAT or snapshot.get("database") != str(self.engine.url):
+            return False
+        self._tables = snapshot["tables"]
+        self._stats["snapshot_loads"] += 1
+        return True
+
+    def _save_snapshot(self):
+        if not self.snapshot_path:
+            return
+        snapshot = {"format": SNAPSHOT_FORMAT, "database": str(self.engine.url),
+                    "schema_version": self._schema_version, "tables": self._tables}
+        temporary = f"{self.snapshot_path}.tmp"
+        try:
+            with open(temporary, "w") as f:
+                json.dump(snapshot, f, separators=(",", ":"))
+            os.replace(temporary, self.snapshot_path)
+        except OSError as e:
+            logger.warning(f"Could not save catalog snapshot: {str(e)}")
+
+    def _ensure_fresh(self):
+        if self._tables is not None and not self._is_sqlite:
+            return
+        if self._tables is not None and time.monotonic() - self._checked_at < CONFIG["catalog_check_interval_seconds"]:
+            return
+        with self._lock:
+            if self._tables is None:
+                # The snapshot's per-table DDL hashes are compared against sqlite_master,
+                # so only tables changed since it was written are reflected
+                if self._load_snapshot():
+                    self.version += 1
+                    if not self._is_sqlite:
+                        # No DDL fingerprint to compare against; trust the snapshot until refresh()
+                        self._checked_at = time.monotonic()
+                        return
+                self._sync()
+                return
+            self._stats["checks"] += 1
+            with self.engine.connect() as connection:
+                schema_version = connection.execute(text("PRAGMA schema_version")).scalar()
+            if schema_version != self._schema_version:
+                self._sync()
+            else:
+                self._checked_at = time.monotonic()
+
+    def tables(self) -> dict:
+        """{table name: {"name", "kind", "columns", "primary_key", "foreign_keys"}}."""
+        self._ensure_fresh()
+        return self._tables
+
+    def table_names(self, include_views: bool = False) -> list:
+        return sorted(name for name, info in self.tables().items() if include_views or info["kind"] == "table")
+
+    def get(self, table: str):
+        """Case-insensitive lookup of one table's entry, or None."""
+        entry = self.name_index().get(table.lower())
+        return self.tables().get(entry["name"]) if entry else None
+
+    def name_index(self) -> dict:
+        """{lower-case table name: {"name", "columns": {lower-case column: column}}}."""
+        tables = self.tables()
+        version, index = self._name_index or (None, None)
+        if version != self.version:
+            version = self.version
+            index = {
+                name.lower(): {"name": name, "columns": {c["name"].lower(): c["name"] for c in info["columns"]}}
+                for name, info in tables.items()
+            }
+            self._name_index = (version, index)
+        return index
+
+    def row_count(self, table: str):
+        """Estimated rows of a table, read from the database at most every catalog_check_interval_seconds."""
+        entry = self.get(table)
+        if not entry or entry["kind"] != "table":
+            return None
+        name = entry["name"]
+        cached = self._row_counts.get(name)
+        if cached and time.monotonic() - cached[1] < CONFIG["catalog_check_interval_seconds"]:
+            return cached[0]
+        with self.engine.connect() as connection:
+            count = self._row_count(connection, name)
+        self._row_counts[name] = (count, time.monotonic())
+        return count
+
+    def invalidate(self, table: str = None):
+        """Forget row estimates (of one table, or all) and check the DDL again on next use."""
+        with self._lock:
+            if table is None:
+                self._row_counts.clear()
+            else:
+                self._row_counts = {name: value for name, value in self._row_counts.items()
+                                    if name.lower() != table.lower()}
+            self._checked_at = 0.0
+
+    def refresh(self):
+        """Re-reflect every table and forget row estimates."""
+        with self._lock:
+            self._row_counts.clear()
+            self._sync(force=True)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return dict(self._stats, tables=len(self._tables or {}), version=self.version,
+                        schema_version=self._schema_version)
+
+class CombinedCatalog:
+    """The primary database's catalog plus those of attached databases, whose tables appear
+    as schema.table (with "schema" and "table" keys); read-only, same lookups as a catalog."""
+
+    def __init__(self, primary: MetadataCatalog, attached: dict):
+        self.primary = primary
+        self.attached = attached
+        self._lock = threading.Lock()
+        self._merged = (None, None, None)
+
+    @property
+    def version(self) -> tuple:
+        return (self.primary.version,) + tuple(catalog.version for catalog in self.attached.values())
+
+    def _build(self):
+        # tables() first: it brings each catalog up to date, which may bump its version
+        primary = self.primary.tables()
+        attached = {schema: catalog.tables() for schema, catalog in self.attached.items()}
+        version = self.version
+        with self._lock:
+            if self._merged[0] == version:
+                return self._merged
+            merged = dict(primary)
+            for schema, tables in attached.items():
+                for name, info in tables.items():
+                    merged[f"{schema}.{name}"] = dict(
+                        info, name=f"{schema}.{name}", schema=schema, table=name,
+                        foreign_keys=[dict(fk, referred_table=f"{schema}.{fk['referred_table']}")
+                                      for fk in info["foreign_keys"]],
+                    )
+            index = {
+                name.lower(): {"name": name, "columns": {c["name"].lower(): c["name"] for c in info["columns"]}}
+                for name, info in merged.items()
+            }
+            self._merged = (version, merged, index)
+            return self._merged
+
+    def tables(self) -> dict:
+        return self._build()[1]
+
+    def table_names(self, include_views: bool = False) -> list:
+        return sorted(name for name, info in self.tables().items() if include_views or info["kind"] == "table")
+
+    def get(self, table: str):
+        entry = self.name_index().get(table.lower())
+        return self.tables().get(entry["name"]) if entry else None
+
+    def name_index(self) -> dict:
+        return self._build()[2]
+
+    def row_count(self, table: str):
+        entry = self.get(table)
+        if not entry:
+            return None
+        if "schema" in entry:
+            return self.attached[entry["schema"]].row_count(entry["table"])
+        return self.primary.row_count(entry["name"])
+
+    def invalidate(self, table: str = None):
+        for catalog in (self.primary, *self.attached.values()):
+            catalog.invalidate(table)
+
+    def refresh(self):
+        for catalog in (self.primary, *self.attached.values()):
+            catalog.refresh()
+
+_catalogs = {}
+_catalogs_lock = threading.Lock()
+
+def _snapshot_path(engine):
+    """catalog_snapshot_path for database_uri; other databases get a file of their own."""
+    path = CONFIG["catalog_snapshot_path"]
+    if not path or str(engine.url) == CONFIG["database_uri"]:
+        return path
+    root, extension = os.path.splitext(path)
+    return f"{root}.{hashlib.sha256(str(engine.url).encode('utf-8')).hexdigest()[:8]}{extension}"
+
+def invalidate_catalogs(path: str, table: str = None):
+    """Invalidate the catalogs of a SQLite file after it was written outside the engines (bulk loads)."""
+    target = os.path.abspath(path)
+    with _catalogs_lock:
+        catalogs = list(_catalogs.values())
+    for catalog in catalogs:
+        database = sqlite_path(str(catalog.engine.url))
+        if database and os.path.abspath(database.removeprefix("file:")) == target:
+            catalog.invalidate(table)
+
+def get_catalog(engine=None) -> MetadataCatalog:
+    """Return the catalog for an engine (default: the shared pooled engine)."""
+    engine = engine or get_engine()
+    key = str(engine.url)
+    with _catalogs_lock:
+        if key not in _catalogs:
+            _catalogs[key] = MetadataCatalog(engine, _snapshot_path(engine))
+        return _catalogs[key]
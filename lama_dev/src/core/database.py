@@ -3,51 +3,250 @@ src/core/database.py: Initializes SQLite database for text-to-SQL queries.
 - Creates a sample database with schema if it doesn't exist.
 - Checks for existing tables to avoid duplication errors.
 - Populates with sample data if the table is empty.
-- Returns a LangChain SQLDatabase object.
+- Owns one pooled SQLAlchemy engine and one LangChain SQLDatabase shared by all tools.
+- Configures SQLite for concurrent readers (WAL, busy timeout, check_same_thread=False).
+- Tracks pool metrics (checkouts, waits, overflow).
+- Attaches the SQLite databases in CONFIG["databases"] to every connection under their
+  names, so one query can join across them; read replicas are in db_router.py.
 """
 
-from langchain_community.utilities import SQLDatabase
+import threading
+import time
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.pool import QueuePool, StaticPool
 from src.config.config import CONFIG
-import sqlite3
 from src.utils.logging import setup_logging
 
 logger = setup_logging(__name__)
 
+_lock = threading.Lock()
+_engine = None
+_sql_database = None
+
+class PoolMetrics:
+    """Thread-safe counters for the shared connection pool."""
+
+    def __init__(self, max_overflow: int = 0):
+        self.max_overflow = max_overflow
+        self._lock = threading.Lock()
+        self.connects = 0
+        self.checkouts = 0
+        self.checkins = 0
+        self.waits = 0
+        self.wait_seconds = 0.0
+        self.peak_overflow = 0
+
+    def record_connect(self):
+        with self._lock:
+            self.connects += 1
+
+    def record_checkin(self):
+        with self._lock:
+            self.checkins += 1
+
+    def record_checkout(self, overflow: int):
+        with self._lock:
+            self.checkouts += 1
+            self.peak_overflow = max(self.peak_overflow, overflow)
+
+    def record_wait(self, seconds: float):
+        with self._lock:
+            self.waits += 1
+            self.wait_seconds += seconds
+
+    def snapshot(self, pool=None) -> dict:
+        with self._lock:
+            data = {
+                "connects": self.connects,
+                "checkouts": self.checkouts,
+                "checkins": self.checkins,
+                "waits": self.waits,
+                "wait_seconds": round(self.wait_seconds, 6),
+                "peak_overflow": self.peak_overflow,
+            }
+        if isinstance(pool, QueuePool):
+            data.update({
+                "size": pool.size(),
+                "checked_out": pool.checkedout(),
+                "overflow": max(pool.overflow(), 0),
+            })
+        return data
+
+class _MeteredQueuePool(QueuePool):
+    """QueuePool that records how often and how long callers wait for a connection."""
+
+    metrics = None
+
+    def _do_get(self):
+        metrics = self.metrics
+        exhausted = metrics is not None and self.checkedin() == 0 and self.overflow() >= metrics.max_overflow
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            if exhausted:
+                metrics.record_wait(time.perf_counter() - started)
+
+def sqlite_path(db_uri: str):
+    """Return the file path behind a sqlite URI, or None for other/in-memory databases."""
+    if db_uri.startswith("sqlite:///") and db_uri != "sqlite:///:memory:":
+        return db_uri[len("sqlite:///"):].split("?", 1)[0]
+    return None
+
+def attached_databases() -> dict:
+    """{schema name: SQLite file} of the configured databases attached to every connection."""
+    attached = {}
+    for name, uri in CONFIG["databases"].items():
+        path = sqlite_path(uri) if uri.startswith("sqlite") else (None if "://" in uri else uri)
+        if path is None:
+            logger.warning(f"Database {name} is not a SQLite file and cannot be attached: {uri}")
+            continue
+        attached[name] = path
+    return attached
+
+def create_pooled_engine(db_uri: str = None, read_only: bool = False, attach: dict = None):
+    """Create a pooled SQLAlchemy engine with SQLite concurrency settings applied.
+
+    read_only connections refuse writes (PRAGMA query_only); attach is {schema name: file}.
+    """
+    db_uri = db_uri or CONFIG["database_uri"]
+    is_sqlite = db_uri.startswith("sqlite")
+    metrics = PoolMetrics(max_overflow=CONFIG["db_max_overflow"])
+
+    kwargs = {"pool_pre_ping": CONFIG["db_pool_pre_ping"]}
+    if is_sqlite and sqlite_path(db_uri) is None:
+        # In-memory SQLite only exists inside a single connection
+        kwargs.update(poolclass=StaticPool, connect_args={"check_same_thread": False})
+    else:
+        kwargs.update(
+            poolclass=_MeteredQueuePool,
+            pool_size=CONFIG["db_pool_size"],
+            max_overflow=CONFIG["db_max_overflow"],
+            pool_timeout=CONFIG["db_pool_timeout"],
+            pool_recycle=CONFIG["db_pool_recycle"],
+        )
+        if is_sqlite:
+            kwargs["connect_args"] = {
+                "check_same_thread": False,
+                "timeout": CONFIG["sqlite_busy_timeout_ms"] / 1000,
+            }
+    engine = create_engine(db_uri, **kwargs)
+    engine.pool.metrics = metrics
+
+    @event.listens_for(engine, "connect")
+    def _on_connect(dbapi_connection, connection_record):
+        metrics.record_connect()
+        if is_sqlite:
+            cursor = dbapi_connection.cursor()
+            if read_only:
+                cursor.execute("PRAGMA query_only=ON")
+            elif CONFIG["sqlite_wal"] and sqlite_path(db_uri):
+                cursor.execute("PRAGMA journal_mode=WAL")
+                cursor.execute("PRAGMA synchronous=NORMAL")
+            cursor.execute(f"PRAGMA busy_timeout={int(CONFIG['sqlite_busy_timeout_ms'])}")
+            for name, path in (attach or {}).items():
+                schema = '"' + name.replace('"', '""') + '"'
+                cursor.execute(f"ATTACH DATABASE ? AS {schema}", (path,))
+            cursor.close()
+
+    @event.listens_for(engine, "checkout")
+    def _on_checkout(dbapi_connection, connection_record, connection_proxy):
+        overflow = engine.pool.overflow() if isinstance(engine.pool, QueuePool) else 0
+        metrics.record_checkout(max(overflow, 0))
+
+    @event.listens_for(engine, "checkin")
+    def _on_checkin(dbapi_connection, connection_record):
+        metrics.record_checkin()
+
+    logger.info(f"Created pooled engine for {db_uri}")
+    return engine
+
+def get_engine():
+    """Return the process-wide pooled engine, creating it on first use."""
+    global _engine
+    if _engine is None:
+        with _lock:
+            if _engine is None:
+                _engine = create_pooled_engine(attach=attached_databases())
+    return _engine
+
+def get_sql_database():
+    """Return the shared LangChain SQLDatabase backed by the pooled engine."""
+    global _sql_database
+    if _sql_database is None:
+        from langchain_community.utilities import SQLDatabase
+        engine = get_engine()
+        with _lock:
+            if _sql_database is None:
+                _sql_database = SQLDatabase(engine, lazy_table_reflection=True)
+    return _sql_database
+
+def prime_pool(connections: int = None) -> int:
+    """Open pooled connections now so the first requests skip connect and PRAGMA setup."""
+    engine = get_engine()
+    if not isinstance(engine.pool, QueuePool):
+        connections = 1
+    opened = []
+    try:
+        for _ in range(connections or CONFIG["db_pool_size"]):
+            opened.append(engine.connect())
+    finally:
+        for connection in opened:
+            connection.close()
+    return len(opened)
+
+def pool_metrics() -> dict:
+    """Return checkout/wait/overflow counters for the shared pool."""
+    engine = get_engine()
+    return engine.pool.metrics.snapshot(engine.pool)
+
+def _seed_table(path: str, table: str):
+    """Bulk-load a seed file into table if the table is missing or empty."""
+    engine = get_engine()
+    with engine.connect() as conn:
+        exists = conn.execute(text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"),
+                              {"name": table}).fetchone()
+        quoted = engine.dialect.identifier_preparer.quote(table)
+        if exists and conn.exec_driver_sql(f"SELECT 1 FROM {quoted} LIMIT 1").fetchone():
+            return
+    from src.core.bulk_load import load_file
+    logger.info(f"Seeding {table} from {path}")
+    load_file(path, table, mode="append")
+
 def initialize_database():
     """Initialize SQLite database and return SQLDatabase object."""
     db_uri = CONFIG["database_uri"]
-    
-    # Connect to the database
-    conn = sqlite3.connect("sample.db")
-    cursor = conn.cursor()
-    
-    # Check if the airplanes table exists
-    cursor.execute("""
-        SELECT name FROM sqlite_master 
-        WHERE type='table' AND name='airplanes';
-    """)
-    table_exists = cursor.fetchone()
-    
-    if not table_exists:
-        # Create the table if it doesn't exist
-        logger.info("Creating airplanes table")
-        conn.executescript(CONFIG["schema"])
-    
-    # Check if the table is empty and populate if needed
-    cursor.execute("SELECT COUNT(*) FROM airplanes")
-    row_count = cursor.fetchone()[0]
-    if row_count == 0:
-        logger.info("Populating airplanes table with sample data")
-        conn.executescript("""
-            INSERT INTO airplanes (Airplane_id, Producer, Type) VALUES
-            (1, 'Boeing', 'Jet'),
-            (2, 'Airbus', 'Jet'),
-            (3, 'Boeing', 'Prop'),
-            (4, 'Embraer', 'Jet');
-        """)
-    
-    conn.commit()
-    conn.close()
-    
+
+    with get_engine().begin() as conn:
+        # Check if the airplanes table exists
+        table_exists = conn.execute(text("""
+            SELECT name FROM sqlite_master
+            WHERE type='table' AND name='airplanes';
+        """)).fetchone()
+
+        if not table_exists:
+            # Create the table if it doesn't exist
+            logger.info("Creating airplanes table")
+            for statement in CONFIG["schema"].split(";"):
+                if statement.strip():
+                    conn.exec_driver_sql(statement)
+
+    # Configured seed files go through the bulk loader, on its own connection
+    for seed in CONFIG["database_seed_files"]:
+        _seed_table(seed["path"], seed["table"])
+
+    with get_engine().begin() as conn:
+        # Check if the table is empty and populate if needed
+        row_count = conn.execute(text("SELECT COUNT(*) FROM airplanes")).scalar()
+        if row_count == 0:
+            logger.info("Populating airplanes table with sample data")
+            conn.execute(text("""
+                INSERT INTO airplanes (Airplane_id, Producer, Type) VALUES
+                (1, 'Boeing', 'Jet'),
+                (2, 'Airbus', 'Jet'),
+                (3, 'Boeing', 'Prop'),
+                (4, 'Embraer', 'Jet');
+            """))
+
     logger.info(f"Connecting to database: {db_uri}")
-    return SQLDatabase.from_uri(db_uri)
\ No newline at end of file
+    return get_sql_database()
@@ -0,0 +1,155 @@
+"""
+src/core/db_router.py: Routes query execution over read replicas of the database.
+- DatabaseRouter holds the primary engine, one read-only pooled engine per replica in
+  database_replicas and one per attached database in CONFIG["databases"].
+- Each query runs on the replica with the fewest queries in flight (ties: lower recent
+  median latency), the primary included when db_router_primary_reads is set. Validation,
+  the metadata catalog, the result cache and the workload advisor stay keyed on the primary.
+- SQLite replicas are opened with mode=ro (immutable=1 for copies that never change);
+  every replica connection attaches the same databases as the primary, so cross-database
+  queries (SELECT ... FROM flights JOIN sales.orders ...) run on any of them.
+- get_query_catalog() merges the attached databases' catalogs into the primary's, so
+  validation and schema retrieval see their tables as schema.table and rank them per question.
+"""
+
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from src.config.config import CONFIG
+from src.core.catalog import CombinedCatalog, get_catalog
+from src.core.database import attached_databases, create_pooled_engine, get_engine, sqlite_path
+from src.utils.logging import setup_logging
+
+logger = setup_logging(__name__)
+
+_lock = threading.Lock()
+_router = None
+
+def replica_uri(spec) -> str:
+    """SQLAlchemy URI for a replica: SQLite files open read-only, optionally immutable."""
+    if isinstance(spec, dict):
+        uri, immutable = spec.get("uri") or spec["path"], spec.get("immutable", False)
+    else:
+        uri, immutable = spec, False
+    path = sqlite_path(uri) if uri.startswith("sqlite") else (None if "://" in uri else uri)
+    if path is None or path.startswith("file:"):
+        return uri
+    # immutable skips locking and change detection; only safe if nothing writes the file
+    return f"sqlite:///file:{os.path.abspath(path)}?mode=ro{'&immutable=1' if immutable else ''}&uri=true"
+
+class Replica:
+    """One engine serving reads, with its in-flight count and recent latencies."""
+
+    def __init__(self, name: str, engine):
+        self.name = name
+        self.engine = engine
+        self.outstanding = 0
+        self.requests = 0
+        self.errors = 0
+        self.latencies = deque(maxlen=200)
+
+    def median_latency(self) -> float:
+        if not self.latencies:
+            return 0.0
+        return sorted(self.latencies)[len(self.latencies) // 2]
+
+    def stats(self) -> dict:
+        return {"outstanding": self.outstanding, "requests": self.requests, "errors": self.errors,
+                "p50_ms": round(self.median_latency() * 1000, 3)}
+
+class DatabaseRouter:
+    """Spreads reads of the primary database over its replicas; holds the attached databases."""
+
+    def __init__(self, primary, replicas: list = None, databases: dict = None):
+        self.primary = primary
+        self.attached = attached_databases() if databases is None else databases
+        self.replicas = []
+        for index, spec in enumerate(CONFIG["database_replicas"] if replicas is None else replicas):
+            uri = replica_uri(spec)
+            try:
+                engine = create_pooled_engine(uri, read_only=True, attach=self.attached)
+                with engine.connect():
+                    pass
+            except Exception as e:
+                # A missing copy should not take the service down; the others still serve reads
+                logger.warning(f"Skipping replica {uri}: {str(e)}")
+                continue
+            self.replicas.append(Replica(f"replica-{index}", engine))
+        if CONFIG["db_router_primary_reads"] or not self.replicas:
+            self.replicas.insert(0, Replica("primary", primary))
+        self._engines = {name: create_pooled_engine(replica_uri(path), read_only=True)
+                         for name, path in self.attached.items()}
+        self._catalog = None
+        self._lock = threading.Lock()
+        logger.info(f"Routing reads over {len(self.replicas)} engine(s); attached: {sorted(self.attached)}")
+
+    def _acquire(self) -> Replica:
+        with self._lock:
+            replica = min(self.replicas, key=lambda r: (r.outstanding, r.median_latency()))
+            replica.outstanding += 1
+            replica.requests += 1
+            return replica
+
+    @contextmanager
+    def read_engine(self):
+        """Engine of the least busy replica for the duration of one query."""
+        replica = self._acquire()
+        started = time.perf_counter()
+        failed = False
+        try:
+            yield replica.engine
+        except Exception:
+            failed = True
+            raise
+        finally:
+            with self._lock:
+                replica.outstanding -= 1
+                replica.errors += failed
+                replica.latencies.append(time.perf_counter() - started)
+
+    def catalog(self):
+        """Catalog of the primary with the attached databases' tables as schema.table."""
+        if not self._engines:
+            return get_catalog(self.primary)
+        with self._lock:
+            if self._catalog is None:
+                self._catalog = CombinedCatalog(get_catalog(self.primary),
+                                                {name: get_catalog(engine) for name, engine in self._engines.items()})
+            return self._catalog
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"replicas": {replica.name: replica.stats() for replica in self.replicas},
+                    "attached": sorted(self.attached)}
+
+def get_router():
+    """The process-wide router, or None when there are no replicas or attached databases."""
+    global _router
+    if not CONFIG["database_replicas"] and not CONFIG["databases"]:
+        return None
+    if _router is None:
+        with _lock:
+            if _router is None:
+                _router = DatabaseRouter(get_engine())
+    return _router
+
+@contextmanager
+def read_engine(db):
+    """Engine to run one read of db on: a replica when db is the routed primary, else db's own."""
+    router = get_router()
+    # Without validation a statement may write, which only the primary accepts
+    if router is None or db._engine is not router.primary or not CONFIG["sql_validation_enabled"]:
+        yield db._engine
+        return
+    with router.read_engine() as engine:
+        yield engine
+
+def get_query_catalog(engine=None):
+    """Catalog that queries against engine are checked with (see DatabaseRouter.catalog)."""
+    router = get_router()
+    engine = engine or get_engine()
+    if router is None or engine is not router.primary:
+        return get_catalog(engine)
+    return router.catalog()
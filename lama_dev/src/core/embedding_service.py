@@ -0,0 +1,298 @@
+"""
+src/core/embedding_service.py: Batching and caching layer in front of the embedding model.
+- EmbeddingService implements LangChain's Embeddings interface, so Chroma (schema index)
+  and the answer cache use it in place of OllamaEmbeddings.
+- Concurrent requests are queued and coalesced: the first waits up to
+  embedding_batch_window_ms for others, then one embed_documents call embeds up to
+  embedding_max_batch_size texts. Identical texts in flight share one request.
+- Vectors are cached in an LRU keyed by a hash of model and text (float32). With
+  embedding_cache_path set, they live in memory-mapped .npy files and survive restarts;
+  one process owns a cache directory at a time (others fall back to memory).
+- stats() reports cache hits, batch sizes, queue wait and model latency (p50/p95).
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import Future
+from typing import List
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from src.config.config import CONFIG
+from src.utils.logging import setup_logging
+
+logger = setup_logging(__name__)
+
+def _percentiles(values) -> dict:
+    ordered = sorted(values)
+    if not ordered:
+        return {"p50": None, "p95": None}
+    return {label: ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+            for label, fraction in (("p50", 0.5), ("p95", 0.95))}
+
+class VectorCache:
+    """LRU of float32 vectors by key; rows are memory-mapped .npy files when path is set."""
+
+    def __init__(self, max_entries: int, path: str = None, model: str = ""):
+        self.max_entries = max_entries
+        self.path = path
+        self.model = model
+        self._lock = threading.Lock()
+        self._order = OrderedDict()  # key -> row (on disk) or vector (in memory)
+        self._vectors = None
+        self._keys = None
+        self._free = []
+        self._lock_file = None
+        if path:
+            self._open_lock()
+        if self.path:
+            self._load()
+
+    def _open_lock(self):
+        """Own the cache directory; memory-mapped rows must not be shared between writers."""
+        try:
+            import fcntl
+            os.makedirs(self.path, exist_ok=True)
+            self._lock_file = open(os.path.join(self.path, "lock"), "w")
+            fcntl.flock(self._lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except (ImportError, OSError) as e:
+            logger.warning(f"Embedding cache {self.path} unavailable, keeping vectors in memory: {str(e)}")
+            if self._lock_file is not None:
+                self._lock_file.close()
+                self._lock_file = None
+            self.path = None
+
+    def _load(self):
+        """Map existing cache files, if any, so earlier vectors are hits from the start."""
+        try:
+            with open(os.path.join(self.path, "meta.json")) as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return
+        # Another model or capacity: the first put() recreates the files
+        if meta.get("model") != self.model or meta.get("capacity") != self.max_entries:
+            return
+        try:
+            self._open_files(meta["dim"])
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning(f"Ignoring unreadable embedding cache {self.path}: {str(e)}")
+            self._vectors, self._keys, self._order, self._free = None, None, OrderedDict(), []
+
+    def _open_files(self, dim: int):
+        """Map the vector and key files for dim-sized vectors, recreating them if they do not match."""
+        meta_path = os.path.join(self.path, "meta.json")
+        vectors_path, keys_path = os.path.join(self.path, "vectors.npy"), os.path.join(self.path, "keys.npy")
+        meta = {"model": self.model, "dim": dim, "capacity": self.max_entries}
+        try:
+            with open(meta_path) as f:
+                reuse = json.load(f) == meta
+        except (OSError, ValueError):
+            reuse = False
+        if reuse:
+            self._vectors = np.load(vectors_path, mmap_mode="r+")
+            self._keys = np.load(keys_path, mmap_mode="r+")
+        else:
+            # Sparse files: only rows that are written take disk space
+            self._vectors = np.lib.format.open_memmap(vectors_path, mode="w+", dtype=np.float32,
+                                                      shape=(self.max_entries, dim))
+            self._keys = np.lib.format.open_memmap(keys_path, mode="w+", dtype="S32", shape=(self.max_entries,))
+            with open(meta_path, "w") as f:
+                json.dump(meta, f)
+        for row, key in enumerate(self._keys):
+            if key:
+                self._order[key.decode("ascii")] = row
+            else:
+                self._free.append(row)
+        self._free.reverse()
+        if reuse:
+            logger.info(f"Loaded {len(self._order)} cached embeddings from {self.path}")
+
+    def get(self, key: str):
+        with self._lock:
+            entry = self._order.get(key)
+            if entry is None:
+                return None
+            self._order.move_to_end(key)
+            return (self._vectors[entry] if self.path else entry).tolist()
+
+    def put(self, key: str, vector) -> list:
+        """Store a vector; returns it as cached (float32 precision), so hits and misses agree."""
+        vector = np.asarray(vector, dtype=np.float32)
+        with self._lock:
+            if not self.path:
+                self._order[key] = vector
+                self._order.move_to_end(key)
+                while len(self._order) > self.max_entries:
+                    self._order.popitem(last=False)
+                return vector.tolist()
+            if self._vectors is None:
+                self._open_files(len(vector))
+            if len(vector) != self._vectors.shape[1]:
+                return vector.tolist()
+            row = self._order.get(key)
+            if row is None:
+                if self._free:
+                    row = self._free.pop()
+                else:
+                    _, row = self._order.popitem(last=False)
+                # Clear the key first: a crash mid-write leaves an empty row, not a wrong vector
+                self._keys[row] = b""
+            self._vectors[row] = vector
+            self._keys[row] = key.encode("ascii")
+            self._order[key] = row
+            self._order.move_to_end(key)
+            return self._vectors[row].tolist()
+
+    def flush(self):
+        with self._lock:
+            if self._vectors is not None:
+                self._vectors.flush()
+                self._keys.flush()
+
+    def close(self):
+        """Flush and release the cache directory (vectors stay readable from memory)."""
+        self.flush()
+        with self._lock:
+            if self._vectors is not None:
+                self._order = OrderedDict((key, np.array(self._vectors[row])) for key, row in self._order.items())
+                self._vectors, self._keys, self._free = None, None, []
+            self.path = None
+            if self._lock_file is not None:
+                self._lock_file.close()
+                self._lock_file = None
+
+    def __len__(self):
+        return len(self._order)
+
+class EmbeddingService(Embeddings):
+    """Embeddings that coalesce concurrent requests into batches and cache vectors."""
+
+    def __init__(self, embeddings, model: str = None, batch_window_ms: float = None, max_batch_size: int = None,
+                 cache_entries: int = None, cache_path: str = None):
+        self.embeddings = embeddings
+        self.model = model or getattr(embeddings, "model", None) or type(embeddings).__name__
+        self.batch_window = (CONFIG["embedding_batch_window_ms"] if batch_window_ms is None
+                             else batch_window_ms) / 1000
+        self.max_batch_size = max_batch_size or CONFIG["embedding_max_batch_size"]
+        self.cache = VectorCache(cache_entries or CONFIG["embedding_cache_max_entries"],
+                                 CONFIG["embedding_cache_path"] if cache_path is None else cache_path, self.model)
+        self._condition = threading.Condition()
+        self._queue = deque()
+        self._pending = {}
+        self._workers = []
+        self._batch_sizes = deque(maxlen=500)
+        self._model_latency = deque(maxlen=500)
+        self._queue_wait = deque(maxlen=500)
+        self._stats = {"requests": 0, "cache_hits": 0, "texts_embedded": 0, "batches": 0, "errors": 0}
+
+    def _key(self, text: str, kind: str) -> str:
+        # Queries are embedded like documents (batched) unless the model treats them differently
+        kind = "document" if CONFIG["embedding_batch_queries"] else kind
+        return hashlib.sha256(f"{self.model}\n{kind}\n{text}".encode("utf-8")).hexdigest()[:32]
+
+    def _submit(self, text: str, key: str) -> Future:
+        """Queue a text for the next batch (or join the request already queued for it)."""
+        with self._condition:
+            future = self._pending.get(key)
+            if future is None:
+                future = Future()
+                self._pending[key] = future
+                self._queue.append((text, key, future, time.perf_counter()))
+                if not self._workers:
+                    # Several batches in flight when the model server runs requests in parallel
+                    self._workers = [threading.Thread(target=self._run, name=f"embedding-batcher-{index}", daemon=True)
+                                     for index in range(CONFIG["embedding_batch_workers"])]
+                    for worker in self._workers:
+                        worker.start()
+                self._condition.notify()
+            return future
+
+    def _next_batch(self) -> list:
+        with self._condition:
+            while True:
+                while not self._queue:
+                    self._condition.wait()
+                # Give concurrent callers the window to join, unless the batch is already full
+                deadline = self._queue[0][3] + self.batch_window
+                while len(self._queue) < self.max_batch_size:
+                    remaining = deadline - time.perf_counter()
+                    if remaining <= 0:
+                        break
+                    self._condition.wait(remaining)
+                # Another worker may have taken the texts while this one waited
+                if self._queue:
+                    return [self._queue.popleft() for _ in range(min(self.max_batch_size, len(self._queue)))]
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            started = time.perf_counter()
+            try:
+                vectors = self.embeddings.embed_documents([text for text, _, _, _ in batch])
+                error = None
+            except Exception as e:
+                vectors, error = None, e
+            elapsed = time.perf_counter() - started
+            with self._condition:
+                self._stats["batches"] += 1
+                self._stats["texts_embedded"] += len(batch)
+                self._stats["errors"] += error is not None
+                self._batch_sizes.append(len(batch))
+                self._model_latency.append(elapsed)
+                self._queue_wait.extend(started - queued for _, _, _, queued in batch)
+                for _, key, _, _ in batch:
+                    self._pending.pop(key, None)
+            for index, (_, key, future, _) in enumerate(batch):
+                if error is not None:
+                    future.set_exception(error)
+                    continue
+                try:
+                    future.set_result(self.cache.put(key, vectors[index]))
+                except Exception as e:
+                    # A cache that cannot be written (e.g. disk full) must not fail the request
+                    logger.warning(f"Could not cache embedding: {str(e)}")
+                    future.set_result(list(vectors[index]))
+
+    def _embed(self, texts: List[str], kind: str) -> List[List[float]]:
+        keys = [self._key(text, kind) for text in texts]
+        results = [self.cache.get(key) for key in keys]
+        with self._condition:
+            self._stats["requests"] += len(texts)
+            self._stats["cache_hits"] += sum(result is not None for result in results)
+        if kind == "query" and not CONFIG["embedding_batch_queries"]:
+            for index, result in enumerate(results):
+                if result is None:
+                    results[index] = self.cache.put(keys[index], self.embeddings.embed_query(texts[index]))
+            return results
+        futures = {index: self._submit(texts[index], keys[index])
+                   for index, result in enumerate(results) if result is None}
+        for index, future in futures.items():
+            results[index] = future.result()
+        return results
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self._embed(list(texts), "document")
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._embed([text], "query")[0]
+
+    def flush(self):
+        """Write memory-mapped cache rows to disk."""
+        self.cache.flush()
+
+    def close(self):
+        """Release the on-disk cache so another process (or service) can open it."""
+        self.cache.close()
+
+    def stats(self) -> dict:
+        with self._condition:
+            stats = dict(self._stats, cached_vectors=len(self.cache), queued=len(self._queue))
+            sizes, latency, wait = list(self._batch_sizes), list(self._model_latency), list(self._queue_wait)
+        stats["mean_batch_size"] = round(sum(sizes) / len(sizes), 2) if sizes else None
+        for name, values in (("batch_size", sizes), ("model_latency_s", latency), ("queue_wait_s", wait)):
+            for label, value in _percentiles(values).items():
+                stats[f"{name}_{label}"] = value
+        return stats
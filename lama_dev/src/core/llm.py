@@ -2,34 +2,133 @@
 src/core/llm.py: Initializes the LLM for text-to-SQL generation.
 - Supports Ollama (local LLaMA) and AWS Bedrock (Claude).
 - Uses configuration from config.py.
+- Provider packages are imported only for the configured provider, so an Ollama
+  deployment never pays for importing the Bedrock client (and vice versa).
+- Deterministic mode (temperature 0, greedy decoding) plus the persistent LLM cache let
+  repeated ReAct steps skip generation entirely.
+- Provider-side prefix reuse: Ollama keeps the model loaded (keep_alive) so the static
+  prompt prefix stays in its KV cache; Bedrock can mark that prefix as a prompt-cache point.
+- With llm_backends configured, returns a RoutingLLM (src/core/llm_router.py) over
+  several Ollama hosts and/or Bedrock models.
+- With llm_streaming, each client is wrapped in EarlyStopLLM (src/core/llm_streaming.py),
+  which streams tokens and cancels generation once the tool call or final answer is complete.
 """
 
-from langchain_ollama import OllamaLLM
-from langchain_community.chat_models.bedrock import BedrockChat
 from src.config.config import CONFIG, AWS_REGION, AWS_ACCESS_KEY, AWS_SECRET_KEY
 from src.utils.logging import setup_logging
 
 
 logger = setup_logging(__name__)
 
-def initialize_llm():
-    """Initialize the LLM based on config."""
-    provider = CONFIG["llm_provider"].lower()
-    
+# The agent prompt puts static instructions, tools and schema before this marker and the
+# per-request part after it; providers can cache everything up to it
+PROMPT_CACHE_BOUNDARY = "Question:"
+
+def _temperature() -> float:
+    return 0.0 if CONFIG["llm_deterministic"] else CONFIG["llm_temperature"]
+
+def _with_cache_point(messages):
+    """Mark the static prompt prefix of the first human message as a Bedrock cache point."""
+    for index, message in enumerate(messages):
+        if message.type != "human":
+            continue
+        split = message.content.find(PROMPT_CACHE_BOUNDARY) if isinstance(message.content, str) else -1
+        if split > 0:
+            content = [
+                {"type": "text", "text": message.content[:split], "cache_control": {"type": "ephemeral"}},
+                {"type": "text", "text": message.content[split:]},
+            ]
+            messages = list(messages)
+            messages[index] = message.model_copy(update={"content": content})
+        break
+    return messages
+
+def _bedrock_chat_class():
+    from langchain_community.chat_models.bedrock import BedrockChat
+    if not CONFIG["bedrock_prompt_caching"]:
+        return BedrockChat
+
+    class PromptCachingBedrockChat(BedrockChat):
+        """BedrockChat that lets Claude reuse the cached static prefix of each prompt."""
+
+        def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+            return super()._generate(_with_cache_point(messages), stop, run_manager, **kwargs)
+
+        def _stream(self, messages, stop=None, run_manager=None, **kwargs):
+            return super()._stream(_with_cache_point(messages), stop, run_manager, **kwargs)
+
+    return PromptCachingBedrockChat
+
+def with_early_stop(llm, cache=None):
+    """Wrap a client so generations stream and stop at the complete step (if llm_streaming).
+
+    The cache moves to the wrapper: LangChain does not consult the cache when streaming,
+    and the wrapper caches the already trimmed step.
+    """
+    if not CONFIG["llm_streaming"]:
+        return llm
+    from src.core.llm_streaming import EarlyStopLLM
+    return EarlyStopLLM(llm=llm, cache=cache)
+
+def _create_llm(provider: str, model: str, cache=None, base_url: str = None):
+    """Create one provider client; base_url selects the Ollama host."""
+    if CONFIG["llm_streaming"]:
+        # False, not None: None would fall back to a globally configured cache
+        return with_early_stop(_create_client(provider, model, False, base_url), cache)
+    return _create_client(provider, model, cache, base_url)
+
+def _create_client(provider: str, model: str, cache=None, base_url: str = None):
     if provider == "ollama":
-        logger.info(f"Initializing Ollama with model: {CONFIG['ollama_model']}")
-        return OllamaLLM(model=CONFIG["ollama_model"], temperature=0.7)
-    
+        from langchain_ollama import OllamaLLM
+        logger.info(f"Initializing Ollama with model: {model}" + (f" at {base_url}" if base_url else ""))
+        return OllamaLLM(
+            model=model,
+            base_url=base_url,
+            temperature=_temperature(),
+            # Greedy decoding makes identical prompts produce identical steps
+            top_k=1 if CONFIG["llm_deterministic"] else None,
+            # Keeps the model (and its KV cache of the shared prompt prefix) loaded between calls
+            keep_alive=CONFIG["ollama_keep_alive"],
+            cache=cache,
+        )
+
     elif provider == "bedrock":
-        logger.info(f"Initializing Bedrock with model: {CONFIG['bedrock_model']}")
-        return BedrockChat(
-            model_id=CONFIG["bedrock_model"],
+        logger.info(f"Initializing Bedrock with model: {model}")
+        return _bedrock_chat_class()(
+            model_id=model,
             region_name=AWS_REGION,
             credentials_profile_name=None,
             aws_access_key_id=AWS_ACCESS_KEY,
             aws_secret_access_key=AWS_SECRET_KEY,
-            model_kwargs={"temperature": 0.7}
+            model_kwargs={"temperature": _temperature()},
+            cache=cache,
         )
-    
+
     else:
-        raise ValueError(f"Unsupported LLM provider: {provider}")
\ No newline at end of file
+        raise ValueError(f"Unsupported LLM provider: {provider}")
+
+def initialize_llm(cache=None):
+    """Initialize the LLM based on config, with the persistent LLM cache unless one is given.
+
+    With CONFIG["llm_backends"] set, returns a RoutingLLM over those backends instead.
+    """
+    if cache is None:
+        from src.core.llm_cache import initialize_llm_cache
+        cache = initialize_llm_cache()
+
+    if CONFIG["llm_backends"]:
+        from src.core.llm_router import Backend, RoutingLLM
+        backends = []
+        for index, spec in enumerate(CONFIG["llm_backends"]):
+            provider = spec.get("provider", CONFIG["llm_provider"]).lower()
+            model = spec.get("model") or CONFIG[f"{provider}_model"]
+            backends.append(Backend(
+                name=spec.get("name") or f"{provider}-{index}",
+                llm=_create_llm(provider, model, cache, spec.get("base_url")),
+                tier=spec.get("tier", "main"),
+            ))
+        logger.info(f"Routing LLM calls over {len(backends)} backends")
+        return RoutingLLM(backends=backends, hedge_percentile=CONFIG["llm_router_hedge_percentile"])
+
+    provider = CONFIG["llm_provider"].lower()
+    return _create_llm(provider, CONFIG[f"{provider}_model"], cache)
@@ -0,0 +1,151 @@
+"""
+src/core/llm_cache.py: Persistent cache of LLM generations.
+- Plugs into LangChain's cache interface (BaseCache), so every ReAct step of an
+  identical (model, prompt, parameters) call is answered from disk without generating.
+- Keys are a hash of LangChain's llm_string (model name, temperature, stop sequences and
+  other parameters) and the full prompt.
+- Stored in SQLite (WAL) so several worker processes can share it; bounded by entry
+  count and total bytes with least-recently-used eviction.
+- Only worth enabling with deterministic generation (see llm_deterministic in config.py).
+"""
+
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from langchain_core.caches import BaseCache
+from langchain_core.messages import message_to_dict, messages_from_dict
+from langchain_core.outputs import ChatGeneration, Generation
+from src.config.config import CONFIG
+from src.utils.logging import setup_logging
+
+logger = setup_logging(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS llm_cache (
+    key TEXT PRIMARY KEY,
+    response TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    last_used_at REAL NOT NULL,
+    hits INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS llm_cache_last_used ON llm_cache (last_used_at);
+"""
+
+def _cache_key(prompt: str, llm_string: str) -> str:
+    return hashlib.sha256(f"{llm_string}\0{prompt}".encode("utf-8")).hexdigest()
+
+def _dump_generations(generations) -> str:
+    items = []
+    for generation in generations:
+        item = {"text": generation.text, "generation_info": generation.generation_info}
+        if isinstance(generation, ChatGeneration):
+            item["message"] = message_to_dict(generation.message)
+        items.append(item)
+    return json.dumps(items, default=str)
+
+def _load_generations(response: str) -> list:
+    generations = []
+    for item in json.loads(response):
+        if "message" in item:
+            message = messages_from_dict([item["message"]])[0]
+            generations.append(ChatGeneration(message=message, generation_info=item["generation_info"]))
+        else:
+            generations.append(Generation(text=item["text"], generation_info=item["generation_info"]))
+    return generations
+
+class SQLiteLLMCache(BaseCache):
+    """Size-bounded LRU cache of LLM generations stored in a SQLite file."""
+
+    def __init__(self, path: str = None, max_entries: int = None, max_bytes: int = None):
+        self.path = path or CONFIG["llm_cache_path"]
+        self.max_entries = max_entries or CONFIG["llm_cache_max_entries"]
+        self.max_bytes = max_bytes or CONFIG["llm_cache_max_bytes"]
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+        self._stats = {"hits": 0, "misses": 0, "evictions": 0}
+
+    def lookup(self, prompt: str, llm_string: str):
+        key = _cache_key(prompt, llm_string)
+        with self._lock:
+            row = self._conn.execute("SELECT response FROM llm_cache WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self._stats["misses"] += 1
+                return None
+            self._conn.execute(
+                "UPDATE llm_cache SET last_used_at = ?, hits = hits + 1 WHERE key = ?", (time.time(), key)
+            )
+            self._conn.commit()
+            self._stats["hits"] += 1
+        try:
+            return _load_generations(row[0])
+        except Exception as e:
+            logger.warning(f"Dropping unreadable LLM cache entry: {str(e)}")
+            with self._lock:
+                self._conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+                self._conn.commit()
+            return None
+
+    def update(self, prompt: str, llm_string: str, return_val):
+        response = _dump_generations(return_val)
+        if len(response) > self.max_bytes:
+            return
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, response, size, created_at, last_used_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (_cache_key(prompt, llm_string), response, len(response), now, now),
+            )
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        """Drop least recently used entries until both bounds hold (caller holds the lock)."""
+        count, total = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM llm_cache").fetchone()
+        if count <= self.max_entries and total <= self.max_bytes:
+            return
+        evicted = 0
+        while count > self.max_entries or total > self.max_bytes:
+            oldest = self._conn.execute(
+                "SELECT key, size FROM llm_cache ORDER BY last_used_at LIMIT ?",
+                (max(count - self.max_entries, 16),),
+            ).fetchall()
+            if not oldest:
+                break
+            for key, size in oldest:
+                if count <= self.max_entries and total <= self.max_bytes:
+                    break
+                self._conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+                count, total, evicted = count - 1, total - size, evicted + 1
+        self._stats["evictions"] += evicted
+
+    def clear(self, **kwargs):
+        with self._lock:
+            self._conn.execute("DELETE FROM llm_cache")
+            self._conn.commit()
+
+    def stats(self) -> dict:
+        """Hit/miss/eviction counters for this process plus the size of the shared file."""
+        with self._lock:
+            count, total = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM llm_cache"
+            ).fetchone()
+            stats = dict(self._stats)
+        lookups = stats["hits"] + stats["misses"]
+        stats.update(entries=count, bytes=total, hit_rate=stats["hits"] / lookups if lookups else 0.0)
+        return stats
+
+def initialize_llm_cache():
+    """Open the persistent LLM cache, or return None when disabled in config."""
+    if not CONFIG["llm_cache_enabled"]:
+        return None
+    if not CONFIG["llm_deterministic"]:
+        logger.warning("LLM cache enabled with sampling: cached steps replay one sampled output")
+    logger.info(f"Using LLM cache at {CONFIG['llm_cache_path']}")
+    return SQLiteLLMCache()
@@ -0,0 +1,225 @@
+"""
+src/core/llm_router.py: Routes LLM calls over a pool of backends.
+- RoutingLLM is a LangChain LLM wrapping several backends (Ollama hosts and/or Bedrock);
+  each call goes to the available backend with the fewest outstanding requests.
+- A circuit breaker per backend stops routing to it after consecutive failures and lets
+  one trial request through after a cooldown; failed calls fail over to the next backend.
+- Hedging: if a call is still running after the backend's recent latency percentile, a
+  duplicate goes to a second backend and the first successful answer wins.
+- Easy questions (short, no grouping/ranking/comparison wording) go to a cheaper "easy"
+  tier first and fall back to the main tier.
+"""
+
+import re
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, List, Optional
+from langchain_core.language_models.llms import LLM
+from pydantic import ConfigDict, PrivateAttr
+from src.config.config import CONFIG
+from src.utils.logging import setup_logging
+
+logger = setup_logging(__name__)
+
+_QUESTION_PATTERN = re.compile(r"Question:\s*(.+)")
+_HARD_WORDS = re.compile(
+    r"\b(each|per|every|group|top|most|least|highest|lowest|rank|compare|versus|vs|ratio|"
+    r"percent|percentage|trend|over time|average|median|between|join|both|without|except)\b",
+    re.IGNORECASE,
+)
+
+def is_easy_question(question: str, max_words: int = None) -> bool:
+    """Heuristic: short questions without grouping, ranking or comparison wording."""
+    max_words = max_words or CONFIG["llm_router_easy_max_words"]
+    return len(question.split()) <= max_words and not _HARD_WORDS.search(question)
+
+class CircuitBreaker:
+    """Closed -> open after `threshold` consecutive failures; half-open after `cooldown` seconds."""
+
+    def __init__(self, threshold: int, cooldown: float):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at = None
+        self._trial_in_flight = False
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        return "half_open" if time.monotonic() - self.opened_at >= self.cooldown else "open"
+
+    def allow(self) -> bool:
+        state = self.state
+        if state == "closed":
+            return True
+        if state == "half_open" and not self._trial_in_flight:
+            self._trial_in_flight = True
+            return True
+        return False
+
+    def record_success(self):
+        self.failures = 0
+        self.opened_at = None
+        self._trial_in_flight = False
+
+    def record_failure(self):
+        self.failures += 1
+        self._trial_in_flight = False
+        if self.failures >= self.threshold or self.opened_at is not None:
+            self.opened_at = time.monotonic()
+
+class Backend:
+    """One LLM endpoint with its outstanding-request count, latencies and breaker."""
+
+    def __init__(self, name: str, llm, tier: str = "main"):
+        self.name = name
+        self.llm = llm
+        self.tier = tier
+        self.outstanding = 0
+        self.requests = 0
+        self.failures = 0
+        self.latencies = deque(maxlen=200)
+        self.breaker = CircuitBreaker(CONFIG["llm_router_failure_threshold"],
+                                      CONFIG["llm_router_cooldown_seconds"])
+
+    def latency_percentile(self, fraction: float) -> Optional[float]:
+        if len(self.latencies) < CONFIG["llm_router_hedge_min_samples"]:
+            return None
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+    def stats(self) -> dict:
+        return {"tier": self.tier, "outstanding": self.outstanding, "requests": self.requests,
+                "failures": self.failures, "breaker": self.breaker.state,
+                "p50_s": self.latency_percentile(0.5), "p95_s": self.latency_percentile(0.95)}
+
+class NoBackendAvailable(Exception):
+    """Every backend's circuit breaker is open."""
+
+class RoutingLLM(LLM):
+    """LLM that balances, fails over and hedges calls across several backends."""
+
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    backends: List[Any]
+    hedge_percentile: Optional[float] = None
+
+    _lock: Any = PrivateAttr(default_factory=threading.Lock)
+    _pool: Any = PrivateAttr(default=None)
+    _stats: dict = PrivateAttr(default_factory=lambda: {"hedged": 0, "hedge_wins": 0, "easy_routed": 0,
+                                                         "failovers": 0})
+
+    @property
+    def _llm_type(self) -> str:
+        return "routing"
+
+    @property
+    def _identifying_params(self) -> dict:
+        return {"backends": [(backend.name, backend.tier) for backend in self.backends]}
+
+    def _executor(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(max_workers=max(4, 2 * len(self.backends)),
+                                                thread_name_prefix="llm-router")
+            return self._pool
+
+    def _acquire(self, tiers, exclude=()) -> Optional[Backend]:
+        """Pick the least-loaded allowed backend of the first tier that has one."""
+        with self._lock:
+            for tier in tiers:
+                candidates = sorted(
+                    (b for b in self.backends if b.tier == tier and b not in exclude),
+                    key=lambda b: (b.outstanding, b.latency_percentile(0.5) or 0.0),
+                )
+                for backend in candidates:
+                    if backend.breaker.allow():
+                        backend.outstanding += 1
+                        backend.requests += 1
+                        return backend
+        return None
+
+    def _invoke(self, backend: Backend, prompt: str, stop, kwargs) -> str:
+        started = time.perf_counter()
+        try:
+            result = backend.llm.invoke(prompt, stop=stop, **kwargs)
+        except Exception:
+            with self._lock:
+                backend.outstanding -= 1
+                backend.failures += 1
+                backend.breaker.record_failure()
+            raise
+        with self._lock:
+            backend.outstanding -= 1
+            backend.latencies.append(time.perf_counter() - started)
+            backend.breaker.record_success()
+        # Chat models (Bedrock) return a message, completion models a string
+        return getattr(result, "content", result)
+
+    def _call_hedged(self, backend: Backend, tiers, prompt: str, stop, kwargs, tried: list) -> str:
+        """Run on backend; after its latency percentile, race a duplicate on another backend.
+
+        The hedge backend is added to tried, so failover after both fail skips it too.
+        """
+        delay = backend.latency_percentile(self.hedge_percentile) if self.hedge_percentile else None
+        if delay is None:
+            # Hedging off, or too few samples to know what "slow" means for this backend
+            return self._invoke(backend, prompt, stop, kwargs)
+        executor = self._executor()
+        futures = {executor.submit(self._invoke, backend, prompt, stop, kwargs): backend}
+        done, _ = wait(futures, timeout=delay)
+        if not done:
+            second = self._acquire(tiers, exclude=tried)
+            if second is not None:
+                tried.append(second)
+                logger.info(f"Hedging LLM call from {backend.name} to {second.name} after {delay:.3f}s")
+                with self._lock:
+                    self._stats["hedged"] += 1
+                futures[executor.submit(self._invoke, second, prompt, stop, kwargs)] = second
+
+        pending, error = set(futures), None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    if futures[future] is not backend:
+                        with self._lock:
+                            self._stats["hedge_wins"] += 1
+                    return future.result()
+                error = future.exception()
+        raise error
+
+    def _call(self, prompt: str, stop: Optional[List[str]] = None, run_manager: Any = None,
+              **kwargs: Any) -> str:
+        tiers = ["main"]
+        match = _QUESTION_PATTERN.search(prompt)
+        if match and is_easy_question(match.group(1)) and any(b.tier == "easy" for b in self.backends):
+            tiers = ["easy", "main"]
+            with self._lock:
+                self._stats["easy_routed"] += 1
+
+        tried, last_error = [], None
+        while True:
+            backend = self._acquire(tiers, exclude=tried)
+            if backend is None:
+                break
+            tried.append(backend)
+            try:
+                return self._call_hedged(backend, tiers, prompt, stop, kwargs, tried)
+            except Exception as e:
+                logger.warning(f"LLM backend {backend.name} failed, failing over: {str(e)}")
+                last_error = e
+                with self._lock:
+                    self._stats["failovers"] += 1
+        if last_error is not None:
+            raise last_error
+        raise NoBackendAvailable("All LLM backends are unavailable (circuit breakers open)")
+
+    def stats(self) -> dict:
+        """Per-backend load, latency and breaker state plus hedging/routing counters."""
+        with self._lock:
+            return {"backends": {backend.name: backend.stats() for backend in self.backends},
+                    **self._stats}
@@ -0,0 +1,204 @@
+"""
+src/core/llm_streaming.py: Streams generations and stops once the ReAct step is complete.
+- EarlyStopLLM wraps a provider client (Ollama, Bedrock, or any LangChain model that can
+  stream) and reads its output token by token.
+- StepCutter parses the partial output incrementally: a tool call is complete at the end
+  of its Action Input (a ';' outside quotes or the next ReAct field; blank lines stay in
+  it), a final answer at the next Thought/Action/Observation/Question field or the end
+  of the stream, and a bare SQL answer (candidate prompts) at ';' or a blank line.
+- At that point the stream is closed, so the client drops the connection and the
+  provider stops generating; the parser gets the step without the model's rambling or
+  invented Observation. Stop sequences (llm_stop_sequences) still end generation
+  server-side where the provider supports them.
+- Time to first token and first token to complete action are recorded per call
+  (llm_first_token / llm_action stages in the trace metrics).
+"""
+
+import re
+import threading
+import time
+from collections import deque
+from contextlib import aclosing, closing
+from typing import Any, List, Optional
+from langchain_core.language_models.llms import LLM
+from langchain_core.outputs import Generation, LLMResult
+from pydantic import ConfigDict, PrivateAttr
+from src.utils.logging import setup_logging
+from src.utils.tracing import record_span
+
+logger = setup_logging(__name__)
+
+_ACTION = re.compile(r"Action\s*\d*\s*:")
+_ACTION_INPUT = re.compile(r"Action\s*\d*\s*Input\s*\d*\s*:")
+_FINAL_ANSWER = re.compile(r"Final Answer\s*:")
+# An Action Input or final answer may contain blank lines (multi-line SQL, lists); only a
+# new field ends it
+_NEXT_FIELD = re.compile(r"\n[ \t]*(?:Thought|Action(?:\s*\d*\s*Input)?|Observation|Final Answer|Question)\s*\d*\s*:")
+_ANSWER_END = re.compile(r"\n[ \t]*(?:Thought|Action(?:\s*\d*\s*Input)?|Observation|Question)\s*\d*\s*:")
+_BLANK_LINE = re.compile(r"\n[ \t]*\n")
+_BARE_SQL = re.compile(r"\s*(?:```(?:sql)?\s*)?(?:SELECT|WITH)\b", re.IGNORECASE)
+
+# The wrapper's own run is what callbacks (tracing, verbose output) see; without this the
+# wrapped model would inherit them from the context and every call would be reported twice
+_NO_CALLBACKS = {"callbacks": []}
+
+def _statement_end(text: str, start: int):
+    """Index just past the first ';' outside quotes at or after start, or None."""
+    quote = None
+    for index in range(start, len(text)):
+        char = text[index]
+        if quote:
+            if char == quote:
+                quote = None
+        elif char in ("'", '"', "`"):
+            quote = char
+        elif char == ";":
+            return index + 1
+    return None
+
+def _field_end(text: str, start: int):
+    """Start of the next ReAct field at or after start (an empty input ends there), or None."""
+    match = _NEXT_FIELD.search(text, start)
+    return match.start() if match else None
+
+class StepCutter:
+    """Incremental parser that finds where a streamed ReAct step (or bare SQL) is complete."""
+
+    def __init__(self):
+        self.text = ""
+
+    def feed(self, chunk: str):
+        """Add streamed text; returns the length of the complete step, or None to keep reading."""
+        self.text += chunk
+        return self.complete_at(self.text)
+
+    @staticmethod
+    def complete_at(text: str):
+        action = _ACTION.search(text)
+        action_input = _ACTION_INPUT.search(text, action.end()) if action else None
+        final = _FINAL_ANSWER.search(text)
+        if action_input and (final is None or action_input.start() < final.start()):
+            # An answer the model writes after its own tool call is cut off with the rambling
+            ends = [end for end in (_statement_end(text, action_input.end()),
+                                    _field_end(text, action_input.end())) if end is not None]
+            return min(ends) if ends else None
+        if final:
+            match = _ANSWER_END.search(text, final.end())
+            return match.start() if match else None
+        if not action and _BARE_SQL.match(text):
+            start = _BARE_SQL.match(text).end()
+            blank = _BLANK_LINE.search(text, start)
+            ends = [end for end in (_statement_end(text, start), _field_end(text, start),
+                                    blank.start() if blank else None,
+                                    text.find("```", start) if "```" in text[start:] else None)
+                    if end is not None]
+            return min(ends) if ends else None
+        return None
+
+def _chunk_text(chunk) -> str:
+    # Completion models stream strings, chat models message chunks
+    content = getattr(chunk, "content", chunk)
+    return content if isinstance(content, str) else ""
+
+class EarlyStopLLM(LLM):
+    """LLM that streams from a wrapped model and cancels it once the step is complete."""
+
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    llm: Any
+
+    _lock: Any = PrivateAttr(default_factory=threading.Lock)
+    _first_token: Any = PrivateAttr(default_factory=lambda: deque(maxlen=500))
+    _action: Any = PrivateAttr(default_factory=lambda: deque(maxlen=500))
+    _stats: dict = PrivateAttr(default_factory=lambda: {"calls": 0, "early_stops": 0, "chunks": 0})
+
+    @property
+    def _llm_type(self) -> str:
+        return "early_stop"
+
+    @property
+    def _identifying_params(self) -> dict:
+        # Part of the LLM cache key: cached entries are per wrapped model and sampling
+        # settings (OllamaLLM reports none of them in its own identifying params)
+        params = {"llm_type": getattr(self.llm, "_llm_type", type(self.llm).__name__),
+                  **getattr(self.llm, "_identifying_params", {})}
+        for field in ("model", "model_id", "base_url", "temperature", "top_k", "top_p", "model_kwargs"):
+            value = getattr(self.llm, field, None)
+            if value is not None:
+                params.setdefault(field, value)
+        return params
+
+    def _finish(self, text: str, cut, chunks: int, started: float, first_token_at, cut_at) -> Generation:
+        """Build the generation and record timings for one streamed call."""
+        now = time.perf_counter()
+        first_token_s = (first_token_at or now) - started
+        action_s = (cut_at or now) - (first_token_at or now)
+        with self._lock:
+            self._stats["calls"] += 1
+            self._stats["chunks"] += chunks
+            self._stats["early_stops"] += cut is not None
+            self._first_token.append(first_token_s)
+            self._action.append(action_s)
+        record_span("llm_first_token", started, first_token_s)
+        record_span("llm_action", started + first_token_s, action_s, early_stop=cut is not None)
+        return Generation(
+            text=text[:cut].rstrip() if cut is not None else text,
+            # Streamed chunks are about one token each; a cancelled stream never gets the
+            # provider's final eval_count
+            generation_info={"eval_count": chunks, "early_stop": cut is not None},
+        )
+
+    def _generate_one(self, prompt: str, stop, **kwargs) -> Generation:
+        cutter, chunks, cut = StepCutter(), 0, None
+        started, first_token_at, cut_at = time.perf_counter(), None, None
+        # Closing the stream closes the HTTP response, which cancels generation on the provider
+        with closing(iter(self.llm.stream(prompt, _NO_CALLBACKS, stop=stop, **kwargs))) as stream:
+            for chunk in stream:
+                text = _chunk_text(chunk)
+                if not text:
+                    continue
+                first_token_at = first_token_at or time.perf_counter()
+                chunks += 1
+                cut = cutter.feed(text)
+                if cut is not None:
+                    cut_at = time.perf_counter()
+                    break
+        return self._finish(cutter.text, cut, chunks, started, first_token_at, cut_at)
+
+    async def _agenerate_one(self, prompt: str, stop, **kwargs) -> Generation:
+        cutter, chunks, cut = StepCutter(), 0, None
+        started, first_token_at, cut_at = time.perf_counter(), None, None
+        async with aclosing(self.llm.astream(prompt, _NO_CALLBACKS, stop=stop, **kwargs)) as stream:
+            async for chunk in stream:
+                text = _chunk_text(chunk)
+                if not text:
+                    continue
+                first_token_at = first_token_at or time.perf_counter()
+                chunks += 1
+                cut = cutter.feed(text)
+                if cut is not None:
+                    cut_at = time.perf_counter()
+                    break
+        return self._finish(cutter.text, cut, chunks, started, first_token_at, cut_at)
+
+    def _generate(self, prompts: List[str], stop: Optional[List[str]] = None, run_manager: Any = None,
+                  **kwargs: Any) -> LLMResult:
+        return LLMResult(generations=[[self._generate_one(prompt, stop, **kwargs)] for prompt in prompts])
+
+    async def _agenerate(self, prompts: List[str], stop: Optional[List[str]] = None, run_manager: Any = None,
+                         **kwargs: Any) -> LLMResult:
+        return LLMResult(generations=[[await self._agenerate_one(prompt, stop, **kwargs)] for prompt in prompts])
+
+    def _call(self, prompt: str, stop: Optional[List[str]] = None, run_manager: Any = None,
+              **kwargs: Any) -> str:
+        return self._generate_one(prompt, stop, **kwargs).text
+
+    def stats(self) -> dict:
+        """Calls, early stops and p50/p95 seconds to first token and from it to the complete step."""
+        with self._lock:
+            stats = dict(self._stats)
+            samples = {"first_token": sorted(self._first_token), "action": sorted(self._action)}
+        for name, values in samples.items():
+            for label, fraction in (("p50", 0.5), ("p95", 0.95)):
+                stats[f"{name}_{label}_s"] = values[min(len(values) - 1, int(fraction * len(values)))] if values else None
+        return stats
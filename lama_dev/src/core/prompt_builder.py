@@ -0,0 +1,197 @@
+"""
+src/core/prompt_builder.py: Token-budgeted prompt parts for the agent.
+- count_tokens uses tiktoken when it is installed (cl100k_base; close to Llama 3's
+  tokenizer) and otherwise a local regex approximation; no network or model call.
+- compact_table serializes a catalog table as table(col:type pk, col:type->other.col, ...)
+  instead of CREATE TABLE DDL, typically a third of the tokens.
+- build_schema / select_examples rank tables and few-shot examples by lexical overlap
+  with the question and keep the most relevant ones that fit their token budgets.
+- format_scratchpad renders ReAct steps like LangChain's format_log_to_str, but keeps
+  only the latest observations in full and truncates or drops older ones to fit what is
+  left of prompt_token_budget.
+"""
+
+import re
+import threading
+from src.config.config import CONFIG
+from src.utils.logging import setup_logging
+
+logger = setup_logging(__name__)
+
+_WORD = re.compile(r"[A-Za-z]+|\d+|[^\sA-Za-z\d]+")
+_NAME_PART = re.compile(r"[A-Z]?[a-z]+|[A-Z]+(?![a-z])|\d+")
+
+_encoder = None
+_encoder_lock = threading.Lock()
+
+def _get_encoder():
+    """tiktoken's cl100k_base if available, else False (use the approximation)."""
+    global _encoder
+    if _encoder is None:
+        with _encoder_lock:
+            if _encoder is None:
+                try:
+                    import tiktoken
+                    _encoder = tiktoken.get_encoding("cl100k_base")
+                except Exception as e:
+                    # Not installed, or the encoding file cannot be fetched offline
+                    logger.info(f"tiktoken unavailable, approximating token counts: {str(e)}")
+                    _encoder = False
+    return _encoder
+
+def count_tokens(text: str) -> int:
+    """Number of tokens in text (exact with tiktoken, otherwise a close approximation)."""
+    if not text:
+        return 0
+    encoder = _get_encoder() if CONFIG["prompt_tokenizer"] == "tiktoken" else False
+    if encoder:
+        return len(encoder.encode(text, disallowed_special=()))
+    # BPE vocabularies keep common words whole and split long ones, group digits by up to
+    # three and merge common punctuation pairs such as "),"
+    count = 0
+    for piece in _WORD.findall(text):
+        if piece.isalpha():
+            count += 1 + (len(piece) - 1) // 6
+        elif piece.isdigit():
+            count += (len(piece) + 2) // 3
+        else:
+            count += (len(piece) + 1) // 2
+    return count
+
+def truncate_tokens(text: str, budget: int) -> str:
+    """Cut text to roughly budget tokens, marking the cut."""
+    if count_tokens(text) <= budget:
+        return text
+    # Shrink proportionally, then trim until it fits
+    cut = max(0, int(len(text) * budget / max(count_tokens(text), 1)))
+    while cut > 0 and count_tokens(text[:cut]) > budget:
+        cut = int(cut * 0.9)
+    return text[:cut].rstrip() + " ...(truncated)"
+
+_TYPE_NAMES = (
+    (("INT",), "int"),
+    (("CHAR", "TEXT", "CLOB", "STRING"), "text"),
+    (("REAL", "FLOA", "DOUB"), "real"),
+    (("DEC", "NUMERIC"), "num"),
+    (("BOOL",), "bool"),
+    (("TIMESTAMP", "DATETIME"), "datetime"),
+    (("DATE",), "date"),
+    (("BLOB", "BINARY"), "blob"),
+)
+
+def compact_type(type_: str) -> str:
+    """Short type name by SQLite's affinity rules (VARCHAR(20) -> text, BIGINT -> int)."""
+    upper = type_.upper()
+    for markers, name in _TYPE_NAMES:
+        if any(marker in upper for marker in markers):
+            return name
+    return type_.lower() or "any"
+
+def compact_table(info: dict, samples: dict = None) -> str:
+    """One-line schema: name(col:type pk, fk_col:int->table.col, text_col:text e.g. 'a'|'b')."""
+    references = {}
+    for fk in info.get("foreign_keys", []):
+        for column, referred in zip(fk["columns"], fk["referred_columns"]):
+            references[column] = f"{fk['referred_table']}.{referred}"
+    parts = []
+    for column in info["columns"]:
+        part = f"{column['name']}:{compact_type(column['type'])}"
+        if column.get("primary_key"):
+            part += " pk"
+        if column["name"] in references:
+            part += f"->{references[column['name']]}"
+        values = (samples or {}).get(column["name"])
+        if values:
+            part += " e.g. " + "|".join(repr(value) for value in values)
+        parts.append(part)
+    return f"{info['name']}({', '.join(parts)})"
+
+def _words(text: str) -> set:
+    """Lower-case word stems of a question or identifier (splits snake_case and camelCase)."""
+    words = set()
+    for part in _NAME_PART.findall(text or ""):
+        word = part.lower()
+        words.add(word[:-1] if len(word) > 3 and word.endswith("s") else word)
+    return words
+
+def rank_tables(question: str, tables: dict) -> list:
+    """Table names ordered by overlap with the question (table-name hits weigh most),
+    each followed by its foreign-key neighbours."""
+    question_words = _words(question)
+    scores = {}
+    for name, info in tables.items():
+        column_words = set()
+        for column in info["columns"]:
+            column_words |= _words(column["name"])
+        scores[name] = 3 * len(_words(name) & question_words) + len(column_words & question_words)
+    ranked = []
+    for name in sorted(tables, key=lambda n: (-scores[n], n)):
+        if name in ranked:
+            continue
+        ranked.append(name)
+        if scores[name]:
+            for fk in tables[name].get("foreign_keys", []):
+                if fk["referred_table"] in tables and fk["referred_table"] not in ranked:
+                    ranked.append(fk["referred_table"])
+    return ranked
+
+def fit_to_budget(items, budget: int) -> list:
+    """Keep items (in order) while their tokens fit the budget; the first is always kept."""
+    selected, used = [], 0
+    for item in items:
+        cost = count_tokens(item)
+        if selected and used + cost > budget:
+            continue
+        selected.append(item)
+        used += cost
+    return selected
+
+def build_schema(question: str, catalog=None, budget: int = None) -> str:
+    """Compact schema of the catalog tables most relevant to the question, within budget."""
+    if catalog is None:
+        from src.core.db_router import get_query_catalog
+        catalog = get_query_catalog()
+    budget = budget or CONFIG["schema_token_budget"]
+    tables = {name: info for name, info in catalog.tables().items() if info["kind"] == "table"}
+    lines = [compact_table(tables[name]) for name in rank_tables(question, tables)]
+    return "\n".join(fit_to_budget(lines, budget))
+
+def select_examples(question: str, examples=None, budget: int = None) -> str:
+    """Few-shot block of the configured examples most similar to the question, or ""."""
+    examples = CONFIG["prompt_examples"] if examples is None else examples
+    if not examples:
+        return ""
+    budget = budget or CONFIG["prompt_examples_token_budget"]
+    question_words = _words(question)
+    ranked = sorted(examples, key=lambda e: -len(_words(e["question"]) & question_words))
+    lines = fit_to_budget([f"Q: {e['question']}\nSQL: {e['sql']}" for e in ranked], budget)
+    return "Examples:\n" + "\n".join(lines) + "\n" if lines else ""
+
+def format_scratchpad(intermediate_steps, budget: int = None) -> str:
+    """ReAct scratchpad within budget tokens.
+
+    The last scratchpad_keep_steps observations are kept in full; older ones are cut to
+    scratchpad_observation_tokens. If that is still too long, the oldest steps are
+    replaced by a one-line note, and a latest observation larger than the whole budget is
+    cut to fit. Actions themselves are never altered.
+    """
+    keep = CONFIG["scratchpad_keep_steps"]
+    steps = []
+    for index, (action, observation) in enumerate(intermediate_steps):
+        observation = str(observation)
+        if index < len(intermediate_steps) - keep:
+            observation = truncate_tokens(observation, CONFIG["scratchpad_observation_tokens"])
+        steps.append(f"{action.log}\nObservation: {observation}\nThought: ")
+    if budget is not None:
+        omitted = 0
+        while len(steps) > 1 and sum(count_tokens(step) for step in steps) > budget:
+            steps.pop(0)
+            omitted += 1
+        if steps and count_tokens(steps[0]) > budget:
+            action, observation = intermediate_steps[-1]
+            overhead = count_tokens(f"{action.log}\nObservation: \nThought: ")
+            steps[0] = (f"{action.log}\nObservation: "
+                        f"{truncate_tokens(str(observation), max(budget - overhead, 50))}\nThought: ")
+        if omitted:
+            steps.insert(0, f"({omitted} earlier step(s) omitted to fit the prompt budget)\n")
+    return "".join(steps)
@@ -0,0 +1,318 @@
+"""
+src/core/query_execution.py: Single execution path for generated SQL.
+- Runs a query once and records rows, row count and timing in a structured record.
+- Publishes records to a per-request side channel (a ContextVar) so callers can read
+  what the agent actually executed instead of re-running the query.
+- Streams results through a server-side cursor with fetchmany; only a bounded preview
+  (max rows / max bytes) plus column summary statistics is kept for the agent, with an
+  order-insensitive fingerprint of the full result (candidate voting compares it).
+- Validates each query first (src/core/sql_validation.py); rejected queries never reach
+  the database. Execution is bounded by a statement timeout and a result row limit.
+- Repeated queries are answered from the result cache (src/core/result_cache.py) until
+  the data they read changes.
+- Successful queries are recorded for the workload advisor (src/core/advisor.py), and
+  aggregates covered by one of its summary tables are executed against the summary.
+- stream_query yields typed rows, or NumPy/Arrow column batches, for API callers (served
+  by POST /stream); it is validated and bounded like run_query.
+- Both run on the least busy read replica when replicas are configured (src/core/db_router.py).
+"""
+
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from langchain_community.utilities.sql_database import truncate_word
+from sqlalchemy import text
+from src.config.config import CONFIG
+from src.core.advisor import get_advisor
+from src.core.database import get_sql_database
+from src.core.db_router import read_engine
+from src.core.result_cache import get_result_cache
+from src.core.sql_validation import validate_sql
+from src.utils.logging import setup_logging
+from src.utils.tracing import span
+
+logger = setup_logging(__name__)
+
+_captured_queries = ContextVar("captured_queries", default=None)
+
+@contextmanager
+def capture_queries():
+    """Collect every query executed in this context; yields the list of records."""
+    records = []
+    token = _captured_queries.set(records)
+    try:
+        yield records
+    finally:
+        _captured_queries.reset(token)
+
+def _format_observation(rows, max_string_length: int) -> str:
+    """Format rows exactly like SQLDatabase.run(fetch="all")."""
+    if not rows:
+        return ""
+    return str([
+        tuple(truncate_word(value, length=max_string_length) for value in row)
+        for row in rows
+    ])
+
+def _row_digest(row) -> int:
+    """Hash of a row, stable within a process; floats are rounded so equivalent computations agree."""
+    values = tuple(round(value, 6) if type(value) is float else value for value in row)
+    try:
+        return hash(values)
+    except TypeError:
+        return hash(repr(values))
+
+class _ResultSummary:
+    """Bounded preview plus per-column statistics accumulated batch by batch."""
+
+    def __init__(self, columns, max_rows: int, max_bytes: int):
+        self.columns = columns
+        self.max_rows = max_rows
+        self.max_bytes = max_bytes
+        self.preview = []
+        self.preview_bytes = 0
+        self.row_count = 0
+        self.truncated = False
+        self.digest = 0
+        self.stats = {column: {"nulls": 0, "min": None, "max": None, "sum": 0, "numeric": 0}
+                      for column in columns}
+
+    def add(self, rows):
+        for row in rows:
+            self.row_count += 1
+            # Sum of row hashes: independent of row order, and duplicates still count
+            self.digest = (self.digest + _row_digest(row)) & 0xFFFFFFFFFFFFFFFF
+            if not self.truncated:
+                size = len(repr(row))
+                if len(self.preview) < self.max_rows and self.preview_bytes + size <= self.max_bytes:
+                    self.preview.append(tuple(row))
+                    self.preview_bytes += size
+                else:
+                    self.truncated = True
+            for column, value in zip(self.columns, row):
+                stat = self.stats[column]
+                if value is None:
+                    stat["nulls"] += 1
+                    continue
+                try:
+                    if stat["min"] is None or value < stat["min"]:
+                        stat["min"] = value
+                    if stat["max"] is None or value > stat["max"]:
+                        stat["max"] = value
+                except TypeError:
+                    pass
+                if isinstance(value, (int, float)) and not isinstance(value, bool):
+                    stat["sum"] += value
+                    stat["numeric"] += 1
+
+    def fingerprint(self) -> str:
+        """Order-insensitive fingerprint of every row added (not just the preview); comparable
+        between results of the same process (string hashes are randomized per process)."""
+        return f"{self.digest:016x}"
+
+    def column_stats(self) -> dict:
+        summary = {}
+        for column, stat in self.stats.items():
+            entry = {"nulls": stat["nulls"], "min": stat["min"], "max": stat["max"]}
+            if stat["numeric"]:
+                entry["mean"] = stat["sum"] / stat["numeric"]
+            summary[column] = entry
+        return summary
+
+def run_query(query: str, db=None, max_rows: int = None, max_bytes: int = None) -> dict:
+    """Execute a query once and return a record with a bounded preview, stats and timing."""
+    db = db or get_sql_database()
+    max_rows = max_rows or CONFIG["result_max_rows"]
+    max_bytes = max_bytes or CONFIG["result_max_bytes"]
+    record = {"query": query, "columns": [], "rows": [], "row_count": 0, "truncated": False,
+              "stats": {}, "elapsed_ms": 0.0, "error": None, "warnings": []}
+    started = time.perf_counter()
+    cache = get_result_cache(db._engine)
+    cache_key = cache.key(query, max_rows, max_bytes) if cache is not None else None
+    if cache_key is not None:
+        with span("result_cache") as attributes:
+            cached = cache.lookup(cache_key)
+            attributes.update(hit=cached is not None)
+        if cached is not None:
+            # The cached record came from a query that passed validation against the same data
+            record.update(cached, query=query, cached=True)
+            record["elapsed_ms"] = (time.perf_counter() - started) * 1000
+            _observe(db, query, cached["elapsed_ms"])
+            publish_record(record)
+            return record
+
+    tables = None
+    if CONFIG["sql_validation_enabled"]:
+        with span("sql_validation") as attributes:
+            validation = validate_sql(query, db)
+            attributes.update(ok=validation["ok"], estimated_rows=validation["estimated_rows"])
+        record["warnings"] = validation["warnings"]
+        tables = validation["tables"]
+        if not validation["ok"]:
+            # Never reaches the database; the message goes straight back to the agent
+            record["error"] = validation["error"]
+            record["observation"] = f"Error: {validation['error']}"
+    if record["error"] is None:
+        # Snapshot before executing, so a write racing the query invalidates the entry
+        versions = cache.versions(tables) if cache_key is not None else None
+        advisor = get_advisor(db._engine) if CONFIG["advisor_rewrite_enabled"] else None
+        rewritten = advisor.rewrite(query) if advisor is not None else None
+        with span("sql_execution") as attributes, read_engine(db) as engine:
+            executed = time.perf_counter()
+            _execute_into(record, rewritten or query, db, max_rows, max_bytes, engine)
+            if rewritten and record["error"] is not None:
+                advisor.record_rewrite_failure(rewritten, record["error"])
+                record["error"] = None
+                rewritten = None
+                _execute_into(record, query, db, max_rows, max_bytes, engine)
+            if rewritten:
+                record["rewritten_query"] = rewritten
+            attributes.update(row_count=record["row_count"], error=record["error"], rewritten=bool(rewritten))
+        if cache_key is not None:
+            cache.store(cache_key, record, tables, versions)
+        if record["error"] is None:
+            _observe(db, query, (time.perf_counter() - executed) * 1000)
+    record["elapsed_ms"] = (time.perf_counter() - started) * 1000
+    publish_record(record)
+    return record
+
+def execute_uncached(query: str, db=None, max_rows: int = None, max_bytes: int = None) -> dict:
+    """Execute a query on the primary, bypassing the result cache and advisor rewrites (verification)."""
+    db = db or get_sql_database()
+    record = {"query": query, "columns": [], "rows": [], "row_count": 0, "truncated": False,
+              "stats": {}, "elapsed_ms": 0.0, "error": None, "warnings": []}
+    started = time.perf_counter()
+    _execute_into(record, query, db, max_rows or CONFIG["result_max_rows"], max_bytes or CONFIG["result_max_bytes"])
+    record["elapsed_ms"] = (time.perf_counter() - started) * 1000
+    return record
+
+def _observe(db, query: str, elapsed_ms: float):
+    """Record a successful query for the workload advisor."""
+    advisor = get_advisor(db._engine)
+    if advisor is not None:
+        advisor.observe(query, elapsed_ms)
+
+def publish_record(record: dict):
+    """Add an execution record to the current capture (e.g. one returned by a tool server)."""
+    records = _captured_queries.get()
+    if records is not None:
+        records.append(record)
+
+@contextmanager
+def statement_timeout(connection, seconds: float):
+    """Abort SQLite statements running longer than seconds (via the progress handler)."""
+    raw = getattr(connection.connection, "driver_connection", None)
+    if not seconds or connection.dialect.name != "sqlite" or raw is None:
+        yield
+        return
+    deadline = time.monotonic() + seconds
+    # Called every N virtual machine instructions; a non-zero return interrupts the statement
+    raw.set_progress_handler(lambda: int(time.monotonic() > deadline), 10000)
+    try:
+        yield
+    finally:
+        raw.set_progress_handler(None, 0)
+
+def _execute_into(record: dict, query: str, db, max_rows: int, max_bytes: int, engine=None):
+    timeout = CONFIG["sql_statement_timeout_seconds"]
+    row_limit = CONFIG["sql_max_result_rows"]
+    try:
+        with (engine or db._engine).begin() as connection, statement_timeout(connection, timeout):
+            cursor = connection.execution_options(stream_results=True).execute(text(query))
+            if cursor.returns_rows:
+                record["columns"] = list(cursor.keys())
+                summary = _ResultSummary(record["columns"], max_rows, max_bytes)
+                for rows in iter(lambda: cursor.fetchmany(CONFIG["fetch_batch_size"]), []):
+                    summary.add(rows)
+                    if row_limit and summary.row_count >= row_limit:
+                        # Stop reading; row_count and stats then cover only the first row_limit rows
+                        record["row_limit_reached"] = True
+                        summary.truncated = True
+                        break
+                record.update(rows=summary.preview, row_count=summary.row_count, truncated=summary.truncated,
+                              stats=summary.column_stats(), fingerprint=summary.fingerprint())
+        observation = _format_observation(record["rows"], db._max_string_length)
+        if record.get("row_limit_reached"):
+            observation += (
+                f"\n(Stopped after {record['row_count']} rows, the result row limit. "
+                f"Column summary of those rows: {record['stats']})"
+            )
+        elif record["truncated"]:
+            observation += (
+                f"\n(Showing first {len(record['rows'])} of {record['row_count']} rows. "
+                f"Column summary: {record['stats']})"
+            )
+        record["observation"] = observation
+    except Exception as e:
+        message = str(e)
+        if "interrupted" in message:
+            message = f"Query exceeded the {timeout}s statement timeout and was cancelled."
+        record["error"] = message
+        record["observation"] = f"Error: {message}"
+
+def _to_batch(columns, rows, output_format: str):
+    if output_format == "rows":
+        return rows
+    values = {column: [row[index] for row in rows] for index, column in enumerate(columns)}
+    if output_format == "numpy":
+        import numpy as np
+        return {column: np.array(column_values) for column, column_values in values.items()}
+    if output_format == "arrow":
+        try:
+            import pyarrow as pa
+        except ImportError:
+            raise ImportError("output_format='arrow' requires pyarrow: pip install pyarrow")
+        return pa.RecordBatch.from_pydict(values)
+    raise ValueError(f"Unsupported output format: {output_format}")
+
+class QueryRejected(ValueError):
+    """A query failed validation and was not executed."""
+
+@contextmanager
+def open_stream(query: str, db=None, batch_size: int = None, output_format: str = "rows"):
+    """Validate and start a query; yields a stream dict whose "batches" iterator reads the result.
+
+    The dict has "columns", "batches", and "row_count"/"row_limit_reached", which are
+    updated while batches are read. API callers send their own SQL, so it is always
+    validated (QueryRejected), whatever sql_validation_enabled says. Reads are bounded
+    by sql_statement_timeout_seconds (from the start of the stream) and
+    sql_max_result_rows like run_query.
+    """
+    db = db or get_sql_database()
+    batch_size = batch_size or CONFIG["fetch_batch_size"]
+    validation = validate_sql(query, db)
+    if not validation["ok"]:
+        raise QueryRejected(validation["error"])
+    row_limit = CONFIG["sql_max_result_rows"]
+    with read_engine(db) as engine, engine.connect() as connection, \
+            statement_timeout(connection, CONFIG["sql_statement_timeout_seconds"]):
+        cursor = connection.execution_options(stream_results=True).execute(text(query))
+        stream = {"columns": list(cursor.keys()) if cursor.returns_rows else [], "row_count": 0,
+                  "row_limit_reached": False}
+
+        def batches():
+            if not cursor.returns_rows:
+                return
+            while True:
+                size = min(batch_size, row_limit - stream["row_count"]) if row_limit else batch_size
+                if size <= 0:
+                    stream["row_limit_reached"] = True
+                    return
+                rows = cursor.fetchmany(size)
+                if not rows:
+                    return
+                stream["row_count"] += len(rows)
+                yield _to_batch(stream["columns"], rows, output_format)
+
+        stream["batches"] = batches()
+        yield stream
+
+def stream_query(query: str, db=None, batch_size: int = None, output_format: str = "rows"):
+    """Yield result batches from a server-side cursor without materializing the full result.
+
+    output_format is "rows" (lists of typed SQLAlchemy Row objects), "numpy" (dicts of
+    column arrays) or "arrow" (pyarrow RecordBatch). Validated and bounded like
+    open_stream; POST /stream in src/server.py serves it over HTTP.
+    """
+    with open_stream(query, db, batch_size, output_format) as stream:
+        yield from stream["batches"]
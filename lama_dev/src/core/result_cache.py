@@ -0,0 +1,267 @@
+"""
+src/core/result_cache.py: Cache of query results keyed on normalized SQL.
+- Keys are a canonical form of the query: comments dropped, whitespace collapsed,
+  keywords and identifiers lower-cased, literals pulled out as parameters (so formatting
+  differences between generated queries do not miss), plus the preview bounds.
+- Entries remember the data version of the tables they read and are dropped on lookup
+  once it moved; a hit skips validation and execution entirely. "data_version" mode uses SQLite's PRAGMA data_version (any committed
+  write invalidates everything); "triggers" mode installs triggers that bump a per-table
+  counter, so only entries reading a changed table are dropped.
+- Bounded by entry count and approximate bytes with least-recently-used eviction;
+  stats() reports hits, misses, invalidations and evictions.
+- Queries with non-deterministic functions (random(), 'now', ...) are never cached.
+"""
+
+import re
+import sqlite3
+import threading
+from collections import OrderedDict
+from src.config.config import CONFIG
+from src.utils.logging import setup_logging
+
+logger = setup_logging(__name__)
+
+VERSION_TABLE = "_table_versions"
+
+_CANONICAL_TOKEN = re.compile(
+    r"(?P<comment>--[^\n]*|/\*.*?\*/)"
+    r"|(?P<string>'(?:[^']|'')*')"
+    r'|(?P<quoted>"[^"]*"|`[^`]*`|\[[^\]]*\])'
+    r"|(?P<number>(?<![\w.])(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?(?![\w.]))"
+    r"|(?P<word>\w+)"
+    r"|(?P<symbol>[^\s\w])",
+    re.DOTALL,
+)
+_NON_DETERMINISTIC = re.compile(
+    r"\b(?:random|randomblob|changes|total_changes|last_insert_rowid|"
+    r"current_timestamp|current_date|current_time)\b"
+)
+
+def tokenize(query: str) -> list:
+    """SQL tokens as (kind, text, start, end); kind is string, quoted, number, word or symbol."""
+    return [(match.lastgroup, match.group(0), match.start(), match.end())
+            for match in _CANONICAL_TOKEN.finditer(query) if match.lastgroup != "comment"]
+
+def canonicalize(query: str) -> tuple:
+    """Return (template, literals) for a query; equivalent spellings share both."""
+    parts, literals = [], []
+    for kind, token, _, _ in tokenize(query):
+        if kind == "string":
+            parts.append("?")
+            literals.append(token[1:-1].replace("''", "'"))
+        elif kind == "number":
+            parts.append("?")
+            # Tagged so 1, 1.0 and '1' stay distinct (1 == 1.0 in Python, not in SQLite results)
+            literals.append(("int", int(token)) if token.isdigit() else ("real", float(token)))
+        elif kind == "word":
+            parts.append(token.lower())
+        else:
+            parts.append(token)
+    while parts and parts[-1] == ";":
+        parts.pop()
+    return " ".join(parts), tuple(literals)
+
+def is_cacheable(template: str, literals: tuple) -> bool:
+    """False for queries whose result can change without a write (random(), 'now', ...)."""
+    if _NON_DETERMINISTIC.search(template):
+        return False
+    return not any(isinstance(value, str) and value.strip().lower() == "now" for value in literals)
+
+def _record_size(record: dict) -> int:
+    """Approximate bytes held by a cached record."""
+    return len(record.get("observation") or "") + len(repr(record["rows"])) + len(repr(record["stats"])) + 256
+
+class DataVersionTracker:
+    """Data versions of one SQLite file, read on a dedicated connection that never writes."""
+
+    def __init__(self, path: str, per_table: bool = False, attached: dict = None):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False,
+                                     timeout=CONFIG["sqlite_busy_timeout_ms"] / 1000)
+        # Writes to attached databases (cross-database queries) move the version too
+        self._schemas = ["main"]
+        for name, attached_path in (attached or {}).items():
+            schema = '"' + name.replace('"', '""') + '"'
+            self._conn.execute(f"ATTACH DATABASE ? AS {schema}", (attached_path,))
+            self._schemas.append(schema)
+        self._data_version = None
+        self._epoch = 0
+        self._schema_version = None
+        self._table_versions = {}
+        self._tracked = set()
+        if per_table:
+            self._tracked = self._install_triggers()
+
+    def _install_triggers(self) -> set:
+        """Create the version table and per-table triggers; returns the tracked tables."""
+        try:
+            self._conn.execute(f"CREATE TABLE IF NOT EXISTS {VERSION_TABLE} "
+                               "(name TEXT PRIMARY KEY, version INTEGER NOT NULL DEFAULT 0)")
+            tables = [row[0] for row in self._conn.execute(
+                "SELECT name FROM sqlite_master WHERE type = 'table' "
+                f"AND name NOT LIKE 'sqlite_%' AND name != '{VERSION_TABLE}'"
+            )]
+            for table in tables:
+                literal = table.replace("'", "''")
+                quoted = '"' + table.replace('"', '""') + '"'
+                for operation in ("INSERT", "UPDATE", "DELETE"):
+                    trigger = '"' + f"_tv_{table}_{operation.lower()}".replace('"', '""') + '"'
+                    self._conn.execute(
+                        f"CREATE TRIGGER IF NOT EXISTS {trigger} AFTER {operation} ON {quoted} BEGIN "
+                        f"INSERT INTO {VERSION_TABLE} (name, version) VALUES ('{literal}', 1) "
+                        "ON CONFLICT(name) DO UPDATE SET version = version + 1; END"
+                    )
+            self._conn.commit()
+            logger.info(f"Tracking per-table data versions for {len(tables)} tables")
+            return {table.lower() for table in tables}
+        except sqlite3.Error as e:
+            # e.g. a read-only database; fall back to the database-wide version
+            self._conn.rollback()
+            logger.warning(f"Per-table data versions unavailable, using PRAGMA data_version: {str(e)}")
+            return set()
+
+    def _refresh(self):
+        """Re-read versions if another connection committed since the last call (caller holds the lock)."""
+        data_version = tuple(self._conn.execute(f"PRAGMA {schema}.data_version").fetchone()[0]
+                             for schema in self._schemas)
+        if data_version == self._data_version:
+            return
+        self._data_version = data_version
+        self._epoch += 1
+        # DDL does not fire the triggers; the schema version covers dropped or altered tables
+        self._schema_version = self._conn.execute("PRAGMA schema_version").fetchone()[0]
+        if self._tracked:
+            self._table_versions = {
+                name.lower(): version
+                for name, version in self._conn.execute(f"SELECT name, version FROM {VERSION_TABLE}")
+            }
+
+    def versions(self, tables=None) -> tuple:
+        """Current version of each table; untracked (or unknown) tables use the global epoch."""
+        with self._lock:
+            self._refresh()
+            if not tables or not self._tracked:
+                return (("*", self._epoch),)
+            versions = {("~schema", self._schema_version)}
+            for table in tables:
+                key = table.lower()
+                versions.add((key, self._table_versions.get(key, 0)) if key in self._tracked
+                             else ("*", self._epoch))
+            return tuple(sorted(versions))
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+class ResultCache:
+    """LRU cache of execution records, invalidated by data version."""
+
+    def __init__(self, tracker: DataVersionTracker, max_entries: int = None, max_bytes: int = None):
+        self.tracker = tracker
+        self.max_entries = max_entries or CONFIG["result_cache_max_entries"]
+        self.max_bytes = max_bytes or CONFIG["result_cache_max_bytes"]
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._stats = {"hits": 0, "misses": 0, "invalidations": 0, "evictions": 0,
+                       "stores": 0, "uncacheable": 0}
+
+    def key(self, query: str, max_rows: int, max_bytes: int):
+        """Cache key for a query and preview bounds, or None if it must not be cached."""
+        template, literals = canonicalize(query)
+        if not is_cacheable(template, literals):
+            with self._lock:
+                self._stats["uncacheable"] += 1
+            return None
+        return (template, literals, max_rows, max_bytes)
+
+    def versions(self, tables=None) -> tuple:
+        """Snapshot to pass to store(); take it before executing the query."""
+        return self.tracker.versions(tables)
+
+    def lookup(self, key):
+        """Return a copy of the cached record, or None on a miss or a stale entry."""
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is None:
+            with self._lock:
+                self._stats["misses"] += 1
+            return None
+        # Compared outside the cache lock: reading versions may touch the database
+        current = self.tracker.versions(entry["tables"])
+        with self._lock:
+            if current != entry["versions"]:
+                if self._entries.get(key) is entry:
+                    self._remove(key)
+                self._stats["invalidations"] += 1
+                self._stats["misses"] += 1
+                return None
+            if key in self._entries:
+                self._entries.move_to_end(key)
+            self._stats["hits"] += 1
+            return dict(entry["record"])
+
+    def store(self, key, record: dict, tables, versions: tuple):
+        """Cache a successful record under the versions snapshotted before it executed."""
+        if record["error"] is not None:
+            return
+        size = _record_size(record)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = {"record": dict(record), "tables": tables, "versions": versions,
+                                 "size": size}
+            self._bytes += size
+            self._stats["stores"] += 1
+            while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+                self._remove(next(iter(self._entries)))
+                self._stats["evictions"] += 1
+
+    def _remove(self, key):
+        """Drop one entry (caller holds the lock)."""
+        self._bytes -= self._entries.pop(key)["size"]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats, entries=len(self._entries), bytes=self._bytes)
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+        return stats
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+def get_result_cache(engine):
+    """Return the result cache for an engine, or None when disabled or unsupported."""
+    if not CONFIG["result_cache_enabled"]:
+        return None
+    key = str(engine.url)
+    with _caches_lock:
+        if key not in _caches:
+            path = engine.url.database if engine.dialect.name == "sqlite" else None
+            if not path or path == ":memory:":
+                # Version tracking needs a second connection to the same SQLite file
+                logger.info(f"Result cache disabled for {key}: needs a SQLite database file")
+                _caches[key] = None
+            else:
+                per_table = CONFIG["result_cache_invalidation"] == "triggers"
+                with engine.connect() as connection:
+                    attached = {name: file for _, name, file in connection.exec_driver_sql("PRAGMA database_list")
+                                if name not in ("main", "temp") and file}
+                _caches[key] = ResultCache(DataVersionTracker(path, per_table, attached))
+                logger.info(f"Result cache enabled for {key} ({CONFIG['result_cache_invalidation']})")
+        return _caches[key]
+
+def result_cache_stats() -> dict:
+    """Stats of every result cache created in this process, by database URL."""
+    with _caches_lock:
+        caches = dict(_caches)
+    return {url: cache.stats() for url, cache in caches.items() if cache is not None}
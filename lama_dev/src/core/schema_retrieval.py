@@ -1,28 +1,275 @@
 """
 src/core/schema_retrieval.py: Handles schema storage and retrieval using ChromaDB.
-- Uses Ollama embeddings (e.g., nomic-embed-text) for semantic search.
+- Uses Ollama embeddings (e.g., nomic-embed-text) for semantic search, behind the batching
+  and caching EmbeddingService (src/core/embedding_service.py).
 - Stores database schema from config.py and retrieves relevant schema for queries.
+- Keeps a persistent on-disk index with one document per table (and column), keyed by
+  a content hash of its text; only changed documents are re-embedded on startup.
+- Opens the index lazily on the first retrieval (or in prewarm); Chroma and the
+  embedding client are imported only then.
+- Builds per-table and per-column documents (with foreign-key neighbours and sample
+  values) from the metadata catalog and returns the top-k relevant tables within a token
+  budget; the index re-syncs when the catalog picks up DDL changes. Documents are
+  embedded as DDL, and prompts get the compact table(col:type, ...) form (schema_format).
 """
 
-from langchain_community.vectorstores import Chroma
-from langchain_ollama import OllamaEmbeddings
+import hashlib
+import re
+import threading
+from sqlalchemy import text
 from src.config.config import CONFIG
+from src.core.database import get_engine
+from src.core.db_router import get_query_catalog
+from src.core.prompt_builder import compact_table, count_tokens
 from src.utils.logging import setup_logging
 
 logger = setup_logging(__name__)
 
-def initialize_vector_store():
-    """Initialize ChromaDB with schema embeddings using Ollama."""
+_CREATE_TABLE_PATTERN = re.compile(
+    r"CREATE\s+TABLE\s+(?:IF\s+NOT\s+EXISTS\s+)?[`\"\[]?(\w+)[`\"\]]?", re.IGNORECASE
+)
+
+def initialize_embeddings():
+    """Initialize the Ollama embedding model shared by schema and question lookups."""
+    from langchain_ollama import OllamaEmbeddings
     embeddings = OllamaEmbeddings(model=CONFIG["ollama_embedding_model"])
-    vector_store = Chroma.from_texts(
-        texts=[CONFIG["schema"]],
-        embedding=embeddings,
-        collection_name=CONFIG["chroma_collection"],
-    )
-    logger.info("Initialized ChromaDB vector store with Ollama embeddings")
-    return vector_store
-
-def retrieve_schema(vector_store, query: str) -> str:
+    if not CONFIG["embedding_service_enabled"]:
+        return embeddings
+    from src.core.embedding_service import EmbeddingService
+    return EmbeddingService(embeddings, model=CONFIG["ollama_embedding_model"])
+
+def split_schema_ddl(schema: str) -> dict:
+    """Split a DDL script into {table_name: CREATE TABLE statement}."""
+    tables = {}
+    for statement in schema.split(";"):
+        statement = statement.strip()
+        match = _CREATE_TABLE_PATTERN.search(statement)
+        if match:
+            tables[match.group(1)] = statement + ";"
+    return tables
+
+def _content_hash(content: str) -> str:
+    # The embedding model is part of the key: switching models must re-embed everything
+    return hashlib.sha256(f"{CONFIG['ollama_embedding_model']}\n{content}".encode("utf-8")).hexdigest()
+
+def estimate_tokens(content: str) -> int:
+    """Token count used for prompt budgeting (see prompt_builder.count_tokens)."""
+    return count_tokens(content)
+
+def _sample_values(connection, quote, source: str, column: str, limit: int) -> list:
+    rows = connection.execute(text(
+        f"SELECT DISTINCT {quote(column)} FROM {source} "
+        f"WHERE {quote(column)} IS NOT NULL LIMIT {int(limit)}"
+    )).fetchall()
+    return [row[0] for row in rows]
+
+def reflect_schema(engine=None) -> dict:
+    """Build {table: {"document", "columns", "neighbours"}} from the metadata catalog."""
+    engine = engine or get_engine()
+    quote = engine.dialect.identifier_preparer.quote
+    sample_limit = CONFIG["schema_sample_values"]
+    tables = {}
+    with engine.connect() as connection:
+        for table, info in get_query_catalog(engine).tables().items():
+            if info["kind"] != "table":
+                continue
+            # Tables of attached databases are named schema.table
+            source = f"{quote(info['schema'])}.{quote(info['table'])}" if info.get("schema") else quote(table)
+            lines, column_docs, samples = [], {}, {}
+            for column in info["columns"]:
+                name, type_ = column["name"], column["type"]
+                lines.append(f"  {name} {type_}{' PRIMARY KEY' if column['primary_key'] else ''}")
+                column_doc = f"Column {table}.{name} {type_}"
+                if sample_limit and type_.upper().startswith(("VARCHAR", "TEXT", "CHAR", "NVARCHAR")):
+                    try:
+                        values = _sample_values(connection, quote, source, name, sample_limit)
+                    except Exception as e:
+                        logger.warning(f"Could not sample {table}.{name}: {str(e)}")
+                        values = []
+                    if values:
+                        samples[name] = values
+                        column_doc += f" -- e.g. {', '.join(repr(value) for value in values)}"
+                column_docs[f"{table}.{name}"] = column_doc
+            for fk in info["foreign_keys"]:
+                lines.append(
+                    f"  FOREIGN KEY ({', '.join(fk['columns'])}) "
+                    f"REFERENCES {fk['referred_table']}({', '.join(fk['referred_columns'])})"
+                )
+
+            document = f"CREATE TABLE {table} (\n" + ",\n".join(lines) + "\n);"
+            if samples:
+                document += "\n-- Sample values: " + "; ".join(
+                    f"{name}: {', '.join(repr(value) for value in values)}" for name, values in samples.items()
+                )
+            tables[table] = {
+                "document": document,
+                "compact": compact_table(info, samples),
+                "columns": column_docs,
+                "neighbours": {fk["referred_table"] for fk in info["foreign_keys"]},
+            }
+
+    # SQLite keeps a referred table name as written in the DDL (any case, possibly a table
+    # that does not exist); neighbours are reflected table names only
+    by_lower = {table.lower(): table for table in tables}
+    for table, info in tables.items():
+        info["neighbours"] = {by_lower[name.lower()] for name in info["neighbours"]
+                              if name.lower() in by_lower} - {table}
+    # Foreign keys are navigable in both directions
+    for table, info in tables.items():
+        for neighbour in info["neighbours"]:
+            tables[neighbour]["neighbours"].add(table)
+    return tables
+
+def _config_schema() -> dict:
+    """Fallback schema from CONFIG["schema"] when the database cannot be reflected."""
+    return {
+        table: {"document": ddl, "columns": {}, "neighbours": set()}
+        for table, ddl in split_schema_ddl(CONFIG["schema"]).items()
+    }
+
+def load_schema() -> dict:
+    """Reflect the live database, falling back to the DDL in CONFIG."""
+    try:
+        tables = reflect_schema()
+        if tables:
+            return tables
+    except Exception as e:
+        logger.warning(f"Schema reflection failed, using CONFIG schema: {str(e)}")
+    return _config_schema()
+
+class SchemaIndex:
+    """Persistent per-table schema index that only re-embeds tables whose DDL changed."""
+
+    def __init__(self, embeddings=None, schema_fn=None):
+        self._embeddings = embeddings
+        self._schema_fn = schema_fn or load_schema
+        self._store = None
+        self._tables = {}
+        self._document_count = 0
+        self._catalog_version = None
+        self._lock = threading.Lock()
+
+    def _ensure_loaded(self):
+        if self._store is None:
+            with self._lock:
+                if self._store is None:
+                    from langchain_community.vectorstores import Chroma
+                    store = Chroma(
+                        collection_name=CONFIG["chroma_collection"],
+                        embedding_function=self._embeddings or initialize_embeddings(),
+                        persist_directory=CONFIG["chroma_persist_directory"],
+                    )
+                    self._sync(store)
+                    self._store = store
+        return self._store
+
+    def _sync(self, store):
+        """Bring the persisted collection in line with the current schema documents."""
+        tables = self._schema_fn()
+        if self._schema_fn is load_schema:
+            self._catalog_version = get_query_catalog().version
+        documents, owners = {}, {}
+        for table, info in tables.items():
+            documents[table] = info["document"]
+            owners[table] = table
+            if CONFIG["schema_column_documents"]:
+                documents.update(info["columns"])
+                owners.update(dict.fromkeys(info["columns"], table))
+        existing = store.get(include=["metadatas"])
+        existing_hashes = {
+            doc_id: (metadata or {}).get("content_hash")
+            for doc_id, metadata in zip(existing["ids"], existing["metadatas"])
+        }
+
+        stale = [doc_id for doc_id in existing_hashes if doc_id not in documents]
+        changed = {
+            doc_id: content for doc_id, content in documents.items()
+            if existing_hashes.get(doc_id) != _content_hash(content)
+        }
+        if stale:
+            store.delete(ids=stale)
+        if changed:
+            store.add_texts(
+                texts=list(changed.values()),
+                # Attached tables are named schema.table, so the owner cannot be split off the id
+                metadatas=[{"table": owners[doc_id], "content_hash": _content_hash(content)}
+                           for doc_id, content in changed.items()],
+                ids=list(changed),
+            )
+        self._tables = tables
+        self._document_count = len(documents)
+        logger.info(
+            f"Schema index synced: {len(changed)} document(s) embedded, {len(stale)} removed, "
+            f"{len(documents) - len(changed)} reused"
+        )
+
+    def warm(self):
+        """Open and sync the index now instead of on the first retrieval."""
+        self._ensure_loaded()
+
+    def refresh(self):
+        """Re-sync with the current schema (e.g. after DDL changes)."""
+        with self._lock:
+            if self._store is not None:
+                self._sync(self._store)
+
+    def _check_catalog(self):
+        """Re-sync once the catalog has picked up DDL changes."""
+        if self._store is None or self._schema_fn is not load_schema:
+            return
+        catalog = get_query_catalog()
+        catalog.tables()
+        if catalog.version != self._catalog_version:
+            self.refresh()
+
+    def similarity_search(self, query: str, k: int = 4):
+        store = self._ensure_loaded()
+        self._check_catalog()
+        k = min(k, self._document_count)
+        return store.similarity_search(query, k=k) if k else []
+
+    def retrieve(self, query: str, k: int = None, token_budget: int = None) -> list:
+        """Return schema text for the top-k relevant tables that fit the token budget.
+
+        Column hits count towards their table; foreign-key neighbours of the selected
+        tables are added afterwards while the budget allows, so joins see both sides.
+        """
+        k = k or CONFIG["schema_top_k"]
+        token_budget = token_budget or CONFIG["schema_token_budget"]
+        # Over-fetch: several hits may be columns of the same table
+        hits = self.similarity_search(query, k=k * 3)
+
+        ranked = []
+        for hit in hits:
+            table = hit.metadata.get("table")
+            if table in self._tables and table not in ranked:
+                ranked.append(table)
+        ranked = ranked[:k]
+        for table in list(ranked):
+            ranked.extend(sorted(n for n in self._tables[table]["neighbours"]
+                                 if n in self._tables and n not in ranked))
+
+        selected, used = [], 0
+        compact = CONFIG["schema_format"] == "compact"
+        for table in ranked:
+            info = self._tables[table]
+            # Documents are embedded as DDL; the prompt gets the compact form
+            document = info.get("compact", info["document"]) if compact else info["document"]
+            cost = estimate_tokens(document)
+            if selected and used + cost > token_budget:
+                continue
+            selected.append(document)
+            used += cost
+        return selected
+
+def initialize_vector_store(embeddings=None):
+    """Create the persistent schema index; it is opened and synced on first retrieval."""
+    logger.info(f"Schema index configured at {CONFIG['chroma_persist_directory']} (lazy)")
+    return SchemaIndex(embeddings)
+
+def retrieve_schema(vector_store, query: str, k: int = None) -> str:
     """Retrieve relevant schema from ChromaDB."""
-    results = vector_store.similarity_search(query, k=1)
-    return results[0].page_content if results else "No relevant schema found."
\ No newline at end of file
+    documents = vector_store.retrieve(query, k=k)
+    if not documents:
+        return "No relevant schema found."
+    return ("\n" if CONFIG["schema_format"] == "compact" else "\n\n").join(documents)
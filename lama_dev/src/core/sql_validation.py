@@ -0,0 +1,180 @@
+"""
+src/core/sql_validation.py: Pre-execution checks for generated SQL.
+- Rejects anything but a single read-only SELECT/WITH statement.
+- Checks referenced tables and alias.column references against the metadata catalog
+  (src/core/catalog.py) and suggests close matches, so the agent can correct itself without a failed execution.
+  Tables of attached databases are checked as schema.table.
+- Compiles the statement with EXPLAIN QUERY PLAN (SQLite) to catch remaining errors,
+  estimates how many rows the plan touches and flags full scans of large tables.
+- Plans estimated above sql_max_estimated_rows (e.g. an accidental cross join) are
+  rejected before they reach the database.
+"""
+
+import difflib
+import re
+from src.config.config import CONFIG
+from src.core.db_router import get_query_catalog
+from src.utils.logging import setup_logging
+
+logger = setup_logging(__name__)
+
+_STRING_OR_COMMENT = re.compile(r"'(?:[^']|'')*'|--[^\n]*|/\*.*?\*/", re.DOTALL)
+_TOKEN = re.compile(r'"[^"]*"|`[^`]*`|\[[^\]]*\]|\w+|\S')
+_CTE_NAME = re.compile(r"(?:\bWITH(?:\s+RECURSIVE)?|,)\s+(\w+)\s*(?:\([^)]*\))?\s+AS\s*\(", re.IGNORECASE)
+
+_WRITE_KEYWORDS = {"INSERT", "UPDATE", "DELETE", "DROP", "ALTER", "CREATE", "ATTACH", "DETACH",
+                   "PRAGMA", "VACUUM", "REINDEX", "ANALYZE", "REPLACE", "TRUNCATE", "GRANT"}
+_CLAUSE_KEYWORDS = {"WHERE", "JOIN", "INNER", "LEFT", "RIGHT", "FULL", "CROSS", "OUTER", "NATURAL",
+                    "ON", "USING", "GROUP", "ORDER", "LIMIT", "HAVING", "UNION", "EXCEPT", "INTERSECT",
+                    "WINDOW", "AS", "INDEXED", "NOT", "OFFSET", "SELECT", "FROM", "VALUES"}
+
+def _unquote(token: str) -> str:
+    return token[1:-1] if token[:1] in ('"', "`", "[") else token
+
+def table_references(tokens: list) -> dict:
+    """Return {alias_or_name_lower: table_name} for tables named after FROM/JOIN."""
+    references = {}
+    index = 0
+    while index < len(tokens):
+        keyword = tokens[index].upper()
+        index += 1
+        if keyword not in ("FROM", "JOIN"):
+            continue
+        while index < len(tokens):
+            if tokens[index] == "(":
+                break  # subquery or parenthesized join; its FROM is found later
+            name = _unquote(tokens[index])
+            index += 1
+            if index + 1 < len(tokens) and tokens[index] == ".":
+                schema, name = name, _unquote(tokens[index + 1])  # schema.table
+                if schema.lower() not in ("main", "temp"):
+                    name = f"{schema}.{name}"  # an attached database's table (see db_router.py)
+                index += 2
+            if index < len(tokens) and tokens[index] == "(":
+                break  # table-valued function
+            alias = None
+            if index < len(tokens) and tokens[index].upper() == "AS":
+                alias = _unquote(tokens[index + 1]) if index + 1 < len(tokens) else None
+                index += 2
+            elif index < len(tokens) and re.fullmatch(r'\w+|"[^"]*"|`[^`]*`|\[[^\]]*\]', tokens[index]) \
+                    and tokens[index].upper() not in _CLAUSE_KEYWORDS:
+                alias = _unquote(tokens[index])
+                index += 1
+            references[name.lower()] = name
+            if alias:
+                references[alias.lower()] = name
+            if keyword == "FROM" and index < len(tokens) and tokens[index] == ",":
+                index += 1
+                continue
+            break
+    return references
+
+def _suggest(word: str, candidates) -> str:
+    matches = difflib.get_close_matches(word.lower(), [c.lower() for c in candidates], n=3, cutoff=0.6)
+    return f" Did you mean: {', '.join(matches)}?" if matches else ""
+
+def _check_statement(query: str, catalog) -> tuple:
+    """Static checks; returns (error or None, {alias: table}, [table names])."""
+    cleaned = _STRING_OR_COMMENT.sub(lambda m: "''" if m.group(0).startswith("'") else " ", query).strip()
+    cleaned = cleaned.rstrip(";").strip()
+    if not cleaned:
+        return "Empty query.", {}, []
+    if ";" in cleaned:
+        return "Only a single SQL statement is allowed.", {}, []
+    tokens = _TOKEN.findall(cleaned)
+    first = tokens[0].upper()
+    if first not in ("SELECT", "WITH", "VALUES"):
+        return f"Only read-only SELECT queries are allowed (got {first}).", {}, []
+    for position, token in enumerate(tokens):
+        upper = token.upper()
+        # replace(...) is a string function, not the REPLACE statement
+        if upper in _WRITE_KEYWORDS and not (position + 1 < len(tokens) and tokens[position + 1] == "("):
+            return f"Only read-only SELECT queries are allowed ({upper} found).", {}, []
+
+    tables = catalog.name_index()
+    ctes = {name.lower() for name in _CTE_NAME.findall(cleaned)}
+    references = table_references(tokens)
+    for alias, table in references.items():
+        if alias == table.lower() and table.lower() not in tables and table.lower() not in ctes:
+            return (f"No such table: {table}.{_suggest(table, [t['name'] for t in tables.values()])} "
+                    f"Available tables: {', '.join(t['name'] for t in tables.values())}"), {}, []
+
+    # alias.column references to known tables
+    for position in range(len(tokens) - 2):
+        if tokens[position + 1] != ".":
+            continue
+        qualifier, column = tokens[position].lower(), _unquote(tokens[position + 2])
+        table = references.get(_unquote(qualifier).lower())
+        if table is None or column == "*" or table.lower() not in tables:
+            continue
+        columns = tables[table.lower()]["columns"]
+        if column.lower() not in columns:
+            return (f"No such column: {tokens[position]}.{column} (table {table} has columns: "
+                    f"{', '.join(columns.values())}).{_suggest(column, columns.values())}"), {}, []
+    referenced = sorted({t for t in references.values() if t.lower() in tables})
+    return None, references, referenced
+
+def _estimate_plan(plan: list, references: dict, catalog) -> tuple:
+    """Rough rows touched: nested scans at one plan level multiply, levels and automatic indexes add."""
+    levels, warnings = {}, []
+    for _, parent, _, detail in plan:
+        words = detail.split()
+        if len(words) < 2 or words[0] not in ("SCAN", "SEARCH") or words[1] == "CONSTANT":
+            continue
+        table = references.get(words[1].lower(), words[1])
+        rows = catalog.row_count(table)
+        level = levels.setdefault(parent, {"product": 1, "extra": 0})
+        if words[0] == "SCAN" or "USING" not in words:
+            level["product"] *= max(rows or 1, 1)
+            if rows and rows >= CONFIG["sql_full_scan_warn_rows"]:
+                warnings.append(f"Full scan of {table} (~{rows:,} rows)")
+        elif "AUTOMATIC" in words:
+            # SQLite builds a temporary index on the fly: one pass over the table
+            level["extra"] += rows or 0
+            warnings.append(f"No index for the join on {table}; SQLite builds a temporary one")
+    estimate = sum(level["product"] + level["extra"] for level in levels.values())
+    return estimate, warnings
+
+def validate_sql(query: str, db=None) -> dict:
+    """Check a query before execution.
+
+    Returns {"ok", "error", "warnings", "tables", "estimated_rows", "plan"}; when "ok" is
+    False, "error" is a message meant for the agent to correct the query.
+    """
+    from src.core.database import get_sql_database
+    db = db or get_sql_database()
+    engine = db._engine
+    catalog = get_query_catalog(engine)
+    result = {"ok": False, "error": None, "warnings": [], "tables": [], "estimated_rows": None, "plan": []}
+
+    error, references, tables = _check_statement(query, catalog)
+    result["tables"] = tables
+    if error:
+        result["error"] = error
+        return result
+
+    if engine.dialect.name == "sqlite":
+        statement = query.strip().rstrip(";")
+        try:
+            with engine.connect() as connection:
+                plan = connection.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}").fetchall()
+            estimate, warnings = _estimate_plan(plan, references, catalog)
+        except Exception as e:
+            message = str(getattr(e, "orig", e))
+            hint = ""
+            if message.startswith("no such column") and tables:
+                hint = " Columns: " + "; ".join(
+                    f"{t}({', '.join(catalog.name_index()[t.lower()]['columns'].values())})" for t in tables
+                )
+            result["error"] = f"Invalid SQL: {message}.{hint}"
+            return result
+        result.update(plan=[row[3] for row in plan], estimated_rows=estimate, warnings=warnings)
+        if estimate > CONFIG["sql_max_estimated_rows"]:
+            result["error"] = (
+                f"Query rejected: the plan would touch about {estimate:,} rows "
+                f"(limit {CONFIG['sql_max_estimated_rows']:,}). {'; '.join(warnings)}. "
+                "Add join conditions or filters, or aggregate in a subquery."
+            )
+            return result
+    result["ok"] = True
+    return result
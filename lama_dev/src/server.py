@@ -0,0 +1,504 @@
+"""
+src/server.py: Resident serving mode for the text-to-SQL pipeline.
+- RequestPool wraps process_text_to_sql with a bounded request queue and a fixed pool
+  of worker threads sized to the LLM backend's concurrency.
+- Backpressure: a full queue rejects new requests (HTTP 429) instead of queueing them
+  without limit; every request carries a deadline that includes time spent queued, and
+  the agent's ReAct loop stops (between steps) once it passes.
+- serve_http() exposes POST /query plus /healthz, /readyz and /metrics for a load
+  balancer, GET /advisor for the workload advisor's recommendations and GET /embeddings
+  for embedding batch and cache stats; serve_stdio() reads and writes JSON lines.
+- POST /stream runs a caller's SQL (validated, read-only) and streams the full result
+  in chunks as NDJSON or an Arrow IPC stream (query_execution.open_stream). At most
+  server_max_streams are open at once (each holds a DB connection while the client
+  reads); beyond that it answers 429, so slow readers cannot starve POST /query.
+- SIGTERM/SIGINT (or EOF on stdin) drain gracefully: new requests are refused while
+  in-flight and queued ones finish, up to server_drain_timeout_seconds.
+"""
+
+import importlib.util
+import json
+import queue
+import signal
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from src.app import get_app
+from src.config.config import CONFIG
+from src.utils.logging import setup_logging
+from src.utils.tracing import export_prometheus
+
+logger = setup_logging(__name__)
+
+# POST /stream formats and their content types
+STREAM_FORMATS = {"json": "application/x-ndjson", "arrow": "application/vnd.apache.arrow.stream"}
+
+class ServerBusy(Exception):
+    """The request queue is full."""
+
+class ServerDraining(Exception):
+    """The server is shutting down and no longer accepts requests."""
+
+class DeadlineExceeded(Exception):
+    """The request's deadline passed before it could be answered."""
+
+class RequestPool:
+    """Bounded queue of questions served by a fixed set of worker threads."""
+
+    def __init__(self, app=None, workers: int = None, queue_size: int = None,
+                 request_timeout: float = None, quiet: bool = False, max_streams: int = None):
+        self.app = app or get_app()
+        self.quiet = quiet
+        self.workers = workers or CONFIG["server_workers"]
+        self.request_timeout = request_timeout or CONFIG["server_request_timeout_seconds"]
+        self._queue = queue.Queue(maxsize=queue_size or CONFIG["server_queue_size"])
+        self.max_streams = max_streams or CONFIG["server_max_streams"]
+        self._stream_slots = threading.BoundedSemaphore(self.max_streams)
+        self._streaming = 0
+        self._threads = []
+        self._lock = threading.Lock()
+        self._idle = threading.Condition(self._lock)
+        self._in_flight = 0
+        self._draining = False
+        self._executor_ready = False
+        self._stats = {"accepted": 0, "rejected": 0, "expired": 0, "completed": 0, "failed": 0,
+                       "streams": 0, "streams_rejected": 0}
+
+    @property
+    def draining(self) -> bool:
+        return self._draining
+
+    def start(self):
+        """Start the worker threads."""
+        for index in range(self.workers):
+            thread = threading.Thread(target=self._work, name=f"text-to-sql-worker-{index}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        logger.info(f"Request pool started: {self.workers} workers, queue size {self._queue.maxsize}")
+        return self
+
+    def submit(self, question: str, timeout: float = None, request_id: str = None,
+               block: bool = False) -> Future:
+        """Queue a question and return a Future for its response.
+
+        Raises ServerBusy when the queue is full (unless block is True) and
+        ServerDraining after drain() has started.
+        """
+        if self._draining:
+            raise ServerDraining("Server is shutting down")
+        timeout = timeout or self.request_timeout
+        future = Future()
+        future.deadline = time.monotonic() + timeout
+        try:
+            self._queue.put((question, request_id, future), block=block)
+        except queue.Full:
+            with self._lock:
+                self._stats["rejected"] += 1
+            raise ServerBusy(f"Request queue is full ({self._queue.maxsize} waiting)")
+        with self._lock:
+            self._stats["accepted"] += 1
+        return future
+
+    @contextmanager
+    def stream_slot(self):
+        """Hold one of the server_max_streams slots for a POST /stream response.
+
+        Raises ServerBusy when all are taken and ServerDraining after drain() has started.
+        """
+        if self._draining:
+            raise ServerDraining("Server is shutting down")
+        if not self._stream_slots.acquire(blocking=False):
+            with self._lock:
+                self._stats["streams_rejected"] += 1
+            raise ServerBusy(f"Too many open streams ({self.max_streams})")
+        with self._lock:
+            self._streaming += 1
+            self._stats["streams"] += 1
+        try:
+            yield
+        finally:
+            self._stream_slots.release()
+            with self._idle:
+                self._streaming -= 1
+                self._idle.notify_all()
+
+    def _work(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                self._queue.task_done()
+                return
+            question, request_id, future = item
+            try:
+                if not future.set_running_or_notify_cancel():
+                    continue
+                if time.monotonic() >= future.deadline:
+                    with self._lock:
+                        self._stats["expired"] += 1
+                    future.set_exception(DeadlineExceeded("Deadline passed while queued"))
+                    continue
+                with self._lock:
+                    self._in_flight += 1
+                try:
+                    self._prepare_executor()
+                    # The agent gets what is left of the request's deadline, not the default timeout
+                    response = process_question(self.app, question, request_id,
+                                                max(future.deadline - time.monotonic(), 0.0))
+                    future.set_result(response)
+                    outcome = "failed" if "error" in response else "completed"
+                except Exception as e:
+                    logger.error(f"Worker failed on question: {str(e)}")
+                    future.set_exception(e)
+                    outcome = "failed"
+                with self._lock:
+                    self._in_flight -= 1
+                    self._stats[outcome] += 1
+            finally:
+                self._queue.task_done()
+                with self._idle:
+                    self._idle.notify_all()
+
+    def _prepare_executor(self):
+        # Deferred to the first request so the server can listen while the agent is built
+        if self._executor_ready:
+            return
+        executor = self.app.executor
+        # Each request's remaining deadline is applied per call (process_question)
+        if self.quiet:
+            executor.verbose = False
+        self._executor_ready = True
+
+    def drain(self, timeout: float = None) -> bool:
+        """Refuse new requests, wait for queued and in-flight ones, then stop the workers.
+
+        Returns False if work was still pending when the timeout expired.
+        """
+        timeout = timeout if timeout is not None else CONFIG["server_drain_timeout_seconds"]
+        self._draining = True
+        logger.info(f"Draining: {self._queue.qsize()} queued, {self._in_flight} in flight, "
+                    f"{self._streaming} streaming")
+        with self._idle:
+            drained = self._idle.wait_for(
+                lambda: self._queue.unfinished_tasks == 0 and self._in_flight == 0 and self._streaming == 0,
+                timeout,
+            )
+        if not drained:
+            logger.warning(f"Drain timed out after {timeout}s with work still pending")
+        for _ in self._threads:
+            try:
+                self._queue.put_nowait(None)
+            except queue.Full:
+                break
+        if drained:
+            for thread in self._threads:
+                thread.join()
+        return drained
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["in_flight"] = self._in_flight
+            stats["streaming"] = self._streaming
+        stats.update(queued=self._queue.qsize(), queue_size=self._queue.maxsize,
+                     workers=self.workers, draining=self._draining)
+        return stats
+
+    def export_prometheus(self) -> str:
+        """Queue gauges and request counters in Prometheus text format."""
+        stats = self.stats()
+        lines = [
+            "# HELP text_to_sql_queue_depth Requests waiting for a worker.",
+            "# TYPE text_to_sql_queue_depth gauge",
+            f"text_to_sql_queue_depth {stats['queued']}",
+            "# HELP text_to_sql_in_flight Requests being processed.",
+            "# TYPE text_to_sql_in_flight gauge",
+            f"text_to_sql_in_flight {stats['in_flight']}",
+            "# HELP text_to_sql_streams_open POST /stream responses being sent.",
+            "# TYPE text_to_sql_streams_open gauge",
+            f"text_to_sql_streams_open {stats['streaming']}",
+            "# HELP text_to_sql_streams_total POST /stream requests by outcome.",
+            "# TYPE text_to_sql_streams_total counter",
+            f'text_to_sql_streams_total{{outcome="accepted"}} {stats["streams"]}',
+            f'text_to_sql_streams_total{{outcome="rejected"}} {stats["streams_rejected"]}',
+            "# HELP text_to_sql_requests_total Requests by outcome.",
+            "# TYPE text_to_sql_requests_total counter",
+        ]
+        for outcome in ("accepted", "rejected", "expired", "completed", "failed"):
+            lines.append(f'text_to_sql_requests_total{{outcome="{outcome}"}} {stats[outcome]}')
+        return "\n".join(lines) + "\n"
+
+def process_question(app, question: str, request_id: str = None, timeout: float = None) -> dict:
+    """Answer one question with the container's components."""
+    from src.agents.agent import process_text_to_sql
+    return process_text_to_sql(app.executor, app.mcp_client, question, app.answer_cache,
+                               app.fast_path, request_id, app.candidates, timeout)
+
+def is_ready(pool: RequestPool) -> bool:
+    """Ready once prewarm has finished (or is disabled) and the server is not draining."""
+    return not pool.draining and (pool.app.is_ready() or not CONFIG["prewarm_enabled"])
+
+class _Handler(BaseHTTPRequestHandler):
+    """HTTP routes; the RequestPool is attached to the server as server.pool."""
+
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        logger.debug(f"{self.address_string()} {format % args}")
+
+    def _send(self, status: int, body, content_type: str = "application/json", headers: dict = None):
+        payload = body if isinstance(body, str) else json.dumps(body, default=str)
+        data = payload.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        pool = self.server.pool
+        if self.path == "/healthz":
+            self._send(200, {"status": "ok"})
+        elif self.path == "/readyz":
+            ready = is_ready(pool)
+            self._send(200 if ready else 503, {
+                "ready": ready, "startup": pool.app.startup_report(), "queue": pool.stats(),
+            })
+        elif self.path == "/metrics":
+            self._send(200, export_prometheus() + pool.export_prometheus(),
+                       content_type="text/plain; version=0.0.4")
+        elif self.path == "/embeddings":
+            embeddings = pool.app.get("embeddings")
+            if not hasattr(embeddings, "stats"):
+                self._send(404, {"error": "Embedding service is disabled"})
+            else:
+                self._send(200, embeddings.stats())
+        elif self.path == "/advisor":
+            from src.core.advisor import get_advisor
+            advisor = get_advisor()
+            if advisor is None:
+                self._send(404, {"error": "Workload advisor is disabled"})
+            else:
+                self._send(200, {"stats": advisor.stats(), "summaries": advisor.summaries(),
+                                 "recommendations": advisor.recommend(), "workload": advisor.workload()[:20]})
+        else:
+            self._send(404, {"error": f"Unknown path {self.path}"})
+
+    def _write_chunk(self, data: bytes):
+        if data:
+            self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+
+    def _stream(self):
+        """POST /stream: run a caller's SQL and send the full result in chunks (NDJSON or Arrow IPC)."""
+        if self.server.pool.draining:
+            self._send(503, {"error": "Server is shutting down"}, headers={"Connection": "close"})
+            return
+        try:
+            length = int(self.headers.get("Content-Length") or 0)
+            body = json.loads(self.rfile.read(length) or b"{}")
+            query = body["query"]
+            output_format = body.get("format", "json")
+            if output_format not in STREAM_FORMATS:
+                raise ValueError(f"format must be one of {', '.join(STREAM_FORMATS)}")
+            batch_size = int(body["batch_size"]) if body.get("batch_size") else None
+        except (KeyError, ValueError, TypeError) as e:
+            self._send(400, {"error": f"Invalid request: {str(e)}"})
+            return
+        if output_format == "arrow" and importlib.util.find_spec("pyarrow") is None:
+            self._send(501, {"error": "format 'arrow' requires pyarrow: pip install pyarrow"})
+            return
+        try:
+            with self.server.pool.stream_slot():
+                self._send_stream(query, output_format, batch_size)
+        except ServerBusy as e:
+            self._send(429, {"error": str(e)}, headers={"Retry-After": "1"})
+        except ServerDraining as e:
+            self._send(503, {"error": str(e)}, headers={"Connection": "close"})
+
+    def _send_stream(self, query: str, output_format: str, batch_size: int = None):
+        """Run an admitted stream request and send its response."""
+        from src.core.query_execution import QueryRejected, open_stream
+        try:
+            with open_stream(query, batch_size=batch_size,
+                             output_format="arrow" if output_format == "arrow" else "rows") as stream:
+                self.send_response(200)
+                self.send_header("Content-Type", STREAM_FORMATS[output_format])
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                if output_format == "arrow":
+                    self._stream_arrow(stream)
+                else:
+                    self._stream_json(stream)
+        except QueryRejected as e:
+            self._send(400, {"query": query, "error": str(e)})
+            return
+        except Exception as e:
+            # Headers and some rows may be out already; the connection cannot be reused
+            logger.error(f"Streaming query failed: {str(e)}")
+            self.close_connection = True
+            return
+        self.wfile.write(b"0\r\n\r\n")
+
+    def _stream_json(self, stream: dict):
+        """One {"columns"} line, a {"rows"} line per batch, then {"row_count", "row_limit_reached"}."""
+        self._write_chunk((json.dumps({"columns": stream["columns"]}) + "\n").encode("utf-8"))
+        try:
+            for rows in stream["batches"]:
+                line = json.dumps({"rows": [list(row) for row in rows]}, default=str)
+                self._write_chunk((line + "\n").encode("utf-8"))
+            end = {"row_count": stream["row_count"], "row_limit_reached": stream["row_limit_reached"]}
+        except Exception as e:
+            message = str(getattr(e, "orig", e))
+            if "interrupted" in message:
+                message = f"Query exceeded the {CONFIG['sql_statement_timeout_seconds']}s statement timeout"
+            end = {"row_count": stream["row_count"], "error": message}
+        self._write_chunk((json.dumps(end) + "\n").encode("utf-8"))
+
+    def _stream_arrow(self, stream: dict):
+        """An Arrow IPC stream with one record batch per fetched batch."""
+        import pyarrow as pa
+        handler = self
+
+        class _ChunkSink:
+            closed = False
+
+            def write(self, data):
+                handler._write_chunk(bytes(data))
+                return len(data)
+
+            def flush(self):
+                handler.wfile.flush()
+
+        writer = None
+        for batch in stream["batches"]:
+            if writer is None:
+                writer = pa.ipc.new_stream(_ChunkSink(), batch.schema)
+            writer.write_batch(batch)
+        if writer is None:
+            writer = pa.ipc.new_stream(_ChunkSink(), pa.schema([(column, pa.null()) for column in stream["columns"]]))
+        writer.close()
+
+    def do_POST(self):
+        if self.path == "/stream":
+            self._stream()
+            return
+        if self.path != "/query":
+            self._send(404, {"error": f"Unknown path {self.path}"})
+            return
+        pool = self.server.pool
+        try:
+            length = int(self.headers.get("Content-Length") or 0)
+            body = json.loads(self.rfile.read(length) or b"{}")
+            question = body["question"]
+            if not isinstance(question, str) or not question.strip():
+                raise ValueError("question must be a non-empty string")
+            timeout = float(body.get("timeout") or pool.request_timeout)
+        except (KeyError, ValueError, TypeError) as e:
+            self._send(400, {"error": f"Invalid request: {str(e)}"})
+            return
+        request_id = body.get("request_id") or self.headers.get("X-Request-ID")
+
+        try:
+            future = pool.submit(question, timeout, request_id)
+        except ServerBusy as e:
+            self._send(429, {"error": str(e)}, headers={"Retry-After": "1"})
+            return
+        except ServerDraining as e:
+            self._send(503, {"error": str(e)}, headers={"Connection": "close"})
+            return
+
+        try:
+            response = future.result(timeout=max(0.0, future.deadline - time.monotonic()))
+        except (FutureTimeoutError, DeadlineExceeded):
+            future.cancel()
+            self._send(504, {"question": question, "error": f"Deadline of {timeout}s exceeded"})
+            return
+        except Exception as e:
+            self._send(500, {"question": question, "error": str(e)})
+            return
+        self._send(200, response)
+
+def _install_signal_handlers(stop):
+    if threading.current_thread() is not threading.main_thread():
+        return
+    for signum in (signal.SIGTERM, signal.SIGINT):
+        signal.signal(signum, lambda *_: threading.Thread(target=stop, name="drain").start())
+
+def serve_http(app=None, host: str = None, port: int = None, workers: int = None,
+               queue_size: int = None):
+    """Serve POST /query, POST /stream, /healthz, /readyz, /metrics, /advisor and /embeddings until SIGTERM/SIGINT."""
+    pool = RequestPool(app, workers, queue_size).start()
+    httpd = ThreadingHTTPServer((host or CONFIG["server_host"], port or CONFIG["server_port"]), _Handler)
+    httpd.daemon_threads = True
+    httpd.pool = pool
+    stopping = threading.Event()
+
+    def stop():
+        if stopping.is_set():
+            return
+        stopping.set()
+        # Keep answering (503 on /readyz and new queries) until in-flight work is done
+        pool.drain()
+        httpd.shutdown()
+
+    _install_signal_handlers(stop)
+    logger.info(f"Serving on http://{httpd.server_address[0]}:{httpd.server_address[1]}")
+    try:
+        httpd.serve_forever()
+    finally:
+        httpd.server_close()
+        logger.info(f"Server stopped: {pool.stats()}")
+    return pool.stats()
+
+def serve_stdio(app=None, stdin=None, stdout=None, workers: int = None, queue_size: int = None):
+    """Answer JSON lines from stdin ({"id", "question", "timeout"} or a bare question).
+
+    Responses are written to stdout as JSON lines in completion order, each echoing
+    the request's "id". Reading blocks while the queue is full, so the producer is
+    slowed down instead of rejected. EOF drains the pool and returns.
+    """
+    stdin, stdout = stdin or sys.stdin, stdout or sys.stdout
+    # quiet: the agent's verbose output would otherwise interleave with the JSON lines
+    pool = RequestPool(app, workers, queue_size, quiet=True).start()
+    write_lock = threading.Lock()
+
+    def write(line: dict):
+        with write_lock:
+            stdout.write(json.dumps(line, default=str) + "\n")
+            stdout.flush()
+
+    def on_done(request_key, question):
+        def callback(future):
+            if future.cancelled():
+                return
+            error = future.exception()
+            if error is None:
+                write({"id": request_key, **future.result()})
+            else:
+                write({"id": request_key, "question": question, "error": str(error)})
+        return callback
+
+    for number, line in enumerate(stdin):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            request = json.loads(line) if line.startswith("{") else {"question": line}
+            question = request["question"]
+        except (KeyError, ValueError) as e:
+            write({"id": number, "error": f"Invalid request: {str(e)}"})
+            continue
+        request_key = request.get("id", number)
+        try:
+            future = pool.submit(question, request.get("timeout"), request.get("request_id"), block=True)
+        except ServerDraining as e:
+            write({"id": request_key, "question": question, "error": str(e)})
+            continue
+        future.add_done_callback(on_done(request_key, question))
+
+    pool.drain()
+    return pool.stats()
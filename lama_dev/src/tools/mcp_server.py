@@ -0,0 +1,328 @@
+"""
+src/tools/mcp_server.py: Out-of-process MCP-style tool server and its client.
+- MCPServer answers JSON-RPC 2.0 messages (initialize, tools/list, tools/call) from the
+  tool registry; a JSON-RPC batch (array) runs its calls concurrently and comes back in
+  one round trip.
+- Transports: newline-delimited JSON over stdio or a local Unix socket.
+- The server builds its own database and schema index through the application container,
+  so database-facing tools can run in a separate process (or pool of processes).
+- RemoteMCPClient has the same call_tool/call_tools interface as the in-process MCPClient.
+  Every exchange waits at most mcp_timeout_seconds; a server that misses it raises
+  TimeoutError and its connection (or child process) is replaced on the next call, so a
+  late answer cannot be read as the response to another request.
+
+Usage (from lama_dev/):
+    python -m src.tools.mcp_server --socket /tmp/text_to_sql_mcp.sock
+    python -m src.tools.mcp_server --stdio
+"""
+
+import argparse
+import json
+import os
+import queue
+import socket
+import socketserver
+import subprocess
+import sys
+import threading
+from src.config.config import CONFIG
+from src.tools.mcp_tools import REGISTRY, ToolError, run_tool_batch
+from src.utils.logging import setup_logging
+from src.utils.tracing import span
+
+logger = setup_logging(__name__)
+
+PROTOCOL_VERSION = "2024-11-05"
+PARSE_ERROR, INVALID_REQUEST, METHOD_NOT_FOUND, INVALID_PARAMS = -32700, -32600, -32601, -32602
+
+def _error(message_id, code: int, message: str) -> dict:
+    return {"jsonrpc": "2.0", "id": message_id, "error": {"code": code, "message": message}}
+
+def _tool_result(value) -> dict:
+    """Wrap a tool's return value as an MCP tools/call result."""
+    if isinstance(value, Exception):
+        return {"content": [{"type": "text", "text": str(value)}], "isError": True}
+    if isinstance(value, str):
+        return {"content": [{"type": "text", "text": value}], "isError": False}
+    return {"content": [{"type": "text", "text": json.dumps(value, default=str)}],
+            "structuredContent": json.loads(json.dumps(value, default=str)), "isError": False}
+
+class MCPServer:
+    """Transport-independent JSON-RPC handler over a tool registry."""
+
+    def __init__(self, app=None, registry=None):
+        from src.app import get_app
+        self.app = app or get_app()
+        self.registry = registry or REGISTRY
+
+    @property
+    def context(self) -> dict:
+        return {"db": self.app.db, "vector_store": self.app.vector_store}
+
+    def handle(self, message):
+        """Handle one message or a batch; returns the response (None for notifications)."""
+        if isinstance(message, list):
+            if not message:
+                return _error(None, INVALID_REQUEST, "Empty batch")
+            return self._handle_batch(message) or None
+        return self._handle_one(message)
+
+    def handle_line(self, line: str):
+        """Parse one JSON line and return the serialized response line, or None."""
+        try:
+            message = json.loads(line)
+        except ValueError as e:
+            return json.dumps(_error(None, PARSE_ERROR, f"Parse error: {str(e)}"))
+        response = self.handle(message)
+        return None if response is None else json.dumps(response, default=str)
+
+    def _handle_batch(self, messages: list) -> list:
+        # tools/call entries run concurrently; everything else is answered inline
+        calls = [
+            m for m in messages
+            if isinstance(m, dict) and m.get("method") == "tools/call" and isinstance(m.get("params"), dict)
+        ]
+        results = run_tool_batch(
+            self.registry,
+            [(m["params"].get("name"), m["params"].get("arguments") or {}) for m in calls],
+            self.context,
+            return_exceptions=True,
+        )
+        call_results = {id(m): result for m, result in zip(calls, results)}
+
+        responses = []
+        for message in messages:
+            if id(message) in call_results:
+                response = {"jsonrpc": "2.0", "id": message.get("id"),
+                            "result": _tool_result(call_results[id(message)])}
+            else:
+                response = self._handle_one(message)
+            if response is not None and (not isinstance(message, dict) or "id" in message):
+                responses.append(response)
+        return responses
+
+    def _handle_one(self, message):
+        if not isinstance(message, dict) or message.get("jsonrpc") != "2.0" or "method" not in message:
+            return _error(message.get("id") if isinstance(message, dict) else None,
+                          INVALID_REQUEST, "Invalid request")
+        message_id, method = message.get("id"), message["method"]
+        params = message.get("params") or {}
+        if method == "initialize":
+            result = {"protocolVersion": PROTOCOL_VERSION,
+                      "serverInfo": {"name": "text-to-sql-tools", "version": "1.0"},
+                      "capabilities": {"tools": {}}}
+        elif method == "tools/list":
+            result = {"tools": self.registry.specs()}
+        elif method == "tools/call":
+            if not isinstance(params, dict) or "name" not in params:
+                return _error(message_id, INVALID_PARAMS, "tools/call needs a tool name")
+            try:
+                value = self.registry.call(params["name"], params.get("arguments") or {}, self.context)
+            except Exception as e:
+                logger.warning(f"Tool {params['name']} failed: {str(e)}")
+                value = e
+            result = _tool_result(value)
+        elif method.startswith("notifications/"):
+            return None
+        else:
+            return _error(message_id, METHOD_NOT_FOUND, f"Unknown method: {method}")
+        return None if message_id is None else {"jsonrpc": "2.0", "id": message_id, "result": result}
+
+def serve_stdio(server: MCPServer = None, stdin=None, stdout=None):
+    """Answer newline-delimited JSON-RPC messages from stdin until EOF."""
+    server = server or MCPServer()
+    stdin, stdout = stdin or sys.stdin, stdout or sys.stdout
+    for line in stdin:
+        if not line.strip():
+            continue
+        response = server.handle_line(line)
+        if response is not None:
+            stdout.write(response + "\n")
+            stdout.flush()
+
+class _SocketHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        for line in self.rfile:
+            if not line.strip():
+                continue
+            response = self.server.mcp.handle_line(line.decode("utf-8"))
+            if response is not None:
+                self.wfile.write((response + "\n").encode("utf-8"))
+                self.wfile.flush()
+
+class _UnixServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+def serve_socket(server: MCPServer = None, path: str = None):
+    """Serve on a local Unix socket; each connection is handled on its own thread."""
+    server = server or MCPServer()
+    path = path or CONFIG["mcp_socket_path"]
+    if os.path.exists(path):
+        os.remove(path)
+    with _UnixServer(path, _SocketHandler) as unix_server:
+        unix_server.mcp = server
+        logger.info(f"MCP tool server listening on {path}")
+        try:
+            unix_server.serve_forever()
+        finally:
+            os.remove(path)
+
+class RemoteMCPClient:
+    """Client for an MCPServer over a Unix socket or a child process's stdio."""
+
+    remote = True
+
+    def __init__(self, socket_path: str = None, command=None, timeout: float = None):
+        if not socket_path and not command:
+            raise ValueError("RemoteMCPClient needs a socket_path or a command")
+        self.socket_path = socket_path
+        self.command = command
+        self.timeout = timeout or CONFIG["mcp_timeout_seconds"]
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._process = None
+        self._lines = None
+        self._next_id = 0
+
+    def _message_id(self) -> int:
+        with self._lock:
+            self._next_id += 1
+            return self._next_id
+
+    def _socket_files(self):
+        # One connection per thread, so concurrent requests don't share a stream
+        files = getattr(self._local, "files", None)
+        if files is None:
+            connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            connection.settimeout(self.timeout)
+            connection.connect(self.socket_path)
+            files = (connection, connection.makefile("rb"), connection.makefile("wb"))
+            self._local.files = files
+        return files
+
+    def _close_socket(self):
+        files = getattr(self._local, "files", None)
+        if files:
+            for item in reversed(files):
+                item.close()
+            self._local.files = None
+
+    def _start_process(self):
+        self._process = subprocess.Popen(self.command, stdin=subprocess.PIPE,
+                                         stdout=subprocess.PIPE, text=True, bufsize=1)
+        # Pipes have no read timeout: a reader thread hands lines over through a queue
+        lines, stdout = queue.Queue(), self._process.stdout
+
+        def pump():
+            for line in stdout:
+                lines.put(line)
+            lines.put("")
+
+        threading.Thread(target=pump, name="mcp-stdio-reader", daemon=True).start()
+        self._lines = lines
+
+    def _stop_process(self):
+        process, self._process = self._process, None
+        if process is not None:
+            try:
+                process.stdin.close()
+                process.wait(timeout=self.timeout)
+            except (OSError, subprocess.TimeoutExpired):
+                process.kill()
+                process.wait()
+
+    def _exchange(self, payload) -> str:
+        line = json.dumps(payload, default=str) + "\n"
+        if self.socket_path:
+            _, reader, writer = self._socket_files()
+            try:
+                writer.write(line.encode("utf-8"))
+                writer.flush()
+                response = reader.readline().decode("utf-8")
+            except OSError as e:
+                # Includes timeouts: the stream may still carry the late answer
+                self._close_socket()
+                if isinstance(e, TimeoutError):
+                    raise TimeoutError(f"MCP tool server did not answer within {self.timeout}s") from e
+                raise
+        else:
+            # A single pipe: one request/response exchange at a time
+            with self._lock:
+                if self._process is None or self._process.poll() is not None:
+                    self._start_process()
+                try:
+                    self._process.stdin.write(line)
+                    self._process.stdin.flush()
+                    response = self._lines.get(timeout=self.timeout)
+                except queue.Empty:
+                    self._process.kill()
+                    self._stop_process()
+                    raise TimeoutError(f"MCP tool server did not answer within {self.timeout}s") from None
+        if not response:
+            raise ConnectionError("MCP tool server closed the connection")
+        return response
+
+    def _request(self, payload):
+        with span("mcp_call", batch=isinstance(payload, list)):
+            return json.loads(self._exchange(payload))
+
+    @staticmethod
+    def _unwrap(response: dict):
+        if "error" in response:
+            raise ToolError(response["error"]["message"])
+        result = response["result"]
+        text = result["content"][0]["text"] if result.get("content") else ""
+        if result.get("isError"):
+            raise ToolError(text)
+        return result["structuredContent"] if "structuredContent" in result else text
+
+    def list_tools(self) -> list:
+        response = self._request({"jsonrpc": "2.0", "id": self._message_id(), "method": "tools/list"})
+        return response["result"]["tools"]
+
+    def call_tool(self, tool_name: str, args: dict):
+        """Call one tool on the server."""
+        return self._unwrap(self._request({
+            "jsonrpc": "2.0", "id": self._message_id(), "method": "tools/call",
+            "params": {"name": tool_name, "arguments": args},
+        }))
+
+    def call_tools(self, calls, return_exceptions: bool = False) -> list:
+        """Send several tool calls as one JSON-RPC batch; the server runs them concurrently."""
+        messages = [
+            {"jsonrpc": "2.0", "id": self._message_id(), "method": "tools/call",
+             "params": {"name": name, "arguments": arguments}}
+            for name, arguments in calls
+        ]
+        responses = self._request(messages)
+        if isinstance(responses, dict):
+            raise ToolError(responses.get("error", {}).get("message", "Invalid batch response"))
+        by_id = {response.get("id"): response for response in responses}
+        results = []
+        for message in messages:
+            try:
+                results.append(self._unwrap(by_id[message["id"]]))
+            except Exception as e:
+                if not return_exceptions:
+                    raise
+                results.append(e)
+        return results
+
+    def close(self):
+        self._close_socket()
+        with self._lock:
+            self._stop_process()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Text-to-SQL MCP tool server")
+    transport = parser.add_mutually_exclusive_group()
+    transport.add_argument("--stdio", action="store_true", help="Serve JSON-RPC over stdin/stdout")
+    transport.add_argument("--socket", help="Serve on this Unix socket path")
+    args = parser.parse_args(argv)
+    if args.stdio:
+        serve_stdio()
+    else:
+        serve_socket(path=args.socket)
+
+if __name__ == "__main__":
+    main()
@@ -1,51 +1,194 @@
 """
 src/tools/mcp_tools.py: Defines tools for text-to-SQL operations.
-- Uses direct function calls instead of fastmcp for simplicity.
+- Tools live in a registry with MCP-style specs (name, description, input schema); their
+  arguments are plain JSON, and the database and schema index come from the caller's context.
+- MCPClient calls the registry in process; call_tools() runs a batch of independent
+  tools concurrently. RemoteMCPClient (src/tools/mcp_server.py) has the same interface.
 - Includes a LangChain-compatible SchemaRetrievalTool with Pydantic fields.
+- CapturingQuerySQLDataBaseTool records each executed query in the query_execution side channel;
+  MCPQueryTool does the same for queries executed by a remote tool server.
 """
 
+import asyncio
+import contextvars
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+from langchain_community.tools.sql_database.tool import QuerySQLDataBaseTool
+from langchain_core.callbacks import CallbackManagerForToolRun
 from langchain_core.tools import BaseTool
 from pydantic import Field
 from src.config.config import CONFIG
 from src.core import schema_retrieval
+from src.core.db_router import get_query_catalog
+from src.core.database import get_sql_database
+from src.core.prompt_builder import build_schema
+from src.core.query_execution import publish_record, run_query
 from src.utils.logging import setup_logging
 
 logger = setup_logging(__name__)
 
-def execute_sql_query(query: str, db) -> str:
+class ToolError(Exception):
+    """A tool call failed (unknown tool, bad arguments or an error inside the tool)."""
+
+def execute_sql_query(query: str, db=None) -> str:
     """Execute a SQL query and return results or error message."""
+    return run_query(query, db)["observation"]
+
+def list_tables(db=None) -> str:
+    """List available tables in the database (from the metadata catalog, not reflection)."""
+    db = db or get_sql_database()
+    return str(get_query_catalog(db._engine).table_names())
+
+def _fallback_schema(query: str) -> str:
+    """Catalog tables ranked by word overlap with the question, else the schema in CONFIG."""
     try:
-        result = db.run(query)
-        return str(result)
+        schema = build_schema(query) if CONFIG["schema_format"] == "compact" else None
     except Exception as e:
-        return f"Error: {str(e)}"
-
-def list_tables(db) -> str:
-    """List available tables in the database."""
-    return str(db.get_usable_table_names())
+        logger.warning(f"Catalog schema unavailable: {str(e)}")
+        schema = None
+    if schema:
+        return schema
+    logger.info("Using fallback schema from CONFIG")
+    return CONFIG["schema"]
 
 def retrieve_schema_tool(query: str, vector_store) -> str:
     """Retrieve relevant schema from ChromaDB."""
     if vector_store is None:
-        # Fallback: Use schema from config if vector_store is not provided
-        logger.info("Using fallback schema from CONFIG")
-        return CONFIG["schema"]
-    return schema_retrieval.retrieve_schema(vector_store, query)
+        return _fallback_schema(query)
+    try:
+        return schema_retrieval.retrieve_schema(vector_store, query)
+    except Exception as e:
+        # e.g. the embedding model is down; the catalog still knows the live tables
+        logger.warning(f"Schema retrieval failed, using the catalog schema: {str(e)}")
+        return _fallback_schema(query)
+
+class ToolRegistry:
+    """Named tools with MCP-style specs; each is called as fn(context, **arguments)."""
+
+    def __init__(self):
+        self._tools = {}
+
+    def register(self, name: str, description: str, properties: dict = None, required=()):
+        """Decorator registering fn(context, **arguments) under name."""
+        def decorator(fn):
+            self._tools[name] = {
+                "fn": fn,
+                "spec": {
+                    "name": name,
+                    "description": description,
+                    "inputSchema": {"type": "object", "properties": properties or {},
+                                    "required": list(required)},
+                },
+            }
+            return fn
+        return decorator
+
+    def specs(self) -> list:
+        return [tool["spec"] for tool in self._tools.values()]
+
+    def call(self, name: str, arguments: dict, context: dict):
+        tool = self._tools.get(name)
+        if tool is None:
+            raise ToolError(f"Unknown tool: {name}")
+        missing = [key for key in tool["spec"]["inputSchema"]["required"] if key not in (arguments or {})]
+        if missing:
+            raise ToolError(f"Missing arguments for {name}: {missing}")
+        return tool["fn"](context, **(arguments or {}))
+
+REGISTRY = ToolRegistry()
+_QUERY_PROPERTY = {"query": {"type": "string"}}
+
+@REGISTRY.register("execute_sql_query", "Execute a SQL query and return the formatted result.",
+                   _QUERY_PROPERTY, required=("query",))
+def _execute_sql_query(context, query: str):
+    return execute_sql_query(query, context.get("db"))
+
+@REGISTRY.register("run_query", "Execute a SQL query and return the execution record "
+                   "(columns, preview rows, row count, stats, timing).",
+                   _QUERY_PROPERTY, required=("query",))
+def _run_query(context, query: str):
+    return run_query(query, context.get("db"))
+
+@REGISTRY.register("list_tables", "List available tables in the database.")
+def _list_tables(context):
+    return list_tables(context.get("db"))
+
+@REGISTRY.register("retrieve_schema", "Retrieve the schema of the tables relevant to a question.",
+                   _QUERY_PROPERTY, required=("query",))
+def _retrieve_schema(context, query: str):
+    return retrieve_schema_tool(query, context.get("vector_store"))
+
+_batch_pool = None
+_batch_pool_lock = threading.Lock()
+
+def _get_batch_pool() -> ThreadPoolExecutor:
+    global _batch_pool
+    if _batch_pool is None:
+        with _batch_pool_lock:
+            if _batch_pool is None:
+                _batch_pool = ThreadPoolExecutor(max_workers=CONFIG["mcp_batch_workers"],
+                                                 thread_name_prefix="mcp-tool")
+    return _batch_pool
+
+def run_tool_batch(registry: ToolRegistry, calls, context: dict, return_exceptions: bool = False) -> list:
+    """Run [(name, arguments), ...] concurrently and return results in call order.
+
+    With return_exceptions, a failed call's exception is returned in its slot instead
+    of being raised, so one failing tool does not discard the others' results.
+    """
+    pool = _get_batch_pool()
+    # Each call gets a copy of the context so query captures and traces follow it
+    futures = [
+        pool.submit(contextvars.copy_context().run, registry.call, name, arguments, context)
+        for name, arguments in calls
+    ]
+    results = []
+    for future in futures:
+        try:
+            results.append(future.result())
+        except Exception as e:
+            if not return_exceptions:
+                raise
+            results.append(e)
+    return results
 
 class MCPClient:
+    """In-process client: dispatches tool calls through the registry."""
+
+    remote = False
+
+    def __init__(self, db=None, vector_store=None, registry: ToolRegistry = None):
+        self.db = db
+        self.vector_store = vector_store
+        self.registry = registry or REGISTRY
+
+    @property
+    def context(self) -> dict:
+        return {"db": self.db, "vector_store": self.vector_store}
+
+    def list_tools(self) -> list:
+        return self.registry.specs()
+
     def call_tool(self, tool_name: str, args: dict):
-        """Mock MCP client to call tools directly."""
-        if tool_name == "execute_sql_query":
-            return execute_sql_query(args["query"], args["db"])
-        elif tool_name == "list_tables":
-            return list_tables(args["db"])
-        elif tool_name == "retrieve_schema":
-            return retrieve_schema_tool(args["query"], args.get("vector_store"))
-        raise ValueError(f"Unknown tool: {tool_name}")
+        """Call one tool with JSON arguments."""
+        return self.registry.call(tool_name, args, self.context)
+
+    def call_tools(self, calls, return_exceptions: bool = False) -> list:
+        """Call several independent tools concurrently; results are in call order."""
+        return run_tool_batch(self.registry, calls, self.context, return_exceptions)
 
 def initialize_mcp_tools(db, vector_store):
-    """Initialize mock MCP client."""
-    return MCPClient()
+    """Initialize the MCP client for the configured transport ("local", "socket" or "stdio")."""
+    transport = CONFIG["mcp_transport"]
+    if transport == "local":
+        return MCPClient(db, vector_store)
+    from src.tools.mcp_server import RemoteMCPClient
+    if transport == "socket":
+        return RemoteMCPClient(socket_path=CONFIG["mcp_socket_path"])
+    if transport == "stdio":
+        return RemoteMCPClient(command=CONFIG["mcp_server_command"])
+    raise ValueError(f"Unsupported MCP transport: {transport}")
 
 class SchemaRetrievalTool(BaseTool):
     name: str = "schema_retrieval"
@@ -57,8 +200,51 @@ class SchemaRetrievalTool(BaseTool):
 
     def _run(self, query: str) -> str:
         """Synchronous execution of schema retrieval."""
-        return self.mcp_client.call_tool("retrieve_schema", {"query": query, "vector_store": None})
+        return self.mcp_client.call_tool("retrieve_schema", {"query": query})
+
+    async def _arun(self, query: str) -> str:
+        """Asynchronous execution; runs retrieval in a worker thread to keep the event loop free."""
+        return await asyncio.to_thread(self._run, query)
+
+class CapturingQuerySQLDataBaseTool(QuerySQLDataBaseTool):
+    """sql_db_query tool that records rows, row count and timing of its single execution."""
+
+    def _run(self, query: str, run_manager: Optional[CallbackManagerForToolRun] = None) -> str:
+        return run_query(query, self.db)["observation"]
+
+class MCPQueryTool(BaseTool):
+    """sql_db_query tool that executes through the MCP client (e.g. a remote tool server)."""
+
+    name: str = "sql_db_query"
+    description: str = (
+        "Execute a SQL query against the database and get back the result. "
+        "If the query is not correct, an error message will be returned."
+    )
+    mcp_client: object = Field(description="MCP client that executes the query")
+
+    def __init__(self, mcp_client):
+        super().__init__(mcp_client=mcp_client)
+
+    def _run(self, query: str) -> str:
+        record = self.mcp_client.call_tool("run_query", {"query": query})
+        publish_record(record)
+        return record["observation"]
 
     async def _arun(self, query: str) -> str:
-        """Asynchronous execution (not used, but required by BaseTool)."""
-        return self._run(query)
\ No newline at end of file
+        return await asyncio.to_thread(self._run, query)
+
+class MCPListTablesTool(BaseTool):
+    """sql_db_list_tables tool backed by the MCP client (and so by the metadata catalog)."""
+
+    name: str = "sql_db_list_tables"
+    description: str = "Input is an empty string, output is a comma-separated list of tables in the database."
+    mcp_client: object = Field(description="MCP client that lists tables")
+
+    def __init__(self, mcp_client):
+        super().__init__(mcp_client=mcp_client)
+
+    def _run(self, tool_input: str = "") -> str:
+        return self.mcp_client.call_tool("list_tables", {})
+
+    async def _arun(self, tool_input: str = "") -> str:
+        return await asyncio.to_thread(self._run, tool_input)
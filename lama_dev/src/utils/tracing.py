@@ -0,0 +1,239 @@
+"""
+src/utils/tracing.py: Latency instrumentation for the text-to-SQL pipeline.
+- Ties every stage (schema retrieval, LLM calls, tool calls, SQL execution, verification)
+  to a request ID through a per-request trace held in a ContextVar.
+- span() is a context manager for timing a stage; TracingCallbackHandler records LLM
+  calls (with tokens in/out) and tool calls from LangChain.
+- Aggregates stage durations into histograms exported in Prometheus text format, and
+  writes each finished trace as one JSON line.
+"""
+
+import json
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from langchain_core.callbacks import BaseCallbackHandler
+from src.config.config import CONFIG
+from src.utils.logging import setup_logging
+
+logger = setup_logging(__name__)
+
+_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+_current_trace = ContextVar("current_trace", default=None)
+
+class _Histograms:
+    """Cumulative latency histograms per stage plus LLM token counters."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stages = {}
+        self._tokens = {"in": 0, "out": 0}
+
+    def observe(self, stage: str, seconds: float):
+        with self._lock:
+            entry = self._stages.setdefault(stage, {"buckets": [0] * len(_BUCKETS), "sum": 0.0, "count": 0})
+            for index, bound in enumerate(_BUCKETS):
+                if seconds <= bound:
+                    entry["buckets"][index] += 1
+            entry["sum"] += seconds
+            entry["count"] += 1
+
+    def add_tokens(self, tokens_in: int, tokens_out: int):
+        with self._lock:
+            self._tokens["in"] += tokens_in
+            self._tokens["out"] += tokens_out
+
+    def summary(self) -> dict:
+        with self._lock:
+            return {
+                stage: {"count": entry["count"], "total_ms": round(entry["sum"] * 1000, 3),
+                        "mean_ms": round(entry["sum"] * 1000 / entry["count"], 3)}
+                for stage, entry in self._stages.items() if entry["count"]
+            }
+
+    def reset(self):
+        with self._lock:
+            self._stages.clear()
+            self._tokens = {"in": 0, "out": 0}
+
+    def export_prometheus(self) -> str:
+        name = "text_to_sql_stage_duration_seconds"
+        lines = [
+            f"# HELP {name} Time spent in each pipeline stage.",
+            f"# TYPE {name} histogram",
+        ]
+        with self._lock:
+            for stage in sorted(self._stages):
+                entry = self._stages[stage]
+                for bound, count in zip(_BUCKETS, entry["buckets"]):
+                    lines.append(f'{name}_bucket{{stage="{stage}",le="{bound}"}} {count}')
+                lines.append(f'{name}_bucket{{stage="{stage}",le="+Inf"}} {entry["count"]}')
+                lines.append(f'{name}_sum{{stage="{stage}"}} {entry["sum"]:.6f}')
+                lines.append(f'{name}_count{{stage="{stage}"}} {entry["count"]}')
+            lines += [
+                "# HELP text_to_sql_llm_tokens_total LLM tokens by direction.",
+                "# TYPE text_to_sql_llm_tokens_total counter",
+                f'text_to_sql_llm_tokens_total{{direction="in"}} {self._tokens["in"]}',
+                f'text_to_sql_llm_tokens_total{{direction="out"}} {self._tokens["out"]}',
+            ]
+        return "\n".join(lines) + "\n"
+
+HISTOGRAMS = _Histograms()
+_trace_file_lock = threading.Lock()
+
+class Trace:
+    """All spans recorded for one request."""
+
+    def __init__(self, request_id: str = None, question: str = None):
+        self.request_id = request_id or uuid.uuid4().hex
+        self.question = question
+        self.started_at = time.time()
+        self._started = time.perf_counter()
+        self._lock = threading.Lock()
+        self.status = "ok"
+        self.spans = []
+
+    def add_span(self, stage: str, started: float, seconds: float, **attributes):
+        with self._lock:
+            self.spans.append({
+                "stage": stage,
+                "start_ms": round((started - self._started) * 1000, 3),
+                "duration_ms": round(seconds * 1000, 3),
+                **attributes,
+            })
+
+    def to_dict(self) -> dict:
+        with self._lock:
+            spans = list(self.spans)
+        return {
+            "request_id": self.request_id,
+            "question": self.question,
+            "started_at": self.started_at,
+            "duration_ms": round((time.perf_counter() - self._started) * 1000, 3),
+            "status": self.status,
+            "spans": spans,
+        }
+
+def current_trace():
+    """Return the trace of the request being processed, if any."""
+    return _current_trace.get()
+
+def _record(stage: str, started: float, seconds: float, **attributes):
+    HISTOGRAMS.observe(stage, seconds)
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.add_span(stage, started, seconds, **attributes)
+
+def record_span(stage: str, started: float, seconds: float, **attributes):
+    """Record a stage timed by the caller (e.g. inside a token stream), like span() does."""
+    _record(stage, started, seconds, **attributes)
+
+@contextmanager
+def span(stage: str, **attributes):
+    """Time a pipeline stage and attach it to the current request's trace."""
+    started = time.perf_counter()
+    try:
+        yield attributes
+    except Exception as e:
+        attributes["error"] = str(e)
+        raise
+    finally:
+        _record(stage, started, time.perf_counter() - started, **attributes)
+
+def _write_trace(trace_dict: dict):
+    path = CONFIG["trace_log_path"]
+    if not path:
+        return
+    line = json.dumps(trace_dict, default=str)
+    with _trace_file_lock:
+        with open(path, "a") as f:
+            f.write(line + "\n")
+
+@contextmanager
+def start_trace(question: str = None, request_id: str = None):
+    """Open a trace for one request; it is exported as a JSON line when the block exits."""
+    trace = Trace(request_id, question)
+    token = _current_trace.set(trace)
+    try:
+        yield trace
+    except Exception:
+        trace.status = "error"
+        raise
+    finally:
+        _current_trace.reset(token)
+        trace_dict = trace.to_dict()
+        HISTOGRAMS.observe("request", trace_dict["duration_ms"] / 1000)
+        try:
+            _write_trace(trace_dict)
+        except Exception as e:
+            logger.warning(f"Could not write trace: {str(e)}")
+
+def _token_usage(response) -> tuple:
+    """Best-effort (tokens_in, tokens_out) from Ollama or Bedrock LLM results."""
+    usage = (response.llm_output or {}).get("usage") or (response.llm_output or {}).get("token_usage")
+    if usage:
+        return (usage.get("prompt_tokens") or usage.get("input_tokens") or 0,
+                usage.get("completion_tokens") or usage.get("output_tokens") or 0)
+    tokens_in = tokens_out = 0
+    for generations in response.generations:
+        for generation in generations:
+            info = generation.generation_info or {}
+            tokens_in += info.get("prompt_eval_count") or 0
+            tokens_out += info.get("eval_count") or 0
+    return tokens_in, tokens_out
+
+class TracingCallbackHandler(BaseCallbackHandler):
+    """LangChain callback that records LLM and tool calls into a request trace."""
+
+    def __init__(self, trace: Trace = None):
+        self.trace = trace
+        self._starts = {}
+        self._tool_names = {}
+
+    def _finish(self, run_id, stage: str, **attributes):
+        started = self._starts.pop(run_id, None)
+        if started is None:
+            return
+        seconds = time.perf_counter() - started
+        HISTOGRAMS.observe(stage, seconds)
+        if self.trace is not None:
+            self.trace.add_span(stage, started, seconds, **attributes)
+
+    def on_llm_start(self, serialized, prompts, *, run_id, **kwargs):
+        self._starts[run_id] = time.perf_counter()
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs):
+        self._starts[run_id] = time.perf_counter()
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        tokens_in, tokens_out = _token_usage(response)
+        HISTOGRAMS.add_tokens(tokens_in, tokens_out)
+        self._finish(run_id, "llm", tokens_in=tokens_in, tokens_out=tokens_out)
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        self._finish(run_id, "llm", error=str(error))
+
+    def on_tool_start(self, serialized, input_str, *, run_id, **kwargs):
+        self._starts[run_id] = time.perf_counter()
+        self._tool_names[run_id] = (serialized or {}).get("name")
+
+    def on_tool_end(self, output, *, run_id, **kwargs):
+        self._finish(run_id, "tool", tool=self._tool_names.pop(run_id, None))
+
+    def on_tool_error(self, error, *, run_id, **kwargs):
+        self._finish(run_id, "tool", tool=self._tool_names.pop(run_id, None), error=str(error))
+
+def export_prometheus() -> str:
+    """Return all stage histograms in Prometheus text exposition format."""
+    return HISTOGRAMS.export_prometheus()
+
+def stage_summary() -> dict:
+    """Return count, total and mean milliseconds per stage since start (or last reset)."""
+    return HISTOGRAMS.summary()
+
+def reset_metrics():
+    """Clear all histograms and token counters."""
+    HISTOGRAMS.reset()
@@ -0,0 +1,32 @@
+"""
+tests/conftest.py: Shared fixtures for the test suite (run from lama_dev/: python -m pytest tests).
+- Every test gets a CONFIG without catalog snapshots and with immediate DDL checks.
+- make_database creates a throwaway SQLite file and returns a pooled engine for it.
+"""
+
+import pytest
+from src.config.config import CONFIG
+from src.core.database import create_pooled_engine
+
+@pytest.fixture(autouse=True)
+def isolated_config(monkeypatch):
+    monkeypatch.setitem(CONFIG, "catalog_snapshot_path", None)
+    monkeypatch.setitem(CONFIG, "catalog_check_interval_seconds", 0)
+
+@pytest.fixture
+def make_database(tmp_path):
+    """make_database(name, statements, attach=None) -> (path, engine)."""
+    engines = []
+
+    def make(name: str, statements, attach: dict = None):
+        path = str(tmp_path / f"{name}.db")
+        engine = create_pooled_engine(f"sqlite:///{path}", attach=attach)
+        engines.append(engine)
+        with engine.begin() as connection:
+            for statement in statements:
+                connection.exec_driver_sql(statement)
+        return path, engine
+
+    yield make
+    for engine in engines:
+        engine.dispose()
@@ -0,0 +1,101 @@
+"""
+tests/test_advisor.py: Summary-table rewrites of src/core/advisor.py.
+- A rewritten query must return what the original returns on the base table, also after
+  the triggers have applied inserts, updates and deletes.
+- Queries a summary cannot answer exactly are left alone.
+"""
+
+import pytest
+from src.core.advisor import WorkloadAdvisor, summary_ddl
+
+SUMMARY = "_agg_planes_producer_seats"
+
+@pytest.fixture
+def advisor(make_database):
+    _, engine = make_database("planes", [
+        "CREATE TABLE planes (id INTEGER PRIMARY KEY, name TEXT, producer TEXT, seats INT)",
+        "INSERT INTO planes (name, producer, seats) VALUES "
+        "('737', 'Boeing', 160), ('747', 'Boeing', 410), ('787', 'Boeing', NULL), "
+        "('A320', 'Airbus', 150), ('A380', 'Airbus', 525), ('Q400', 'De Havilland', NULL)",
+    ])
+    advisor = WorkloadAdvisor(engine)
+    created = advisor.apply([{
+        "kind": "summary", "name": SUMMARY, "table": "planes", "group_columns": ["producer"],
+        "aggregate_columns": ["seats"], "ddl": summary_ddl(SUMMARY, "planes", ("producer",), ("seats",)),
+    }])
+    assert created == [SUMMARY]
+    return advisor
+
+def _rows(engine, query: str) -> list:
+    with engine.connect() as connection:
+        result = connection.exec_driver_sql(query)
+        rows = [tuple(round(value, 9) if isinstance(value, float) else value for value in row)
+                for row in result]
+        return list(result.keys()), sorted(rows, key=repr)
+
+def _assert_rewritten_matches(advisor, query: str):
+    rewritten = advisor.rewrite(query)
+    assert rewritten is not None, query
+    assert SUMMARY in rewritten
+    assert _rows(advisor.engine, rewritten) == _rows(advisor.engine, query)
+
+QUERIES = [
+    "SELECT COUNT(*) FROM planes",
+    "SELECT COUNT(seats), SUM(seats), AVG(seats) FROM planes",
+    "SELECT producer, COUNT(*), SUM(seats), AVG(seats) FROM planes GROUP BY producer",
+    "SELECT COUNT(*), AVG(seats) FROM planes WHERE producer = 'Boeing'",
+    "SELECT SUM(seats), AVG(seats), COUNT(seats) FROM planes WHERE producer = 'De Havilland'",
+    "SELECT COUNT(*), SUM(seats) FROM planes WHERE producer = 'Lockheed'",
+    "SELECT producer, SUM(seats) AS total FROM planes p WHERE producer IN ('Boeing', 'Airbus') "
+    "GROUP BY producer ORDER BY total DESC",
+]
+
+@pytest.mark.parametrize("query", QUERIES)
+def test_rewrite_matches_base_table(advisor, query):
+    _assert_rewritten_matches(advisor, query)
+
+@pytest.mark.parametrize("query", QUERIES)
+def test_rewrite_matches_after_writes(advisor, query):
+    with advisor.engine.begin() as connection:
+        connection.exec_driver_sql("INSERT INTO planes (name, producer, seats) VALUES "
+                                   "('C919', 'Comac', 168), ('777', 'Boeing', 396), ('ARJ21', 'Comac', NULL)")
+        # A change of group, a value becoming NULL and one becoming known
+        connection.exec_driver_sql("UPDATE planes SET producer = 'Airbus', seats = 100 WHERE name = 'Q400'")
+        connection.exec_driver_sql("UPDATE planes SET seats = NULL WHERE name = '747'")
+        connection.exec_driver_sql("UPDATE planes SET seats = 242 WHERE name = '787'")
+        # A whole group disappears
+        connection.exec_driver_sql("DELETE FROM planes WHERE producer = 'Comac'")
+        connection.exec_driver_sql("DELETE FROM planes WHERE name = 'A320'")
+    _assert_rewritten_matches(advisor, query)
+
+def test_summary_group_removed_with_last_row(advisor):
+    with advisor.engine.begin() as connection:
+        connection.exec_driver_sql("DELETE FROM planes WHERE producer = 'De Havilland'")
+    _, rows = _rows(advisor.engine, f"SELECT producer FROM {SUMMARY}")
+    assert rows == [("Airbus",), ("Boeing",)]
+
+def test_rewrite_keeps_result_column_names(advisor):
+    columns, _ = _rows(advisor.engine, advisor.rewrite("SELECT COUNT(*), avg(seats) FROM planes"))
+    assert columns == ["COUNT(*)", "avg(seats)"]
+
+@pytest.mark.parametrize("query", [
+    "SELECT COUNT(DISTINCT producer) FROM planes",
+    "SELECT DISTINCT producer FROM planes",
+    "SELECT MIN(seats) FROM planes",
+    "SELECT producer, MAX(seats) FROM planes GROUP BY producer",
+    "SELECT COUNT(*) FROM planes WHERE seats > (SELECT AVG(seats) FROM planes)",
+    "SELECT COUNT(*) FROM planes WHERE producer IN (SELECT producer FROM planes WHERE seats > 400)",
+    "SELECT COUNT(*) FROM (SELECT producer FROM planes)",
+    "SELECT COUNT(*) FROM planes WHERE seats > 200",
+    "SELECT COUNT(*) FROM planes WHERE name = '737'",
+    "SELECT SUM(seats * 2) FROM planes",
+    "SELECT COUNT(*) FROM planes a JOIN planes b ON a.producer = b.producer",
+    "SELECT producer, COUNT(*) OVER () FROM planes",
+    "SELECT name FROM planes",
+])
+def test_not_rewritten(advisor, query):
+    assert advisor.rewrite(query) is None
+
+def test_no_rewrite_after_summary_dropped(advisor):
+    advisor.drop_summary(SUMMARY)
+    assert advisor.rewrite("SELECT COUNT(*) FROM planes") is None
@@ -0,0 +1,39 @@
+"""
+tests/test_answer_cache.py: Question normalization and literal matching of
+src/core/answer_cache.py, with a stand-in embedding model.
+"""
+
+import pytest
+from src.core.answer_cache import AnswerCache, normalize_question
+
+class _Embeddings:
+    """Embeds every question alike, so only the literal check tells them apart."""
+
+    def embed_query(self, text):
+        return [1.0, 0.0]
+
+@pytest.fixture
+def cache():
+    return AnswerCache(embeddings=_Embeddings(), max_entries=10, ttl_seconds=60,
+                       similarity_threshold=0.9, fingerprint_fn=lambda: "schema")
+
+@pytest.mark.parametrize("question, normalized", [
+    ("  How many   Planes? ", "how many planes"),
+    ("Flights by 'Delta'?", "flights by 'Delta'"),
+    ('Flights  BY "New  York"!', 'flights by "New  York"'),
+    ("What's the count of Boeing's planes?", "what's the count of boeing's planes"),
+])
+def test_normalize_question(question, normalized):
+    assert normalize_question(question) == normalized
+
+def test_exact_tier_keeps_literal_case(cache):
+    cache.store("flights by 'Delta'", "SELECT * FROM flights WHERE airline = 'Delta'")
+    assert cache.lookup("FLIGHTS BY 'Delta'?") == "SELECT * FROM flights WHERE airline = 'Delta'"
+    assert cache.lookup("flights by 'DELTA'") is None
+
+def test_semantic_tier_requires_the_same_literals(cache):
+    cache.store("list flights operated by 'Delta' after 2020", "SELECT 1")
+    assert cache.lookup("which flights did 'Delta' operate after 2020") == "SELECT 1"
+    assert cache.lookup("which flights did 'DELTA' operate after 2020") is None
+    assert cache.lookup("which flights did 'Delta' operate after 2021") is None
+    assert cache.stats()["semantic_hits"] == 1
@@ -0,0 +1,23 @@
+"""
+tests/test_benchmark.py: The nearest-rank percentile behind the benchmark's latency report
+and baseline comparison.
+"""
+
+import pytest
+from benchmarks.run_benchmark import percentile
+
+@pytest.mark.parametrize("values, fraction, expected", [
+    (range(1, 11), 0.5, 5),
+    (range(1, 11), 0.95, 10),
+    (range(1, 101), 0.5, 50),
+    (range(1, 101), 0.07, 7),
+    (range(1, 101), 0.29, 29),
+    (range(1, 101), 0.95, 95),
+    (range(1, 101), 0.99, 99),
+    (range(1, 101), 1.0, 100),
+    ([7.5], 0.99, 7.5),
+    ([3, 1, 2], 0.5, 2),
+    ([], 0.5, 0.0),
+])
+def test_percentile_is_nearest_rank(values, fraction, expected):
+    assert percentile(list(values), fraction) == expected
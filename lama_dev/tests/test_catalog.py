@@ -0,0 +1,41 @@
+"""
+tests/test_catalog.py: Row estimates of src/core/catalog.py, which the SQL validator's cost
+guard and the advisor's thresholds read.
+"""
+
+from src.core.catalog import MetadataCatalog
+
+def _write(engine, *statements):
+    with engine.begin() as connection:
+        for statement in statements:
+            connection.exec_driver_sql(statement)
+
+def test_row_count_follows_growth_after_analyze(make_database):
+    _, engine = make_database("growth", [
+        "CREATE TABLE planes (id INTEGER PRIMARY KEY, name TEXT)",
+        "CREATE INDEX planes_name ON planes (name)",
+        "WITH RECURSIVE n(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM n WHERE x < 100) "
+        "INSERT INTO planes (name) SELECT 'plane ' || x FROM n",
+        "ANALYZE",
+    ])
+    catalog = MetadataCatalog(engine, snapshot_path=None)
+    assert catalog.row_count("planes") == 100
+    # Another writer, without a new ANALYZE
+    _write(engine, "WITH RECURSIVE n(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM n WHERE x < 5000) "
+                   "INSERT INTO planes (name) SELECT 'more ' || x FROM n")
+    assert catalog.row_count("planes") == 5100
+
+def test_row_count_of_empty_and_without_rowid_tables(make_database):
+    _, engine = make_database("kinds", [
+        "CREATE TABLE empty (id INTEGER PRIMARY KEY)",
+        "CREATE TABLE codes (code TEXT PRIMARY KEY, name TEXT) WITHOUT ROWID",
+        "INSERT INTO codes VALUES ('A', 'a'), ('B', 'b'), ('C', 'c')",
+        "CREATE VIEW code_names AS SELECT name FROM codes",
+    ])
+    catalog = MetadataCatalog(engine, snapshot_path=None)
+    assert catalog.row_count("empty") == 0
+    assert catalog.row_count("codes") is None
+    assert catalog.row_count("code_names") is None
+    _write(engine, "ANALYZE")
+    catalog.invalidate()
+    assert catalog.row_count("codes") == 3
@@ -0,0 +1,51 @@
+"""
+tests/test_llm_streaming.py: Where StepCutter (src/core/llm_streaming.py) ends a streamed
+ReAct step, for whole generations and when they arrive a few characters at a time.
+"""
+
+import pytest
+from src.core.llm_streaming import StepCutter
+
+CASES = [
+    # (generation, expected step; None keeps reading)
+    ("Thought: count\nAction: sql_db_query\nAction Input: SELECT COUNT(*) FROM planes;\nObservation: [(3,)]",
+     "Thought: count\nAction: sql_db_query\nAction Input: SELECT COUNT(*) FROM planes;"),
+    ("Action: sql_db_query\nAction Input: SELECT a\n\nFROM t\nWHERE b = 1\nObservation: [(1,)]",
+     "Action: sql_db_query\nAction Input: SELECT a\n\nFROM t\nWHERE b = 1"),
+    ("Action: sql_db_query\nAction Input: SELECT a\n\nFROM t",
+     None),
+    ("Action: sql_db_query\nAction Input: SELECT 'a;b', \"c;d\" FROM t WHERE e = ';';\nThought: done",
+     "Action: sql_db_query\nAction Input: SELECT 'a;b', \"c;d\" FROM t WHERE e = ';';"),
+    ("Action: sql_db_list_tables\nAction Input: \nObservation: made up\nThought: more",
+     "Action: sql_db_list_tables\nAction Input: "),
+    ("Action: sql_db_list_tables\nAction Input:\n\nThought: I know the tables",
+     "Action: sql_db_list_tables\nAction Input:\n"),
+    ("Action: sql_db_query\nAction Input: ```sql\nSELECT 1\n```\nObservation: [(1,)]",
+     "Action: sql_db_query\nAction Input: ```sql\nSELECT 1\n```"),
+    ("Action 1: sql_db_query\nAction 1 Input: SELECT 1\nAction 2: sql_db_query",
+     "Action 1: sql_db_query\nAction 1 Input: SELECT 1"),
+    ("Thought: I know\nFinal Answer: The planes are:\n\n1. 737\n2. A320\n\nThought: extra",
+     "Thought: I know\nFinal Answer: The planes are:\n\n1. 737\n2. A320\n"),
+    ("Final Answer: SELECT name\n\nFROM planes;", None),
+    ("Final Answer: 3\nQuestion: another", "Final Answer: 3"),
+    ("Action: sql_db_query\nAction Input: SELECT 1;\nFinal Answer: 1",
+     "Action: sql_db_query\nAction Input: SELECT 1;"),
+    ("SELECT name FROM planes; -- the names", "SELECT name FROM planes;"),
+    ("```sql\nSELECT name\nFROM planes\n```\nThis lists them", "```sql\nSELECT name\nFROM planes\n"),
+    ("SELECT name FROM planes\n\nThis lists them", "SELECT name FROM planes"),
+    ("Thought: let me think", None),
+]
+
+@pytest.mark.parametrize("generation, expected", CASES)
+def test_complete_at(generation, expected):
+    cut = StepCutter.complete_at(generation)
+    assert (generation[:cut] if cut is not None else None) == expected
+
+@pytest.mark.parametrize("generation, expected", CASES)
+def test_streamed_in_chunks_cuts_at_the_same_step(generation, expected):
+    cutter, cut = StepCutter(), None
+    for start in range(0, len(generation), 3):
+        cut = cutter.feed(generation[start:start + 3])
+        if cut is not None:
+            break
+    assert (cutter.text[:cut] if cut is not None else None) == expected
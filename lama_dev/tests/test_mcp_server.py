@@ -0,0 +1,130 @@
+"""
+tests/test_mcp_server.py: JSON-RPC handling of src/tools/mcp_server.py against a stand-in
+application, a round trip over a local Unix socket, and client timeouts on a tool server
+that never answers.
+"""
+
+import json
+import sys
+import threading
+import time
+import pytest
+from langchain_community.utilities import SQLDatabase
+from src.tools import mcp_server
+from src.tools.mcp_server import INVALID_PARAMS, MCPServer, RemoteMCPClient
+
+class _App:
+    """The part of the application container that MCPServer uses."""
+
+    def __init__(self, engine):
+        self.db = SQLDatabase(engine, lazy_table_reflection=True)
+        self.vector_store = None
+
+@pytest.fixture
+def server(make_database):
+    _, engine = make_database("tools", [
+        "CREATE TABLE planes (id INTEGER PRIMARY KEY, name TEXT)",
+        "INSERT INTO planes (name) VALUES ('737'), ('A320')",
+    ])
+    return MCPServer(app=_App(engine))
+
+def _call(message_id, name, arguments=None):
+    params = {"name": name} if arguments is None else {"name": name, "arguments": arguments}
+    return {"jsonrpc": "2.0", "id": message_id, "method": "tools/call", "params": params}
+
+def test_batch_answers_every_call(server):
+    batch = [
+        _call(1, "run_query", {"query": "SELECT name FROM planes ORDER BY id"}),
+        _call(2, "execute_sql_query", {"query": "DELETE FROM planes"}),
+        _call(3, "drop_everything", {}),
+        _call(4, "run_query", {}),
+        {"jsonrpc": "2.0", "id": 5, "method": "tools/call", "params": ["not", "an", "object"]},
+        {"jsonrpc": "2.0", "method": "notifications/initialized"},
+    ]
+    responses = {response["id"]: response for response in json.loads(server.handle_line(json.dumps(batch)))}
+    assert sorted(responses) == [1, 2, 3, 4, 5]
+
+    record = responses[1]["result"]["structuredContent"]
+    assert record["error"] is None and record["rows"] == [["737"], ["A320"]]
+    rejected = responses[2]["result"]
+    assert not rejected["isError"] and rejected["content"][0]["text"].startswith("Error")
+    unknown = responses[3]["result"]
+    assert unknown["isError"] and "Unknown tool: drop_everything" in unknown["content"][0]["text"]
+    missing = responses[4]["result"]
+    assert missing["isError"] and "Missing arguments for run_query" in missing["content"][0]["text"]
+    assert responses[5]["error"]["code"] == INVALID_PARAMS
+
+    # The write was rejected before it reached the database
+    count = json.loads(server.handle_line(json.dumps(_call(6, "run_query", {"query": "SELECT COUNT(*) FROM planes"}))))
+    assert count["result"]["structuredContent"]["rows"] == [[2]]
+
+def test_malformed_line(server):
+    assert json.loads(server.handle_line("{not json"))["error"]["message"].startswith("Parse error")
+
+def _serve(path, handler):
+    unix_server = mcp_server._UnixServer(path, handler)
+    thread = threading.Thread(target=unix_server.serve_forever, daemon=True)
+    thread.start()
+    return unix_server
+
+def test_socket_round_trip(server, tmp_path):
+    path = str(tmp_path / "tools.sock")
+    unix_server = _serve(path, mcp_server._SocketHandler)
+    unix_server.mcp = server
+    client = RemoteMCPClient(socket_path=path, timeout=5)
+    try:
+        assert {tool["name"] for tool in client.list_tools()} >= {"run_query", "list_tables"}
+        tables, record, unknown = client.call_tools(
+            [("list_tables", {}), ("run_query", {"query": "SELECT COUNT(*) FROM planes"}), ("nope", {})],
+            return_exceptions=True)
+        assert "planes" in tables
+        assert record["rows"] == [[2]]
+        assert "Unknown tool: nope" in str(unknown)
+    finally:
+        client.close()
+        unix_server.shutdown()
+        unix_server.server_close()
+
+class _Silent(mcp_server._SocketHandler):
+    """A hung tool server: reads requests and never answers."""
+
+    def handle(self):
+        for _ in self.rfile:
+            pass
+
+def test_socket_timeout_drops_the_connection(tmp_path):
+    path = str(tmp_path / "hung.sock")
+    unix_server = _serve(path, _Silent)
+    client = RemoteMCPClient(socket_path=path, timeout=0.2)
+    try:
+        started = time.monotonic()
+        with pytest.raises(TimeoutError):
+            client.call_tool("list_tables", {})
+        assert time.monotonic() - started < 2
+        assert client._local.files is None
+    finally:
+        client.close()
+        unix_server.shutdown()
+        unix_server.server_close()
+
+def test_stdio_timeout_replaces_the_process():
+    client = RemoteMCPClient(command=[sys.executable, "-c", "import time; time.sleep(60)"], timeout=0.2)
+    try:
+        with pytest.raises(TimeoutError):
+            client.call_tool("list_tables", {})
+        assert client._process is None
+    finally:
+        client.close()
+
+def test_stdio_round_trip():
+    stand_in = ("import json, sys\n"
+                "for line in sys.stdin:\n"
+                "    message = json.loads(line)\n"
+                "    print(json.dumps({'jsonrpc': '2.0', 'id': message['id'], "
+                "'result': {'content': [{'type': 'text', 'text': 'pong'}], 'isError': False}}), flush=True)\n")
+    client = RemoteMCPClient(command=[sys.executable, "-c", stand_in], timeout=5)
+    try:
+        assert client.call_tool("ping", {}) == "pong"
+        assert client.call_tool("ping", {}) == "pong"
+    finally:
+        client.close()
@@ -0,0 +1,180 @@
+"""
+tests/test_result_cache.py: Keys, invalidation and eviction of src/core/result_cache.py, and
+cached results through run_query staying current after writes.
+"""
+
+import pytest
+from langchain_community.utilities import SQLDatabase
+from src.core.query_execution import run_query
+from src.core.result_cache import DataVersionTracker, ResultCache, canonicalize, is_cacheable
+
+@pytest.mark.parametrize("first, second", [
+    ("SELECT name FROM planes WHERE seats > 100;", "select  NAME\nfrom Planes where SEATS>100"),
+    ("SELECT name FROM planes -- big ones\nWHERE seats > 100", "SELECT name /* big */ FROM planes WHERE seats > 100;;"),
+    ("SELECT 'it''s' FROM planes", "select 'it''s' from planes"),
+])
+def test_equivalent_spellings_share_a_key(first, second):
+    assert canonicalize(first) == canonicalize(second)
+
+@pytest.mark.parametrize("first, second", [
+    ("SELECT name FROM planes WHERE seats > 100", "SELECT name FROM planes WHERE seats > 200"),
+    ("SELECT name FROM planes WHERE seats = 1", "SELECT name FROM planes WHERE seats = 1.0"),
+    ("SELECT name FROM planes WHERE seats = 1", "SELECT name FROM planes WHERE seats = '1'"),
+    ("SELECT name FROM planes WHERE producer = 'Boeing'", "SELECT name FROM planes WHERE producer = 'BOEING'"),
+    ('SELECT "Name" FROM planes', 'SELECT "name" FROM planes'),
+    ("SELECT name FROM planes WHERE seats > 100", "SELECT name FROM planes WHERE seats >= 100"),
+])
+def test_different_queries_have_different_keys(first, second):
+    assert canonicalize(first) != canonicalize(second)
+
+def test_literals_are_kept_in_the_key():
+    template, literals = canonicalize("SELECT * FROM planes WHERE producer = 'Boeing' AND seats > 1.5 LIMIT 10")
+    assert template == "select * from planes where producer = ? and seats > ? limit ?"
+    assert literals == ("Boeing", ("real", 1.5), ("int", 10))
+
+@pytest.mark.parametrize("query, cacheable", [
+    ("SELECT name FROM planes", True),
+    ("SELECT name FROM planes ORDER BY random() LIMIT 1", False),
+    ("SELECT date('now')", False),
+    ("SELECT CURRENT_TIMESTAMP", False),
+    ("SELECT name FROM planes WHERE name = 'nowhere'", True),
+])
+def test_is_cacheable(query, cacheable):
+    assert is_cacheable(*canonicalize(query)) is cacheable
+
+@pytest.fixture
+def planes(make_database):
+    return make_database("planes", [
+        "CREATE TABLE planes (id INTEGER PRIMARY KEY, name TEXT)",
+        "CREATE TABLE makers (id INTEGER PRIMARY KEY, name TEXT)",
+        "INSERT INTO planes (name) VALUES ('737')",
+    ])
+
+def _write(engine, statement: str):
+    with engine.begin() as connection:
+        connection.exec_driver_sql(statement)
+
+def test_data_version_moves_on_any_committed_write(planes):
+    path, engine = planes
+    tracker = DataVersionTracker(path)
+    before = tracker.versions(["planes"])
+    assert tracker.versions(["planes"]) == before
+    _write(engine, "INSERT INTO makers (name) VALUES ('Boeing')")
+    assert tracker.versions(["planes"]) != before
+    tracker.close()
+
+def test_triggers_track_each_table(planes):
+    path, engine = planes
+    tracker = DataVersionTracker(path, per_table=True)
+    planes_before, makers_before = tracker.versions(["planes"]), tracker.versions(["makers"])
+    _write(engine, "INSERT INTO makers (name) VALUES ('Boeing')")
+    assert tracker.versions(["planes"]) == planes_before
+    assert tracker.versions(["makers"]) != makers_before
+
+    planes_before = tracker.versions(["planes"])
+    for statement in ("UPDATE planes SET name = '747'", "DELETE FROM planes"):
+        _write(engine, statement)
+        assert tracker.versions(["planes"]) != planes_before
+        planes_before = tracker.versions(["planes"])
+
+    # DDL fires no trigger; the schema version covers it
+    _write(engine, "ALTER TABLE planes ADD COLUMN seats INT")
+    assert tracker.versions(["planes"]) != planes_before
+    tracker.close()
+
+def test_untracked_tables_use_the_database_version(planes):
+    path, engine = planes
+    tracker = DataVersionTracker(path, per_table=True)
+    _write(engine, "CREATE TABLE owners (id INTEGER PRIMARY KEY)")
+    before = tracker.versions(["owners"])
+    _write(engine, "INSERT INTO makers (name) VALUES ('Boeing')")
+    assert tracker.versions(["owners"]) != before
+    tracker.close()
+
+def _record(rows: list) -> dict:
+    return {"observation": str(rows), "rows": rows, "stats": {}, "error": None}
+
+@pytest.mark.parametrize("per_table", [False, True])
+def test_lookup_drops_entries_after_a_write(planes, per_table):
+    path, engine = planes
+    cache = ResultCache(DataVersionTracker(path, per_table=per_table))
+    key = cache.key("SELECT name FROM planes", 20, 4096)
+    cache.store(key, _record([("737",)]), ["planes"], cache.versions(["planes"]))
+    assert cache.lookup(key)["rows"] == [("737",)]
+    _write(engine, "INSERT INTO planes (name) VALUES ('A320')")
+    assert cache.lookup(key) is None
+    assert cache.stats()["invalidations"] == 1
+    cache.tracker.close()
+
+def test_write_to_another_table_keeps_entries_with_triggers(planes):
+    path, engine = planes
+    cache = ResultCache(DataVersionTracker(path, per_table=True))
+    key = cache.key("SELECT name FROM planes", 20, 4096)
+    cache.store(key, _record([("737",)]), ["planes"], cache.versions(["planes"]))
+    _write(engine, "INSERT INTO makers (name) VALUES ('Boeing')")
+    assert cache.lookup(key) is not None
+    cache.tracker.close()
+
+def test_stale_snapshot_is_never_served(planes):
+    path, engine = planes
+    cache = ResultCache(DataVersionTracker(path))
+    key = cache.key("SELECT name FROM planes", 20, 4096)
+    # A write lands between the version snapshot and the store
+    versions = cache.versions(["planes"])
+    _write(engine, "INSERT INTO planes (name) VALUES ('A320')")
+    cache.store(key, _record([("737",)]), ["planes"], versions)
+    assert cache.lookup(key) is None
+    cache.tracker.close()
+
+def test_least_recently_used_entry_is_evicted(planes):
+    path, _ = planes
+    cache = ResultCache(DataVersionTracker(path), max_entries=2)
+    versions = cache.versions()
+    keys = [cache.key(f"SELECT {value}", 20, 4096) for value in range(3)]
+    cache.store(keys[0], _record([(0,)]), None, versions)
+    cache.store(keys[1], _record([(1,)]), None, versions)
+    assert cache.lookup(keys[0]) is not None
+    cache.store(keys[2], _record([(2,)]), None, versions)
+    assert cache.lookup(keys[1]) is None
+    assert cache.lookup(keys[0]) is not None and cache.lookup(keys[2]) is not None
+    assert cache.stats()["evictions"] == 1
+    cache.tracker.close()
+
+def test_bytes_bound_evicts_and_skips_oversized_records(planes):
+    path, _ = planes
+    cache = ResultCache(DataVersionTracker(path), max_bytes=3000)
+    versions = cache.versions()
+    keys = [cache.key(f"SELECT {value}", 20, 4096) for value in range(3)]
+    for key in keys:
+        cache.store(key, _record([("x" * 400,)]), None, versions)
+    stats = cache.stats()
+    assert stats["bytes"] <= 3000 and stats["entries"] == 2 and stats["evictions"] == 1
+    assert cache.lookup(keys[0]) is None
+
+    huge = cache.key("SELECT 'huge'", 20, 4096)
+    cache.store(huge, _record([("x" * 4000,)]), None, versions)
+    assert cache.lookup(huge) is None
+    assert cache.stats()["entries"] == 2
+    cache.tracker.close()
+
+def test_failed_records_are_not_stored(planes):
+    path, _ = planes
+    cache = ResultCache(DataVersionTracker(path))
+    key = cache.key("SELECT nope FROM planes", 20, 4096)
+    cache.store(key, dict(_record([]), error="no such column: nope"), ["planes"], cache.versions(["planes"]))
+    assert cache.lookup(key) is None
+    cache.tracker.close()
+
+@pytest.mark.parametrize("invalidation", ["data_version", "triggers"])
+def test_run_query_serves_current_results(planes, monkeypatch, invalidation):
+    from src.config.config import CONFIG
+    monkeypatch.setitem(CONFIG, "result_cache_invalidation", invalidation)
+    _, engine = planes
+    db = SQLDatabase(engine, lazy_table_reflection=True)
+    query = "SELECT COUNT(*) FROM planes"
+    assert run_query(query, db)["rows"] == [(1,)]
+    cached = run_query(query, db)
+    assert cached.get("cached") and cached["rows"] == [(1,)]
+    _write(engine, "INSERT INTO planes (name) VALUES ('A320')")
+    fresh = run_query(query, db)
+    assert not fresh.get("cached") and fresh["rows"] == [(2,)]
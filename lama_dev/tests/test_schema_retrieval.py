@@ -0,0 +1,50 @@
+"""
+tests/test_schema_retrieval.py: Foreign-key neighbours of src/core/schema_retrieval.py and
+their use in SchemaIndex.retrieve, with a stand-in vector store.
+"""
+
+import pytest
+from langchain_core.documents import Document
+from src.core import schema_retrieval
+from src.core.catalog import MetadataCatalog
+from src.core.schema_retrieval import SchemaIndex, reflect_schema
+
+class _Store:
+    """Vector store stand-in returning fixed hits."""
+
+    def __init__(self, tables):
+        self.tables = tables
+
+    def similarity_search(self, query, k=4):
+        return [Document(page_content=table, metadata={"table": table}) for table in self.tables][:k]
+
+@pytest.fixture
+def tables(make_database, monkeypatch):
+    _, engine = make_database("fleet", [
+        "CREATE TABLE makers (id INTEGER PRIMARY KEY, name TEXT)",
+        # Referred table in another case than its definition, and one that does not exist
+        "CREATE TABLE planes (id INTEGER PRIMARY KEY, maker_id INT REFERENCES Makers(id), "
+        "owner_id INT REFERENCES owners(id))",
+        "CREATE TABLE flights (id INTEGER PRIMARY KEY, plane_id INT REFERENCES PLANES(id))",
+    ])
+    catalog = MetadataCatalog(engine, snapshot_path=None)
+    monkeypatch.setattr(schema_retrieval, "get_query_catalog", lambda engine=None: catalog)
+    return reflect_schema(engine)
+
+def test_neighbours_are_reflected_table_names(tables):
+    assert tables["planes"]["neighbours"] == {"makers", "flights"}
+    assert tables["makers"]["neighbours"] == {"planes"}
+    assert tables["flights"]["neighbours"] == {"planes"}
+
+def test_retrieve_adds_neighbours(tables):
+    index = SchemaIndex(schema_fn=lambda: tables)
+    index._store, index._tables, index._document_count = _Store(["flights"]), tables, len(tables)
+    documents = index.retrieve("flights per plane", k=1, token_budget=10_000)
+    assert documents == [tables["flights"]["compact"], tables["planes"]["compact"]]
+
+def test_retrieve_skips_unknown_neighbours(tables):
+    tables["makers"]["neighbours"].add("owners")
+    index = SchemaIndex(schema_fn=lambda: tables)
+    index._store, index._tables, index._document_count = _Store(["makers"]), tables, len(tables)
+    documents = index.retrieve("makers", k=1, token_budget=10_000)
+    assert documents == [tables["makers"]["compact"], tables["planes"]["compact"]]
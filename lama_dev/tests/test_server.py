@@ -0,0 +1,33 @@
+"""
+tests/test_server.py: Admission control of src/server.py's RequestPool.
+"""
+
+import pytest
+from src.server import RequestPool, ServerBusy, ServerDraining
+
+def test_stream_slots_are_bounded_and_released():
+    pool = RequestPool(app=object(), max_streams=2)
+    with pool.stream_slot(), pool.stream_slot():
+        assert pool.stats()["streaming"] == 2
+        with pytest.raises(ServerBusy):
+            with pool.stream_slot():
+                pass
+    with pool.stream_slot():
+        assert pool.stats()["streaming"] == 1
+    stats = pool.stats()
+    assert (stats["streaming"], stats["streams"], stats["streams_rejected"]) == (0, 3, 1)
+
+def test_stream_slot_released_when_the_stream_fails():
+    pool = RequestPool(app=object(), max_streams=1)
+    with pytest.raises(BrokenPipeError):
+        with pool.stream_slot():
+            raise BrokenPipeError()
+    with pool.stream_slot():
+        pass
+
+def test_no_streams_while_draining():
+    pool = RequestPool(app=object(), max_streams=1)
+    assert pool.drain(timeout=0)
+    with pytest.raises(ServerDraining):
+        with pool.stream_slot():
+            pass
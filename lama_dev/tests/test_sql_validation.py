@@ -0,0 +1,145 @@
+"""
+tests/test_sql_validation.py: Statement guard, table/alias resolution and plan estimates of
+src/core/sql_validation.py, on a small SQLite schema with an attached database.
+"""
+
+import pytest
+from src.config.config import CONFIG
+from src.core import sql_validation
+from src.core.catalog import CombinedCatalog, MetadataCatalog
+from src.core.sql_validation import validate_sql
+
+class _Database:
+    """The part of SQLDatabase that validate_sql uses."""
+
+    def __init__(self, engine):
+        self._engine = engine
+
+@pytest.fixture
+def db(make_database, monkeypatch):
+    sales_path, sales = make_database("sales", [
+        "CREATE TABLE orders (id INTEGER PRIMARY KEY, plane_id INT, total REAL)",
+        "INSERT INTO orders (plane_id, total) VALUES (1, 10.5), (2, 20.0)",
+    ])
+    _, engine = make_database("main", [
+        "CREATE TABLE makers (id INTEGER PRIMARY KEY, name TEXT, country TEXT)",
+        "CREATE TABLE planes (id INTEGER PRIMARY KEY, name TEXT, seats INT, maker_id INT REFERENCES makers(id))",
+        "INSERT INTO makers (name, country) VALUES ('Boeing', 'US'), ('Airbus', 'EU')",
+        "WITH RECURSIVE n(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM n WHERE x < 5000) "
+        "INSERT INTO planes (name, seats, maker_id) SELECT 'plane ' || x, x % 400, 1 + x % 2 FROM n",
+    ], attach={"sales": sales_path})
+    catalog = CombinedCatalog(MetadataCatalog(engine, snapshot_path=None),
+                              {"sales": MetadataCatalog(sales, snapshot_path=None)})
+    monkeypatch.setattr(sql_validation, "get_query_catalog", lambda engine=None: catalog)
+    return _Database(engine)
+
+@pytest.mark.parametrize("query, message", [
+    ("", "Empty query"),
+    ("DELETE FROM planes", "(got DELETE)"),
+    ("PRAGMA table_info(planes)", "(got PRAGMA)"),
+    ("SELECT 1; DROP TABLE planes", "single SQL statement"),
+    ("WITH doomed AS (SELECT id FROM planes) DELETE FROM planes WHERE id IN doomed", "(DELETE found)"),
+    ("SELECT * FROM planes; ATTACH DATABASE 'x.db' AS x", "single SQL statement"),
+    ("WITH fresh AS (SELECT 1, 'x', 0, 1) REPLACE INTO planes SELECT * FROM fresh", "(REPLACE found)"),
+])
+def test_rejects_non_select_statements(db, query, message):
+    result = validate_sql(query, db)
+    assert not result["ok"]
+    assert message in result["error"]
+
+def test_rejects_unknown_table_with_suggestion(db):
+    result = validate_sql("SELECT name FROM plane", db)
+    assert not result["ok"]
+    assert result["error"].startswith("No such table: plane.")
+    assert "Did you mean: planes" in result["error"]
+
+def test_rejects_unknown_alias_column_with_suggestion(db):
+    result = validate_sql("SELECT p.nam FROM planes p", db)
+    assert not result["ok"]
+    assert "No such column: p.nam" in result["error"]
+    assert "Did you mean: name" in result["error"]
+
+def test_rejects_unqualified_unknown_column_from_the_plan(db):
+    result = validate_sql("SELECT wingspan FROM planes", db)
+    assert not result["ok"]
+    assert result["error"].startswith("Invalid SQL: no such column: wingspan")
+
+@pytest.mark.parametrize("query", [
+    "SELECT replace(name, 'plane', 'jet') FROM planes",
+    "SELECT 'DROP TABLE planes; -- DELETE' AS note FROM planes LIMIT 1",
+    "SELECT name FROM planes -- DELETE FROM planes",
+    'SELECT "order".name FROM planes AS "order"',
+    'SELECT "select".seats FROM planes "select" WHERE "select".id = 1',
+    "SELECT [group].name FROM planes [group]",
+    "SELECT p.name FROM main.planes p",
+])
+def test_allows_functions_strings_and_quoted_keyword_aliases(db, query):
+    result = validate_sql(query, db)
+    assert result["ok"], result["error"]
+
+def test_quoted_keyword_alias_columns_are_checked(db):
+    result = validate_sql('SELECT "order".wingspan FROM planes AS "order"', db)
+    assert not result["ok"]
+    assert 'No such column: "order".wingspan' in result["error"]
+
+@pytest.mark.parametrize("query", [
+    "WITH big AS (SELECT * FROM planes WHERE seats > 300) SELECT b.name FROM big b",
+    "WITH RECURSIVE n(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM n WHERE x < 5) SELECT x FROM n",
+    "WITH a AS (SELECT id FROM makers), b AS (SELECT maker_id FROM planes) "
+    "SELECT COUNT(*) FROM a JOIN b ON a.id = b.maker_id",
+])
+def test_allows_ctes(db, query):
+    result = validate_sql(query, db)
+    assert result["ok"], result["error"]
+
+def test_cte_bodies_are_still_checked(db):
+    result = validate_sql("WITH big AS (SELECT * FROM plane) SELECT * FROM big", db)
+    assert not result["ok"]
+    assert result["error"].startswith("No such table: plane.")
+
+def test_comma_joins_resolve_every_table(db):
+    ok = validate_sql("SELECT p.name, m.country FROM planes p, makers m WHERE p.maker_id = m.id", db)
+    assert ok["ok"], ok["error"]
+    assert ok["tables"] == ["makers", "planes"]
+    bad = validate_sql("SELECT p.name, m.continent FROM planes p, makers m WHERE p.maker_id = m.id", db)
+    assert not bad["ok"]
+    assert "No such column: m.continent (table makers" in bad["error"]
+
+def test_attached_tables_are_checked_as_schema_table(db):
+    ok = validate_sql("SELECT o.total, p.name FROM sales.orders o JOIN planes p ON p.id = o.plane_id", db)
+    assert ok["ok"], ok["error"]
+    assert ok["tables"] == ["planes", "sales.orders"]
+    missing = validate_sql("SELECT * FROM sales.refunds", db)
+    assert not missing["ok"]
+    assert missing["error"].startswith("No such table: sales.refunds.")
+    column = validate_sql("SELECT o.discount FROM sales.orders o", db)
+    assert not column["ok"]
+    assert "No such column: o.discount (table sales.orders" in column["error"]
+
+def test_cross_join_estimate_is_rejected(db, monkeypatch):
+    monkeypatch.setitem(CONFIG, "sql_max_estimated_rows", 1_000_000)
+    result = validate_sql("SELECT COUNT(*) FROM planes a, planes b", db)
+    assert not result["ok"]
+    assert result["estimated_rows"] == 5000 * 5000
+    assert result["error"].startswith("Query rejected: the plan would touch about 25,000,000 rows")
+
+def test_indexed_join_estimate_is_accepted(db, monkeypatch):
+    monkeypatch.setitem(CONFIG, "sql_max_estimated_rows", 1_000_000)
+    result = validate_sql("SELECT COUNT(*) FROM planes a JOIN planes b ON a.id = b.id", db)
+    assert result["ok"], result["error"]
+    assert result["estimated_rows"] == 5000
+
+def test_estimate_follows_rows_added_after_the_catalog_was_built(db, monkeypatch):
+    monkeypatch.setitem(CONFIG, "sql_max_estimated_rows", 30_000_000)
+    assert validate_sql("SELECT COUNT(*) FROM planes a, planes b", db)["ok"]
+    with db._engine.begin() as connection:
+        connection.exec_driver_sql("INSERT INTO planes (name, seats, maker_id) SELECT name, seats, maker_id FROM planes")
+    result = validate_sql("SELECT COUNT(*) FROM planes a, planes b", db)
+    assert not result["ok"]
+    assert result["estimated_rows"] == 10000 * 10000
+
+def test_full_scan_of_large_table_warns(db, monkeypatch):
+    monkeypatch.setitem(CONFIG, "sql_full_scan_warn_rows", 1000)
+    result = validate_sql("SELECT name FROM planes WHERE seats = 3", db)
+    assert result["ok"]
+    assert result["warnings"] == ["Full scan of planes (~5,000 rows)"]